@@ -0,0 +1,266 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import contextlib
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterator, List, Literal, Optional, Tuple
+
+import botocore.exceptions
+import httpx
+import requests
+
+from ...config import Settings
+
+logger = logging.getLogger(__name__)
+
+Overload = Literal["throttled", "timeout"]
+
+# Latency may rise this much above the best observed latency before we stop adding concurrency.
+LATENCY_TOLERANCE = 1.5
+# Past this, latency is treated as queueing at the endpoint and concurrency is reduced.
+LATENCY_CONGESTION = 2.5
+# Weight of the newest sample in the latency moving average.
+LATENCY_SMOOTHING = 0.2
+THROUGHPUT_WINDOW_SECONDS = 60.0
+
+_THROTTLING_STATUS_CODES = {429, 503}
+_THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+
+def classify_overload(error: BaseException) -> Optional[Overload]:
+    """Whether an embedding request failed because the endpoint is overloaded, and how."""
+    if isinstance(
+        error,
+        (
+            TimeoutError,
+            httpx.TimeoutException,
+            requests.exceptions.Timeout,
+            botocore.exceptions.ReadTimeoutError,
+            botocore.exceptions.ConnectTimeoutError,
+        ),
+    ):
+        return "timeout"
+    if isinstance(error, botocore.exceptions.ClientError):
+        error_code = error.response.get("Error", {}).get("Code")
+        status_code = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if (
+            error_code in _THROTTLING_ERROR_CODES
+            or status_code in _THROTTLING_STATUS_CODES
+        ):
+            return "throttled"
+        return None
+    status_code = getattr(error, "status_code", None)
+    response = getattr(error, "response", None)
+    if status_code is None and response is not None:
+        status_code = getattr(response, "status_code", None)
+    if status_code in _THROTTLING_STATUS_CODES:
+        return "throttled"
+    return None
+
+
+@dataclass
+class ControllerSnapshot:
+    endpoint: str
+    concurrency_limit: int
+    batch_size: int
+    in_flight: int
+    latency_per_text_seconds: Optional[float]
+    throughput_texts_per_second: float
+    throttled_requests: int
+    timed_out_requests: int
+
+
+class AdaptiveConcurrencyController:
+    """
+    Adjusts how many embedding requests may be in flight against one endpoint, and how many
+    texts go in each request.
+
+    Concurrency grows by one each round of successful requests while latency stays close to the
+    best latency seen, and is halved when the endpoint throttles or times out (AIMD).  Timeouts
+    also halve the batch size, which then grows back while requests succeed.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 32,
+        max_batch_size: int = 100,
+        min_batch_size: int = 8,
+    ):
+        self.endpoint = endpoint
+        self.max_concurrency = max_concurrency
+        self.max_batch_size = max_batch_size
+        self.min_batch_size = min(min_batch_size, max_batch_size)
+        self.concurrency_limit = min(initial_concurrency, max_concurrency)
+        self.batch_size = max_batch_size
+        self.throttled_requests = 0
+        self.timed_out_requests = 0
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._latency: Optional[float] = None
+        self._best_latency: Optional[float] = None
+        self._successes_this_round = 0
+        self._last_backoff = 0.0
+        self._completions: Deque[Tuple[float, int]] = deque()
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[float]:
+        """Wait for a free request slot; yields the time the request started."""
+        with self._condition:
+            while self._in_flight >= self.concurrency_limit:
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield time.monotonic()
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def record_success(self, started: float, texts: int) -> None:
+        now = time.monotonic()
+        latency = (now - started) / max(texts, 1)
+        with self._condition:
+            self._completions.append((now, texts))
+            self._latency = (
+                latency
+                if self._latency is None
+                else LATENCY_SMOOTHING * latency
+                + (1 - LATENCY_SMOOTHING) * self._latency
+            )
+            if self._best_latency is None or self._latency < self._best_latency:
+                self._best_latency = self._latency
+
+            self._successes_this_round += 1
+            if self._successes_this_round < self.concurrency_limit:
+                return
+            self._successes_this_round = 0
+            if self._latency <= self._best_latency * LATENCY_TOLERANCE:
+                self.concurrency_limit = min(
+                    self.concurrency_limit + 1, self.max_concurrency
+                )
+                self.batch_size = min(self.batch_size * 2, self.max_batch_size)
+            elif self._latency > self._best_latency * LATENCY_CONGESTION:
+                self.concurrency_limit = max(self.concurrency_limit - 1, 1)
+                # let the baseline follow if the endpoint got slower for good
+                self._best_latency = self._best_latency * 1.1
+            self._condition.notify_all()
+
+    def record_overload(self, started: float, overload: Overload) -> None:
+        with self._condition:
+            if overload == "timeout":
+                self.timed_out_requests += 1
+            else:
+                self.throttled_requests += 1
+            # requests that were already in flight when we backed off report the same congestion
+            if started < self._last_backoff:
+                return
+            self._last_backoff = time.monotonic()
+            self._successes_this_round = 0
+            self.concurrency_limit = max(self.concurrency_limit // 2, 1)
+            if overload == "timeout":
+                self.batch_size = max(self.batch_size // 2, self.min_batch_size)
+            logger.info(
+                "embedding endpoint %s %s, backing off to concurrency %d and batch size %d",
+                self.endpoint,
+                overload,
+                self.concurrency_limit,
+                self.batch_size,
+            )
+
+    def throughput(self) -> float:
+        """Texts embedded per second over the last minute."""
+        now = time.monotonic()
+        with self._condition:
+            while (
+                self._completions
+                and self._completions[0][0] < now - THROUGHPUT_WINDOW_SECONDS
+            ):
+                self._completions.popleft()
+            return (
+                sum(texts for _, texts in self._completions) / THROUGHPUT_WINDOW_SECONDS
+            )
+
+    def snapshot(self) -> ControllerSnapshot:
+        throughput = self.throughput()
+        with self._condition:
+            return ControllerSnapshot(
+                endpoint=self.endpoint,
+                concurrency_limit=self.concurrency_limit,
+                batch_size=self.batch_size,
+                in_flight=self._in_flight,
+                latency_per_text_seconds=self._latency,
+                throughput_texts_per_second=throughput,
+                throttled_requests=self.throttled_requests,
+                timed_out_requests=self.timed_out_requests,
+            )
+
+
+_controllers: Dict[str, AdaptiveConcurrencyController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(endpoint: str) -> AdaptiveConcurrencyController:
+    """The controller shared by every indexing request that embeds with ``endpoint``."""
+    with _controllers_lock:
+        controller = _controllers.get(endpoint)
+        if controller is None:
+            settings = Settings()
+            controller = AdaptiveConcurrencyController(
+                endpoint,
+                max_concurrency=settings.embedding_max_concurrency,
+                max_batch_size=settings.embedding_max_batch_size,
+            )
+            _controllers[endpoint] = controller
+        return controller
+
+
+def controller_snapshots() -> List[ControllerSnapshot]:
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return [controller.snapshot() for controller in controllers]
@@ -21,6 +21,7 @@ READERS: Dict[str, Type[BaseReader]] = {
     ".ppt": PptxReader,
     ".csv": CSVReader,
     ".json": JSONReader,
+    ".jsonl": JSONReader,
 }
 
 
@@ -0,0 +1,86 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import threading
+from typing import List, Optional
+
+from llama_index.core.schema import TextNode
+
+
+class DocumentTextCollector:
+    """
+    Rebuilds the text of a document from the chunks another indexer parses, so that it can be
+    split again with a different chunk size without parsing the file a second time.
+
+    Overlapping chunks are trimmed by their character offsets; chunks without offsets, such as
+    CSV rows, are joined by newlines.
+    """
+
+    def __init__(self) -> None:
+        self._pieces: List[str] = []
+        self._end: Optional[int] = None
+        self._parsed = threading.Event()
+        self._error: Optional[Exception] = None
+
+    def add(self, chunk: TextNode) -> None:
+        text = chunk.text
+        start = chunk.start_char_idx
+        if start is not None and self._end is not None and start <= self._end:
+            text = text[self._end - start :]
+            separator = ""
+        else:
+            separator = "\n"
+        if text:
+            self._pieces.append(separator + text if self._pieces else text)
+        if chunk.end_char_idx is not None:
+            self._end = max(chunk.end_char_idx, self._end or 0)
+        else:
+            self._end = None
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        """Called once the document is parsed, or with the error that stopped parsing it."""
+        if not self._parsed.is_set():
+            self._error = error
+            self._parsed.set()
+
+    def wait(self) -> str:
+        """The text of the document, once it has been parsed."""
+        self._parsed.wait()
+        if self._error is not None:
+            raise self._error
+        return "".join(self._pieces)
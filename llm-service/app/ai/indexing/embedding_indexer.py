@@ -36,88 +36,561 @@
 #  DATA.
 #
 
+import hashlib
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import random
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from contextlib import closing
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Generator, List
+from typing import (
+    AbstractSet,
+    BinaryIO,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
+import numpy as np
+import numpy.typing as npt
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.schema import BaseNode, TextNode
+from llama_index.core.schema import (
+    NodeRelationship,
+    ObjectType,
+    RelatedNodeInfo,
+    TextNode,
+)
 
 from ...ai.vector_stores.vector_store import VectorStore
-from ...services.utils import batch_sequence, flatten_sequence
-from .base import get_reader_class
+from ...config import Settings
+from ...services.embedding_cache import get_embedding_cache
+from ...services.utils import batch_sequence, prefetch_sequence
+from .adaptive_concurrency import (
+    AdaptiveConcurrencyController,
+    classify_overload,
+    get_controller,
+)
+from .base import NotSupportedFileExtensionError, get_reader_class
+from .document_text import DocumentTextCollector
+from .parsing_pool import iter_file_chunks, iter_files_chunks
+from .readers.base_reader import BaseReader
 
 logger = logging.getLogger(__name__)
 
+EMBEDDING_BATCH_SIZE = 100
+UPSERT_BATCH_SIZE = 1000
+# Number of upsert batches that may be waiting behind the one being written.
+MAX_PENDING_UPSERTS = 2
+# Attempts per embedding request when the endpoint throttles or times out.
+MAX_EMBEDDING_ATTEMPTS = 6
+
+# Chunk IDs are derived from the document and the chunk's content so that re-indexing a
+# document produces the same IDs for unchanged chunks.
+_CHUNK_ID_NAMESPACE = uuid.UUID("6f1d3f4e-2f4c-4f7e-9a53-3c1b0c8f2d61")
+# Embeddings of a batch whose chunks are all reused
+_NO_EMBEDDINGS: npt.NDArray[np.float32] = np.empty((0, 0), dtype=np.float32)
+
+
+@dataclass
+class IndexingResult:
+    chunks_added: int = 0
+    chunks_reused: int = 0
+    chunks_removed: int = 0
+
+
+@dataclass
+class EmbeddedBatch:
+    """
+    Chunks and their embeddings, one float32 row per chunk, and the chunks that are already
+    stored. Of those, only the ones whose metadata changed have to be written again.
+    """
+
+    chunks: List[TextNode]
+    embeddings: npt.NDArray[np.float32]
+    reused_chunks: List[TextNode] = field(default_factory=list)
+    changed_chunks: List[TextNode] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.chunks) + len(self.reused_chunks)
+
+    def has_writes(self) -> bool:
+        return bool(self.chunks or self.changed_chunks)
+
+    @staticmethod
+    def concatenate(batches: List["EmbeddedBatch"]) -> "EmbeddedBatch":
+        if len(batches) == 1:
+            return batches[0]
+        embedded = [batch.embeddings for batch in batches if batch.chunks]
+        return EmbeddedBatch(
+            chunks=[chunk for batch in batches for chunk in batch.chunks],
+            embeddings=np.concatenate(embedded) if embedded else _NO_EMBEDDINGS,
+            reused_chunks=[chunk for batch in batches for chunk in batch.reused_chunks],
+            changed_chunks=[
+                chunk for batch in batches for chunk in batch.changed_chunks
+            ],
+        )
+
+
+def _parsing_groups(
+    files: Iterable[Tuple[Path, str]], data_source_id: int
+) -> Iterator[Tuple[Optional[Type[BaseReader]], List[Tuple[Path, str]]]]:
+    """
+    Consecutive files whose reader converts several per call, up to as many as it takes,
+    with their reader. Other files come on their own, as soon as they're read.
+    """
+    group: List[Tuple[Path, str]] = []
+    group_reader: Optional[Type[BaseReader]] = None
+    for file_path, document_id in files:
+        reader_cls: Optional[Type[BaseReader]]
+        try:
+            reader_cls = get_reader_class(file_path)
+            files_per_parse = reader_cls.files_per_parse(data_source_id)
+        except (NotSupportedFileExtensionError, ValueError):
+            # reported when the file is parsed
+            reader_cls, files_per_parse = None, 1
+        if group and reader_cls is not group_reader:
+            yield group_reader, group
+            group = []
+        group.append((file_path, document_id))
+        group_reader = reader_cls
+        if len(group) >= files_per_parse:
+            yield group_reader, group
+            group = []
+    if group:
+        yield group_reader, group
+
+
+def _next_file_chunks(parsed: Iterator[Iterator[TextNode]]) -> Iterator[TextNode]:
+    # lazily, so that failing to start parsing is reported as the file's error
+    yield from next(parsed)
+
+
+@dataclass
+class _DocumentProgress:
+    existing_chunk_ids: Set[str] = field(default_factory=set)
+    written_chunk_ids: Set[str] = field(default_factory=set)
+    result: IndexingResult = field(default_factory=IndexingResult)
+    error: Optional[Exception] = None
+
 
 class EmbeddingIndexer:
+    """
+    Index a file into a chunks vector store.
+
+    Parsing, embedding and upserting run as a pipeline of overlapping stages connected by
+    bounded buffers, so peak memory depends on the buffer sizes rather than on the size
+    of the document being indexed.
+
+    Re-indexing a document is incremental: chunks whose content is already stored keep
+    their embeddings, and chunks that no longer exist are deleted once the new ones are written.
+    """
+
     def __init__(
         self,
         data_source_id: int,
         splitter: SentenceSplitter,
         embedding_model: BaseEmbedding,
         chunks_vector_store: VectorStore,
+        max_in_flight: Optional[int] = None,
+        queue_depth: Optional[int] = None,
     ):
         self.data_source_id = data_source_id
         self.splitter = splitter
         self.embedding_model = embedding_model
         self.chunks_vector_store = chunks_vector_store
+        settings = Settings()
+        self.max_in_flight = max_in_flight or settings.embedding_max_in_flight
+        self.queue_depth = queue_depth or settings.indexing_queue_depth
+
+    def index_file(
+        self,
+        file_path: Path,
+        document_id: str,
+        on_progress: Optional[Callable[[int], None]] = None,
+        text_collector: Optional[DocumentTextCollector] = None,
+        open_stream: Optional[Callable[[], BinaryIO]] = None,
+    ) -> IndexingResult:
+        result = self.index_files(
+            [(file_path, document_id)],
+            on_progress,
+            {document_id: text_collector} if text_collector else None,
+            {document_id: open_stream} if open_stream else None,
+        )[document_id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def index_files(
+        self,
+        files: Iterable[Tuple[Path, str]],
+        on_progress: Optional[Callable[[int], None]] = None,
+        text_collectors: Optional[Dict[str, DocumentTextCollector]] = None,
+        streams: Optional[Dict[str, Callable[[], BinaryIO]]] = None,
+    ) -> Dict[str, Union[IndexingResult, Exception]]:
+        """
+        Index several files, given as (file path, document ID) pairs, through one pipeline.
+
+        Chunks of consecutive files share embedding and upsert batches, so many small files
+        cost about as much as one large file. ``files`` is consumed lazily, one file at a
+        time, as the parser gets to it, except that files whose reader converts several per
+        call (docling's PDFs) are read ahead and parsed together.
+
+        A file that fails to parse is reported as that document's exception, and the chunks
+        already written for it are removed again, leaving the document as it was. If
+        embedding or writing fails, every document started so far is reported as failed, and
+        files that were not reached yet are left out of the result.
 
-    def index_file(self, file_path: Path, document_id: str) -> None:
+        ``on_progress`` is called with the number of chunks embedded and handed to the vector
+        store so far. The chunks of the documents in ``text_collectors`` are also handed to
+        their collector as they are parsed, so another indexer can use the text right away.
+
+        The documents in ``streams`` are read from the stream their function opens, rather
+        than from their file path, which then only names them. Their reader has to be one
+        that reads streams.
+        """
         logger.debug(
-            f"Indexing file: {file_path} with embedding model: {self.embedding_model.model_name}"
+            f"Indexing files with embedding model: {self.embedding_model.model_name}"
         )
+        documents: Dict[str, _DocumentProgress] = {}
+        # chunk IDs include the document ID, so one set can serve every document
+        existing_chunk_ids: Set[str] = set()
 
-        reader_cls = get_reader_class(file_path)
+        collectors = text_collectors or {}
+        openers = streams or {}
 
-        reader = reader_cls(
-            splitter=self.splitter,
-            document_id=document_id,
-            data_source_id=self.data_source_id,
-        )
+        def chunks_of_file(
+            file_path: Path, document_id: str, chunks: Iterator[TextNode]
+        ) -> Iterator[TextNode]:
+            document = documents[document_id] = _DocumentProgress()
+            collector = collectors.get(document_id)
+            try:
+                document.existing_chunk_ids = (
+                    self.chunks_vector_store.get_document_chunk_ids(document_id)
+                )
+                existing_chunk_ids.update(document.existing_chunk_ids)
+                logger.debug(f"Parsing file: {file_path}")
+                for chunk in self._assign_chunk_ids(chunks, document_id):
+                    if collector:
+                        collector.add(chunk)
+                    yield chunk
+                if collector:
+                    collector.finish()
+            except Exception as e:
+                logger.exception(f"Failed to parse file: {file_path}")
+                document.error = e
+                if collector:
+                    collector.finish(e)
 
-        logger.debug(f"Parsing file: {file_path}")
+        def chunks_of_all_files() -> Iterator[TextNode]:
+            for reader_cls, group in _parsing_groups(files, self.data_source_id):
+                if reader_cls is None or len(group) == 1:
+                    file_path, document_id = group[0]
+                    yield from chunks_of_file(
+                        file_path,
+                        document_id,
+                        self._file_chunks(
+                            file_path, document_id, openers.get(document_id)
+                        ),
+                    )
+                    continue
+                parsed = iter_files_chunks(
+                    reader_cls,
+                    self.splitter,
+                    self.data_source_id,
+                    [(document_id, file_path) for file_path, document_id in group],
+                )
+                for file_path, document_id in group:
+                    yield from chunks_of_file(
+                        file_path, document_id, _next_file_chunks(parsed)
+                    )
+                parsed.close()
 
-        chunks = reader.load_chunks(file_path)
+        try:
+            # closing stops the parser and waits for it, since it updates the documents and
+            # the collectors that are read below
+            with closing(
+                prefetch_sequence(chunks_of_all_files(), self.queue_depth)
+            ) as chunks:
+                self._write_chunks(
+                    self._rebatch(
+                        self._compute_embeddings(chunks, existing_chunk_ids),
+                        UPSERT_BATCH_SIZE,
+                    ),
+                    documents,
+                    on_progress,
+                )
+        except Exception as e:
+            logger.exception("Failed to embed or write chunks")
+            for document in documents.values():
+                document.error = document.error or e
+            for collector in collectors.values():
+                collector.finish(e)
+        # release anyone waiting for the text of a document that was never reached
+        for collector in collectors.values():
+            collector.finish(RuntimeError("The document was not parsed"))
 
-        logger.debug(f"Embedding {len(chunks)} chunks")
+        results: Dict[str, Union[IndexingResult, Exception]] = {}
+        for document_id, document in documents.items():
+            if document.error is None:
+                removed_chunk_ids = list(
+                    document.existing_chunk_ids - document.written_chunk_ids
+                )
+                self.chunks_vector_store.delete_chunks(removed_chunk_ids)
+                document.result.chunks_removed = len(removed_chunk_ids)
+                results[document_id] = document.result
+            else:
+                # best effort, so that the original error is what gets reported
+                try:
+                    self.chunks_vector_store.delete_chunks(
+                        list(document.written_chunk_ids - document.existing_chunk_ids)
+                    )
+                except Exception:
+                    logger.exception(f"Failed to clean up document: {document_id}")
+                results[document_id] = document.error
 
-        chunks_with_embeddings = flatten_sequence(self._compute_embeddings(chunks))
+        logger.debug(
+            f"Indexing {len(results)} files completed, embedding cache: {get_embedding_cache().stats()}"
+        )
+        return results
 
+    def _write_chunks(
+        self,
+        embedded_batches: Iterable[EmbeddedBatch],
+        documents: Dict[str, _DocumentProgress],
+        on_progress: Optional[Callable[[int], None]],
+    ) -> None:
         acc = 0
-        for chunk_batch in batch_sequence(chunks_with_embeddings, 1000):
-            acc += len(chunk_batch)
-            logger.debug(f"Adding {acc}/{len(chunks)} chunks to vector store")
+        with ThreadPoolExecutor(max_workers=1) as upsert_executor:
+            pending_upserts: deque[Future[None]] = deque()
+            # the last batch is held back so that it can be written as the consistency barrier
+            held_batch: Optional[EmbeddedBatch] = None
+            for chunk_batch in embedded_batches:
+                acc += len(chunk_batch)
+                for chunk in chunk_batch.chunks:
+                    document = documents[chunk.metadata["document_id"]]
+                    document.written_chunk_ids.add(chunk.id_)
+                    document.result.chunks_added += 1
+                for chunk in chunk_batch.reused_chunks:
+                    document = documents[chunk.metadata["document_id"]]
+                    document.written_chunk_ids.add(chunk.id_)
+                    document.result.chunks_reused += 1
+                logger.debug(f"Adding {acc} chunks to vector store")
+                if on_progress:
+                    on_progress(acc)
+                if not chunk_batch.has_writes():
+                    continue
+                if held_batch is not None:
+                    pending_upserts.append(
+                        upsert_executor.submit(
+                            self._add_to_vector_store, held_batch, False
+                        )
+                    )
+                held_batch = chunk_batch
+                while len(pending_upserts) > MAX_PENDING_UPSERTS:
+                    pending_upserts.popleft().result()
+            if held_batch is not None:
+                pending_upserts.append(
+                    upsert_executor.submit(self._add_to_vector_store, held_batch, True)
+                )
+            for pending_upsert in pending_upserts:
+                pending_upsert.result()
 
-            # We have to explicitly convert here even though the types are compatible (TextNode inherits from BaseNode)
-            # because the "add" annotation uses List instead of Sequence. We need to use TextNode explicitly because
-            # we're capturing "text".
-            converted_chunks: List[BaseNode] = [chunk for chunk in chunk_batch]
+    def _file_chunks(
+        self,
+        file_path: Path,
+        document_id: str,
+        open_stream: Optional[Callable[[], BinaryIO]],
+    ) -> Iterator[TextNode]:
+        reader_cls = get_reader_class(file_path)
+        if open_stream is not None:
+            reader = reader_cls(
+                splitter=self.splitter,
+                document_id=document_id,
+                data_source_id=self.data_source_id,
+            )
+            with open_stream() as stream:
+                yield from reader.iter_stream_chunks(stream, file_path)
+            return
+        yield from iter_file_chunks(
+            reader_cls, self.splitter, document_id, self.data_source_id, file_path
+        )
+
+    @staticmethod
+    def _assign_chunk_ids(
+        chunks: Iterable[TextNode], document_id: str
+    ) -> Iterator[TextNode]:
+        occurrences: Counter[str] = Counter()
+        for chunk in chunks:
+            content_hash = hashlib.sha256(chunk.text.encode("utf-8")).hexdigest()
+            # identical chunks within a document still need distinct IDs
+            occurrence = occurrences[content_hash]
+            occurrences[content_hash] += 1
+            chunk.id_ = str(
+                uuid.uuid5(
+                    _CHUNK_ID_NAMESPACE, f"{document_id}:{content_hash}:{occurrence}"
+                )
+            )
+            chunk.metadata["content_hash"] = content_hash
+            # the vector store finds a document's chunks by the document_id of their payload,
+            # which is taken from the SOURCE relationship; without it, every chunk is re-added
+            if chunk.ref_doc_id != document_id:
+                chunk.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(
+                    node_id=document_id, node_type=ObjectType.DOCUMENT
+                )
+            for excluded_keys in (
+                chunk.excluded_embed_metadata_keys,
+                chunk.excluded_llm_metadata_keys,
+            ):
+                if "content_hash" not in excluded_keys:
+                    excluded_keys.append("content_hash")
+            yield chunk
 
-            chunks_vector_store = self.chunks_vector_store.llama_vector_store()
-            chunks_vector_store.add(converted_chunks)
+    @staticmethod
+    def _rebatch(
+        batches: Iterable[EmbeddedBatch], size: int
+    ) -> Iterator[EmbeddedBatch]:
+        pending: List[EmbeddedBatch] = []
+        pending_chunks = 0
+        for batch in batches:
+            pending.append(batch)
+            pending_chunks += len(batch)
+            if pending_chunks >= size:
+                yield EmbeddedBatch.concatenate(pending)
+                pending, pending_chunks = [], 0
+        if pending:
+            yield EmbeddedBatch.concatenate(pending)
 
-        logger.debug(f"Indexing file: {file_path} completed")
+    def _add_to_vector_store(self, chunk_batch: EmbeddedBatch, wait: bool) -> None:
+        if chunk_batch.chunks:
+            self.chunks_vector_store.upsert_chunks(
+                chunk_batch.chunks, chunk_batch.embeddings, wait=wait
+            )
+        if chunk_batch.changed_chunks:
+            self.chunks_vector_store.update_chunk_metadata(
+                chunk_batch.changed_chunks, wait=wait
+            )
 
     def _compute_embeddings(
-        self, chunks: List[TextNode]
-    ) -> Generator[List[TextNode], None, None]:
-        batched_chunks = list(batch_sequence(chunks, 100))
-        batched_texts = [[chunk.text for chunk in batch] for batch in batched_chunks]
-
-        with ThreadPoolExecutor(max_workers=20) as executor:
-            futures = [
-                executor.submit(
-                    lambda b: (i, self.embedding_model.get_text_embedding_batch(b)),
-                    batch,
+        self, chunks: Iterable[TextNode], existing_chunk_ids: AbstractSet[str]
+    ) -> Generator[EmbeddedBatch, None, None]:
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            in_flight: set[Future[EmbeddedBatch]] = set()
+            for batch in batch_sequence(chunks, EMBEDDING_BATCH_SIZE):
+                if len(in_flight) >= self.max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                in_flight.add(
+                    executor.submit(self._embed_batch, batch, existing_chunk_ids)
+                )
+            logger.debug(f"Waiting for {len(in_flight)} futures")
+            for future in as_completed(in_flight):
+                yield future.result()
+
+    def _embed_batch(
+        self, batch: List[TextNode], existing_chunk_ids: AbstractSet[str]
+    ) -> EmbeddedBatch:
+        # unchanged chunks keep the embedding that is already in the vector store
+        reused = [chunk for chunk in batch if chunk.id_ in existing_chunk_ids]
+        chunks = [chunk for chunk in batch if chunk.id_ not in existing_chunk_ids]
+        changed = (
+            self.chunks_vector_store.get_chunks_with_changed_metadata(reused)
+            if reused
+            else []
+        )
+        if not chunks:
+            return EmbeddedBatch(
+                chunks=[],
+                embeddings=_NO_EMBEDDINGS,
+                reused_chunks=reused,
+                changed_chunks=changed,
+            )
+
+        texts = [chunk.text for chunk in chunks]
+        cache = get_embedding_cache()
+        embeddings = cache.get_many(self.embedding_model, "passage", texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = self._embed_texts(missing_texts)
+            cache.put_many(self.embedding_model, "passage", missing_texts, computed)
+            if len(missing) == len(chunks):
+                return EmbeddedBatch(
+                    chunks=chunks,
+                    embeddings=computed,
+                    reused_chunks=reused,
+                    changed_chunks=changed,
                 )
-                for i, batch in enumerate(batched_texts)
-            ]
-            logger.debug(f"Waiting for {len(futures)} futures")
-            for future in as_completed(futures):
-                i, batch_embeddings = future.result()
-                for chunk, embedding in zip(batched_chunks[i], batch_embeddings):
-                    chunk.embedding = embedding
-                yield batched_chunks[i]
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        return EmbeddedBatch(
+            chunks=chunks,
+            embeddings=np.stack([e for e in embeddings if e is not None]),
+            reused_chunks=reused,
+            changed_chunks=changed,
+        )
+
+    def _embed_texts(self, texts: List[str]) -> npt.NDArray[np.float32]:
+        # batch size and concurrency are shared with every request using this endpoint
+        controller = get_controller(self.embedding_model.model_name)
+        embeddings: List[npt.NDArray[np.float32]] = []
+        embedded = 0
+        while embedded < len(texts):
+            batch = texts[embedded : embedded + controller.batch_size]
+            embeddings.append(self._embed_with_retries(controller, batch))
+            embedded += len(batch)
+        return embeddings[0] if len(embeddings) == 1 else np.concatenate(embeddings)
+
+    def _embed_with_retries(
+        self, controller: AdaptiveConcurrencyController, texts: List[str]
+    ) -> npt.NDArray[np.float32]:
+        attempt = 0
+        while True:
+            with controller.slot() as started:
+                try:
+                    embeddings = self._get_embedding_array(texts)
+                    controller.record_success(started, len(texts))
+                    return embeddings
+                except Exception as e:
+                    overload = classify_overload(e)
+                    attempt += 1
+                    if overload is None or attempt >= MAX_EMBEDDING_ATTEMPTS:
+                        raise
+                    controller.record_overload(started, overload)
+            delay = min(2**attempt, 30) * random.uniform(0.5, 1.0)
+            logger.debug(f"Retrying embedding request in {delay:.1f}s")
+            time.sleep(delay)
+
+    def _get_embedding_array(self, texts: List[str]) -> npt.NDArray[np.float32]:
+        get_array = getattr(self.embedding_model, "get_text_embedding_array", None)
+        if get_array is not None:
+            embeddings: npt.NDArray[np.float32] = get_array(texts)
+        else:
+            embeddings = np.asarray(
+                self.embedding_model.get_text_embedding_batch(texts), dtype=np.float32
+            )
+        if embeddings.ndim != 2 or embeddings.shape[0] != len(texts):
+            raise ValueError(
+                f"Expected {len(texts)} embeddings, got an array of shape {embeddings.shape}"
+            )
+        if not np.isfinite(embeddings).all():
+            raise ValueError("Embedding model returned non-finite values")
+        return embeddings
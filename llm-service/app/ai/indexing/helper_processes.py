@@ -0,0 +1,133 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Cores this process may keep busy with helpers, when it only has a share of the machine
+_cores: Optional[int] = None
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _exit_with_parent(parent_pid: int) -> None:
+    # a parsing worker that times out is killed, which would otherwise leave its helpers behind
+    def watch() -> None:
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(1)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def limit_cores(cores: int) -> None:
+    """
+    Keep the helpers this process starts within its share of the cores.
+
+    Parsing workers are given the cores that the other busy workers leave, file by file, so
+    a large document parsed on its own can use the whole machine, while documents parsed side
+    by side don't each start a helper per core.
+    """
+    global _cores
+    _cores = max(cores, 1)
+
+
+def usable_processes(requested: int, tasks: int) -> int:
+    # more processes than cores only adds the cost of starting them
+    return min(requested, tasks, _cores or os.cpu_count() or 1)
+
+
+def _helper_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # helpers are only started as tasks need them, so the pool can allow every core
+            _pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_exit_with_parent,
+                initargs=(os.getpid(),),
+            )
+        return _pool
+
+
+def map_in_helpers(
+    function: Callable[..., T], processes: int, *iterables: Iterable[Any]
+) -> List[T]:
+    """
+    Like map(), but run in helper processes that share the work on a single large document
+    with the calling process, at most ``processes`` tasks at a time.
+
+    The helpers are kept for the life of the process and reused for every document, since
+    starting one costs more than most of the tasks they're given. They exit on their own if
+    the process that started them dies.
+    """
+    executor = _helper_pool()
+    results: List[T] = []
+    running: Deque[Future[T]] = deque()
+    try:
+        for args in zip(*iterables):
+            if len(running) >= processes:
+                results.append(running.popleft().result())
+            running.append(executor.submit(function, *args))
+        results.extend(future.result() for future in running)
+    except BrokenProcessPool:
+        # a helper died; the next document starts new ones
+        _discard_pool(executor)
+        raise
+    finally:
+        # what's still queued when a task fails
+        for future in running:
+            future.cancel()
+    return results
+
+
+def _discard_pool(executor: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is executor:
+            _pool = None
+    executor.shutdown(wait=False, cancel_futures=True)
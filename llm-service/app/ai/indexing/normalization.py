@@ -0,0 +1,138 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+
+from ...services.parsed_text_cache import ExtractedPage
+
+# Lines have to repeat on at least this many pages to count as boilerplate
+MIN_REPEATED_PAGES = 3
+# Only this many lines at the top and at the bottom of a page can be headers or footers
+EDGE_LINES = 3
+# Shorter lines, such as table cells and slide bullets, are kept even when they repeat
+MIN_REPEATED_LINE_CHARS = 12
+
+_SPACES = re.compile(r"[^\S\n]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+@dataclass
+class NormalizedPages:
+    pages: List[ExtractedPage]
+    characters_removed: int = 0
+    # the repeated lines that were dropped, one entry per occurrence
+    removed_lines: List[str] = field(default_factory=list)
+
+
+def _collapse_whitespace(text: str) -> str:
+    lines = [_SPACES.sub(" ", line).strip() for line in text.split("\n")]
+    # keep paragraph breaks, which the splitter cuts at first
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip("\n")
+
+
+def _page_number_line(label: str) -> "re.Pattern[str]":
+    # "3", "- 3 -", "Page 3 of 10", "Confidential | Page 3/10": the page's own number ends the line
+    number = re.escape(label)
+    return re.compile(
+        rf"(^|\bpage\s+)[-–—(\[]?\s*{number}\s*[-–—)\]]?(\s*(of|/)\s*\d+)?\s*$",
+        re.IGNORECASE,
+    )
+
+
+def _edge_lines(page: ExtractedPage) -> Dict[int, str]:
+    """The lines that can be headers or footers, by index, as compared across pages."""
+    lines = page.text.split("\n")
+    indexes = [i for i, line in enumerate(lines) if line]
+    edges = indexes[:EDGE_LINES] + indexes[-EDGE_LINES:]
+    page_number = _page_number_line(page.label) if page.label else None
+    keys: Dict[int, str] = {}
+    for i in edges:
+        line = lines[i]
+        match = page_number.search(line) if page_number else None
+        if match:
+            # the same footer on every page once its own page number is masked
+            keys[i] = f"{line[: match.start()]}{match.group(1)}#{match.group(2) or ''}"
+        elif len(line) >= MIN_REPEATED_LINE_CHARS:
+            keys[i] = line
+    return keys
+
+
+def _repeated_lines(
+    pages_edges: List[Dict[int, str]], min_pages_fraction: float
+) -> Set[str]:
+    min_pages = max(MIN_REPEATED_PAGES, int(len(pages_edges) * min_pages_fraction))
+    if len(pages_edges) < min_pages:
+        return set()
+    pages_with_line: Counter[str] = Counter()
+    for edges in pages_edges:
+        pages_with_line.update(set(edges.values()))
+    return {key for key, count in pages_with_line.items() if count >= min_pages}
+
+
+def normalize_pages(
+    pages: List[ExtractedPage], min_pages_fraction: float
+) -> NormalizedPages:
+    """
+    Collapse runs of whitespace, and drop the headers and footers repeated on most pages.
+
+    Only the first and last few lines of a page are considered, and short lines are kept,
+    so repeated table cells and bullets in the body of a page stay in the text.
+    """
+    collapsed = [
+        ExtractedPage(label=page.label, text=_collapse_whitespace(page.text))
+        for page in pages
+    ]
+    pages_edges = [_edge_lines(page) for page in collapsed]
+    repeated = _repeated_lines(pages_edges, min_pages_fraction)
+    normalized = NormalizedPages(pages=[])
+    for page, edges in zip(collapsed, pages_edges):
+        kept = []
+        for i, line in enumerate(page.text.split("\n")):
+            if edges.get(i) in repeated:
+                normalized.removed_lines.append(line)
+            else:
+                kept.append(line)
+        text = _BLANK_LINES.sub("\n\n", "\n".join(kept)).strip("\n")
+        normalized.pages.append(ExtractedPage(label=page.label, text=text))
+    normalized.characters_removed = sum(len(page.text) for page in pages) - sum(
+        len(page.text) for page in normalized.pages
+    )
+    return normalized
@@ -0,0 +1,439 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import atexit
+import csv
+import functools
+import logging
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import zipfile
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+)
+
+import pypdf
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import TextNode
+
+from ...config import Settings
+from .helper_processes import limit_cores
+from .readers.base_reader import BaseReader
+from .splitting import get_sentence_splitter
+
+logger = logging.getLogger(__name__)
+
+# Workers are replaced after this many files, so that memory a parser leaks is given back.
+MAX_FILES_PER_WORKER = 200
+CHUNKS_PER_MESSAGE = 100
+# What readers raise for files they can't parse. Anything else ends the worker, which the caller
+# reports as a ParsingWorkerDiedError.
+PARSING_ERRORS = (
+    OSError,
+    ValueError,
+    LookupError,
+    TypeError,
+    RuntimeError,
+    csv.Error,
+    zipfile.BadZipFile,
+    pypdf.errors.PyPdfError,
+)
+
+
+class ParsingTimeoutError(Exception):
+    def __init__(self, file_path: Path, timeout_seconds: float):
+        super().__init__(
+            f"Parsing {file_path.name} took longer than {timeout_seconds:.0f}s and was stopped"
+        )
+
+
+class ParsingWorkerDiedError(Exception):
+    def __init__(self, file_path: Path, exitcode: Optional[int]):
+        super().__init__(
+            f"The parser process exited with code {exitcode} while parsing {file_path.name}"
+        )
+
+
+# reader, chunk size, chunk overlap, data source, each file's (document ID, path), and the
+# cores the worker's helpers may use
+_Task = Tuple[Type[BaseReader], int, int, int, List[Tuple[str, str]], int]
+
+
+def _parse_file(
+    connection: Connection, index: int, reader: BaseReader, file_path: Path
+) -> None:
+    try:
+        # sent in batches as they're produced; the pipe blocks us if the caller falls behind
+        batch: List[Dict[str, Any]] = []
+        for chunk in reader.iter_chunks(file_path):
+            batch.append(chunk.to_dict())
+            if len(batch) >= CHUNKS_PER_MESSAGE:
+                connection.send(("chunks", index, batch))
+                batch = []
+        if batch:
+            connection.send(("chunks", index, batch))
+    except PARSING_ERRORS as e:
+        connection.send(("error", index, _picklable(e)))
+        return
+    connection.send(("done", index, None))
+
+
+def _parse(connection: Connection, task: _Task) -> None:
+    reader_cls, chunk_size, chunk_overlap, data_source_id, files, cores = task
+    limit_cores(cores)
+    splitter = get_sentence_splitter(chunk_size, chunk_overlap)
+    readers = [
+        reader_cls(
+            splitter=splitter, document_id=document_id, data_source_id=data_source_id
+        )
+        for document_id, _ in files
+    ]
+    file_paths = [Path(file_path) for _, file_path in files]
+    ready: Set[Path] = set()
+    parsed = 0
+    try:
+        preparing = reader_cls(
+            splitter=splitter, document_id="", data_source_id=data_source_id
+        )
+        for file_path in preparing.prepare_files(file_paths):
+            ready.add(file_path)
+            # in order, since that's the order the caller reads the files' chunks in
+            while parsed < len(files) and file_paths[parsed] in ready:
+                _parse_file(connection, parsed, readers[parsed], file_paths[parsed])
+                parsed += 1
+    except PARSING_ERRORS as e:
+        logger.warning(
+            f"Failed to prepare files for parsing, parsing them one by one: {e}"
+        )
+    for index in range(parsed, len(files)):
+        _parse_file(connection, index, readers[index], file_paths[index])
+
+
+def _worker_main(connection: Connection, niceness: int) -> None:
+    # lower priority, so that parsing doesn't slow down interactive requests
+    os.nice(niceness)
+    # imports are done by now, so timeouts only cover parsing
+    connection.send("ready")
+    while True:
+        try:
+            task: _Task = connection.recv()
+        except EOFError:
+            # the parent went away
+            return
+        _parse(connection, task)
+
+
+def _picklable(error: Exception) -> Exception:
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except (pickle.PickleError, TypeError, AttributeError):
+        # e.g. errors whose constructor takes other arguments than the ones they pass up
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+class _Worker:
+    def __init__(self, niceness: int):
+        context = multiprocessing.get_context("spawn")
+        self.connection, child_connection = context.Pipe()
+        self.process: BaseProcess = context.Process(
+            target=_worker_main,
+            args=(child_connection, niceness),
+            name="parsing-worker",
+        )
+        self.process.start()
+        child_connection.close()
+        self.files_parsed = 0
+        try:
+            self.connection.recv()
+        except EOFError:
+            self.process.join()
+            raise RuntimeError(
+                f"Parsing worker exited with code {self.process.exitcode} while starting"
+            )
+
+    def stop(self) -> None:
+        self.connection.close()
+        self.process.kill()
+        self.process.join()
+
+
+class _Batch:
+    """The files a worker is parsing for one call, and how far it got with them."""
+
+    def __init__(self, worker: _Worker, file_paths: List[Path], timeout_seconds: float):
+        self.worker = worker
+        self.file_paths = file_paths
+        self.timeout_seconds = timeout_seconds
+        # files the worker is done with, successfully or not
+        self.finished = 0
+
+    def _receive(self) -> Tuple[str, int, Any]:
+        file_path = self.file_paths[self.finished]
+        if not self.worker.connection.poll(self.timeout_seconds):
+            logger.warning(f"Parsing {file_path} timed out, stopping its worker")
+            raise ParsingTimeoutError(file_path, self.timeout_seconds)
+        try:
+            message: Tuple[str, int, Any] = self.worker.connection.recv()
+        except EOFError:
+            raise ParsingWorkerDiedError(file_path, self.worker.process.exitcode)
+        kind, _, _ = message
+        if kind != "chunks":
+            self.finished += 1
+            self.worker.files_parsed += 1
+        return message
+
+    def chunks(self, index: int) -> Iterator[TextNode]:
+        # what's left of earlier files, whose chunks the caller stopped reading, is skipped
+        while self.finished <= index:
+            kind, file_index, payload = self._receive()
+            if file_index != index:
+                continue
+            if kind == "chunks":
+                for chunk in payload:
+                    yield TextNode.from_dict(chunk)
+            elif kind == "error":
+                raise payload
+
+    def drain(self) -> None:
+        while self.finished < len(self.file_paths):
+            self._receive()
+
+
+class ParsingPool:
+    """
+    Long-lived worker processes that parse files into chunks outside of the service's process.
+
+    Parsing PDFs and Office documents is CPU bound Python, which would otherwise hold the GIL
+    while chat requests are being served. Workers run at a lower priority, are started on first
+    use, and are killed and replaced when a file takes longer than the timeout. Chunks are
+    streamed back in batches, so a large file doesn't have to fit in memory at once.
+    """
+
+    def __init__(self, processes: int, timeout_seconds: float, niceness: int):
+        self.processes = processes
+        self.timeout_seconds = timeout_seconds
+        self.niceness = niceness
+        self._idle: queue.LifoQueue[Optional[_Worker]] = queue.LifoQueue()
+        # None stands for a worker that hasn't been started yet
+        for _ in range(processes):
+            self._idle.put(None)
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        # workers parsing files at the moment
+        self._busy = 0
+
+    def parse(
+        self,
+        reader_cls: Type[BaseReader],
+        splitter: SentenceSplitter,
+        document_id: str,
+        data_source_id: int,
+        file_path: Path,
+    ) -> List[TextNode]:
+        return list(
+            self.iter_parse(
+                reader_cls, splitter, document_id, data_source_id, file_path
+            )
+        )
+
+    def iter_parse(
+        self,
+        reader_cls: Type[BaseReader],
+        splitter: SentenceSplitter,
+        document_id: str,
+        data_source_id: int,
+        file_path: Path,
+    ) -> Iterator[TextNode]:
+        """
+        Parse a file in a worker, yielding its chunks as the worker produces them.
+
+        The timeout applies to each wait for the worker, so a reader that streams its chunks
+        only times out if it stops making progress, not if the caller consumes them slowly.
+        """
+        for chunks in self.iter_parse_files(
+            reader_cls, splitter, data_source_id, [(document_id, file_path)]
+        ):
+            yield from chunks
+
+    def iter_parse_files(
+        self,
+        reader_cls: Type[BaseReader],
+        splitter: SentenceSplitter,
+        data_source_id: int,
+        files: Sequence[Tuple[str, Path]],
+    ) -> Iterator[Iterator[TextNode]]:
+        """
+        Parse several files, given as (document ID, path) pairs, in one worker, yielding the
+        chunks of each file in turn.
+
+        The reader prepares the files together, so that e.g. docling converts several PDFs in
+        one call, but each file's chunks are still streamed as soon as it's parsed. A file that
+        fails raises from its own iterator; chunks of a file that are left unread when the next
+        file's iterator is used are skipped.
+        """
+        worker: Optional[_Worker] = self._idle.get()
+        with self._lock:
+            self._busy += 1
+            # the worker waits while its helpers work, so they can have its share of the
+            # cores, and the shares of the workers that are idle when it starts on the files
+            cores = (os.cpu_count() or 1) // self._busy
+        task: _Task = (
+            reader_cls,
+            splitter.chunk_size,
+            splitter.chunk_overlap,
+            data_source_id,
+            [(document_id, str(file_path)) for document_id, file_path in files],
+            cores,
+        )
+        batch: Optional[_Batch] = None
+        try:
+            if worker is None or worker.files_parsed >= MAX_FILES_PER_WORKER:
+                worker = self._replace(worker)
+            worker.connection.send(task)
+            batch = _Batch(
+                worker, [file_path for _, file_path in files], self.timeout_seconds
+            )
+            for index in range(len(files)):
+                yield batch.chunks(index)
+            batch.drain()
+        finally:
+            # the worker is in the middle of the files if we bail out, and has to be stopped
+            if batch is not None and batch.finished < len(files):
+                # a replacement is started when the slot is next used
+                self._discard(batch.worker)
+                worker = None
+            with self._lock:
+                self._busy -= 1
+            self._idle.put(worker)
+
+    def _discard(self, worker: _Worker) -> None:
+        with self._lock:
+            worker.stop()
+            self._workers.remove(worker)
+
+    def _replace(self, worker: Optional[_Worker]) -> _Worker:
+        if worker is not None:
+            self._discard(worker)
+        with self._lock:
+            replacement = _Worker(self.niceness)
+            self._workers.append(replacement)
+            return replacement
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+            self._workers.clear()
+
+
+@functools.cache
+def _parsing_pool(
+    name: str, processes: int, timeout_seconds: float, niceness: int
+) -> ParsingPool:
+    logger.info(f"Starting the {name} parsing pool with {processes} processes")
+    pool = ParsingPool(processes, timeout_seconds, niceness)
+    atexit.register(pool.shutdown)
+    return pool
+
+
+def get_parsing_pool(name: str = "default") -> ParsingPool:
+    settings = Settings()
+    if name == "docling":
+        processes = settings.docling_processes
+    else:
+        processes = settings.parsing_processes or os.cpu_count() or 1
+    return _parsing_pool(
+        name, processes, settings.parsing_timeout_seconds, settings.parsing_niceness
+    )
+
+
+def iter_file_chunks(
+    reader_cls: Type[BaseReader],
+    splitter: SentenceSplitter,
+    document_id: str,
+    data_source_id: int,
+    file_path: Path,
+) -> Iterator[TextNode]:
+    """Chunks of a file, parsed in the parsing pool if the reader is CPU bound."""
+    if reader_cls.parse_in_subprocess and Settings().parsing_processes >= 0:
+        pool = get_parsing_pool(reader_cls.parsing_pool_name(data_source_id))
+        yield from pool.iter_parse(
+            reader_cls, splitter, document_id, data_source_id, file_path
+        )
+        return
+    reader = reader_cls(
+        splitter=splitter, document_id=document_id, data_source_id=data_source_id
+    )
+    yield from reader.iter_chunks(file_path)
+
+
+def iter_files_chunks(
+    reader_cls: Type[BaseReader],
+    splitter: SentenceSplitter,
+    data_source_id: int,
+    files: Sequence[Tuple[str, Path]],
+) -> Generator[Iterator[TextNode], None, None]:
+    """
+    Chunks of several files of one type, given as (document ID, path) pairs, each file's in
+    turn; the reader can prepare them together, see BaseReader.prepare_files().
+    """
+    if reader_cls.parse_in_subprocess and Settings().parsing_processes >= 0:
+        pool = get_parsing_pool(reader_cls.parsing_pool_name(data_source_id))
+        yield from pool.iter_parse_files(reader_cls, splitter, data_source_id, files)
+        return
+    for document_id, file_path in files:
+        reader = reader_cls(
+            splitter=splitter, document_id=document_id, data_source_id=data_source_id
+        )
+        yield reader.iter_chunks(file_path)
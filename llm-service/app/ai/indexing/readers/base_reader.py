@@ -1,12 +1,31 @@
+import logging
 from abc import ABC, abstractmethod
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, ClassVar, Iterator, List, Sequence
 
 from llama_index.core.node_parser import SentenceSplitter
-from llama_index.core.schema import Document, TextNode
+from llama_index.core.node_parser.node_utils import build_nodes_from_splits
+from llama_index.core.schema import BaseNode, Document, MetadataMode, TextNode
+from llama_index.core.utils import get_tokenizer
+
+from ....config import Settings
+from ....services.parsed_text_cache import (
+    ExtractedText,
+    file_digest,
+    get_parsed_text_cache,
+)
+from ..normalization import normalize_pages
+from ..splitting import SECTION_CHARS, split_text
+
+logger = logging.getLogger(__name__)
 
 
 class BaseReader(ABC):
+    # CPU-bound readers are run in the parsing pool rather than in the calling thread
+    parse_in_subprocess: ClassVar[bool] = False
+    # Readers that can chunk a stream, so that stored documents don't have to be downloaded first
+    reads_streams: ClassVar[bool] = False
+
     def __init__(
         self, splitter: SentenceSplitter, document_id: str, data_source_id: int
     ):
@@ -18,13 +37,80 @@ class BaseReader(ABC):
     def load_chunks(self, file_path: Path) -> List[TextNode]:
         pass
 
+    @classmethod
+    def parsing_pool_name(cls, data_source_id: int) -> str:
+        """Which parsing pool runs this reader for a data source, when parse_in_subprocess is set"""
+        return "default"
+
+    @classmethod
+    def files_per_parse(cls, data_source_id: int) -> int:
+        """How many files a parsing worker is given at once, for readers that convert several per call"""
+        return 1
+
+    def prepare_files(self, file_paths: List[Path]) -> Iterator[Path]:
+        """
+        Do the work that's cheaper for several files at once, ahead of parsing them one by one.
+
+        Yields each file as soon as it's ready to be parsed. Called on a reader with an empty
+        document ID, since it isn't parsing any one document.
+        """
+        yield from file_paths
+
+    def iter_chunks(self, file_path: Path) -> Iterator[TextNode]:
+        """
+        Yield the chunks of the file one at a time.
+
+        Readers that can produce chunks incrementally should override this so that
+        indexing does not need to hold the whole document in memory.
+        """
+        yield from self.load_chunks(file_path)
+
+    def iter_stream_chunks(
+        self, stream: BinaryIO, file_path: Path
+    ) -> Iterator[TextNode]:
+        """
+        Yield the chunks of a document read from a stream, for readers with reads_streams set.
+
+        ``file_path`` only names the document; it isn't opened.
+        """
+        raise NotImplementedError(f"{type(self).__name__} can't read streams")
+
     def _add_document_metadata(self, node: TextNode, file_path: Path) -> None:
         node.metadata["file_name"] = file_path.name
         node.metadata["document_id"] = self.document_id
         node.metadata["data_source_id"] = self.data_source_id
 
+    @staticmethod
+    def _metadata_str(document: Document) -> str:
+        # the splitter leaves room for the metadata, as it does when splitting documents
+        metadata_str: str = max(
+            document.get_metadata_str(MetadataMode.EMBED),
+            document.get_metadata_str(MetadataMode.LLM),
+            key=len,
+        )
+        return metadata_str
+
+    def _split_in_sections(self, document: Document) -> List[TextNode]:
+        located = split_text(
+            self.splitter,
+            document.text,
+            self._metadata_str(document),
+            Settings().splitting_processes,
+        )
+        nodes: List[TextNode] = build_nodes_from_splits(
+            [text for text, _ in located], document
+        )
+        for node, (text, start) in zip(nodes, located):
+            if start >= 0:
+                node.start_char_idx = start
+                node.end_char_idx = start + len(text)
+        return nodes
+
     def _chunks_in_document(self, document: Document) -> List[TextNode]:
-        chunks = self.splitter.get_nodes_from_documents([document])
+        if len(document.text) >= 2 * SECTION_CHARS:
+            chunks: Sequence[BaseNode] = self._split_in_sections(document)
+        else:
+            chunks = self.splitter.get_nodes_from_documents([document])
 
         for i, chunk in enumerate(chunks):
             chunk.metadata["file_name"] = document.metadata["file_name"]
@@ -38,3 +124,91 @@ class BaseReader(ABC):
             converted_chunks.append(chunk)
 
         return converted_chunks
+
+
+NORMALIZATION_METADATA_KEYS = (
+    "boilerplate_characters_removed",
+    "boilerplate_tokens_removed",
+)
+
+
+class CachedExtraction(ABC):
+    """
+    For readers whose parsing is expensive: they extract the text of a file and chunk the
+    result of extract_cached(), so that re-chunking a document doesn't parse it again.
+    """
+
+    # Bump when extract() changes its output, so that text cached by older versions is ignored
+    extraction_version: ClassVar[int] = 1
+    data_source_id: int
+
+    @abstractmethod
+    def extract(self, file_path: Path) -> ExtractedText:
+        """Extract the text of the file, independent of how it will be chunked."""
+
+    def extractor_name(self) -> str:
+        """Identifies the extraction in the parsed text cache; include anything that changes its output"""
+        return f"{type(self).__name__}:v{self.extraction_version}"
+
+    def extract_cached(self, file_path: Path) -> ExtractedText:
+        cache = get_parsed_text_cache()
+        digest = file_digest(file_path)
+        extractor = self.extractor_name()
+        extracted = cache.get(digest, extractor)
+        if extracted is None:
+            extracted = self.extract(file_path)
+            cache.put(digest, extractor, extracted)
+        return extracted
+
+    def extract_normalized(self, file_path: Path) -> ExtractedText:
+        """
+        The cached text of the file, without repeated headers and footers and runs of whitespace
+        for the data sources that strip boilerplate.
+
+        Normalizing after the cache means that changing its settings doesn't parse files again.
+        """
+        extracted = self.extract_cached(file_path)
+        settings = Settings()
+        if not settings.boilerplate_stripping_by_data_source.get(
+            self.data_source_id, settings.boilerplate_stripping
+        ):
+            return extracted
+        normalized = normalize_pages(
+            extracted.pages, settings.boilerplate_min_pages_fraction
+        )
+        removed_tokens = 0
+        if normalized.characters_removed:
+            removed_tokens = len(get_tokenizer()("\n".join(normalized.removed_lines)))
+            logger.info(
+                "normalizing %s removed %d characters, including %d repeated lines of %d tokens",
+                file_path.name,
+                normalized.characters_removed,
+                len(normalized.removed_lines),
+                removed_tokens,
+            )
+        return ExtractedText(
+            pages=normalized.pages,
+            characters_removed=normalized.characters_removed,
+            tokens_removed=removed_tokens,
+        )
+
+    @staticmethod
+    def _add_normalization_metadata(
+        chunks: Sequence[BaseNode], extracted: ExtractedText
+    ) -> None:
+        """Record on each chunk what normalizing its document removed, if it was normalized"""
+        if extracted.characters_removed is None:
+            return
+        for chunk in chunks:
+            chunk.metadata["boilerplate_characters_removed"] = (
+                extracted.characters_removed
+            )
+            chunk.metadata["boilerplate_tokens_removed"] = extracted.tokens_removed
+            # for querying the index, not part of what's embedded or shown to the LLM
+            for excluded_keys in (
+                chunk.excluded_embed_metadata_keys,
+                chunk.excluded_llm_metadata_keys,
+            ):
+                for key in NORMALIZATION_METADATA_KEYS:
+                    if key not in excluded_keys:
+                        excluded_keys.append(key)
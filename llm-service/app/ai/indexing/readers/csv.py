@@ -36,55 +36,97 @@
 #  DATA.
 #
 
-import io
-import json
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Tuple
 
 import pandas as pd
-from llama_index.core.node_parser.interface import MetadataAwareTextSplitter
-from llama_index.core.schema import Document, TextNode
+from llama_index.core.schema import (
+    NodeRelationship,
+    ObjectType,
+    RelatedNodeInfo,
+    TextNode,
+)
+from llama_index.core.utils import get_tokenizer
 
+from ....config import Settings
 from .base_reader import BaseReader
 
+# Rows parsed at a time, which bounds memory regardless of the size of the file.
+ROWS_PER_READ = 10_000
 
-class _CsvSplitter(MetadataAwareTextSplitter):
-    def split_text_metadata_aware(self, text: str, metadata_str: str) -> List[str]:
-        return self.split_text(text)
 
-    def split_text(self, text: str) -> List[str]:
-        buffer = io.StringIO(text)
-        # Read the CSV file into a pandas DataFrame
-        df = pd.read_csv(buffer)
-        # Convert the dataframe into a list of dictionaries, one per row
-        rows = df.to_dict(orient="records")
-        # Convert each dictionary into a chunk
-        return [json.dumps(row, sort_keys=True) for row in rows]
+class CSVReader(BaseReader):
+    """
+    One chunk per row, the row serialized as JSON with its columns sorted.
 
+    With ``csv_group_rows`` set, consecutive rows are instead packed into chunks of up to the
+    splitter's chunk size in tokens, one row per line, and ``row_number``/``row_number_end``
+    give the range of rows in each chunk.
+    """
 
-class CSVReader(BaseReader):
-    def load_chunks(self, file_path: Path) -> List[TextNode]:
-        # Create the base document
-        with open(file_path, "r") as f:
-            content = f.read()
-        document = Document(text=content)
-        document.id_ = self.document_id
-        self._add_document_metadata(document, file_path)
+    parse_in_subprocess = True
 
-        local_splitter = _CsvSplitter()
+    def load_chunks(self, file_path: Path) -> List[TextNode]:
+        return list(self.iter_chunks(file_path))
 
-        rows = local_splitter.get_nodes_from_documents([document])
+    def iter_chunks(self, file_path: Path) -> Iterator[TextNode]:
+        rows = self._rows(file_path)
+        group_rows = Settings().csv_group_rows
+        if group_rows:
+            groups = self._group_rows(rows)
+        else:
+            groups = ((row_number, row_number, row) for row_number, row in rows)
+        for i, (first_row, last_row, text) in enumerate(groups):
+            chunk = TextNode(
+                text=text,
+                relationships={
+                    NodeRelationship.SOURCE: RelatedNodeInfo(
+                        node_id=self.document_id, node_type=ObjectType.DOCUMENT
+                    )
+                },
+            )
+            self._add_document_metadata(chunk, file_path)
+            chunk.metadata["chunk_number"] = i
+            chunk.metadata["row_number"] = first_row
+            if group_rows:
+                chunk.metadata["row_number_end"] = last_row
+            yield chunk
 
-        for i, row in enumerate(rows):
-            row.metadata["file_name"] = document.metadata["file_name"]
-            row.metadata["document_id"] = document.metadata["document_id"]
-            row.metadata["data_source_id"] = document.metadata["data_source_id"]
-            row.metadata["chunk_number"] = i
-            row.metadata["row_number"] = i + 1
+    @staticmethod
+    def _rows(file_path: Path) -> Iterator[Tuple[int, str]]:
+        row_number = 1
+        with pd.read_csv(file_path, chunksize=ROWS_PER_READ) as frames:
+            for frame in frames:
+                for row in CSVReader._serialize(frame):
+                    yield row_number, row
+                    row_number += 1
 
-        converted_rows: List[TextNode] = []
-        for row in rows:
-            assert isinstance(row, TextNode)
-            converted_rows.append(row)
+    @staticmethod
+    def _serialize(frame: pd.DataFrame) -> List[str]:
+        # one JSON object per line, serialized by pandas rather than row by row in Python
+        lines: str = frame[sorted(frame.columns, key=str)].to_json(
+            orient="records", lines=True, double_precision=15, date_format="iso"
+        )
+        return lines.replace("\\/", "/").splitlines()
 
-        return converted_rows
+    def _group_rows(
+        self, rows: Iterator[Tuple[int, str]]
+    ) -> Iterator[Tuple[int, int, str]]:
+        tokenizer = get_tokenizer()
+        budget = self.splitter.chunk_size
+        group: List[str] = []
+        group_tokens = 0
+        first_row = last_row = 0
+        for row_number, row in rows:
+            # plus one for the newline joining it to the previous row
+            row_tokens = len(tokenizer(row)) + 1
+            if group and group_tokens + row_tokens > budget:
+                yield first_row, last_row, "\n".join(group)
+                group, group_tokens = [], 0
+            if not group:
+                first_row = row_number
+            group.append(row)
+            group_tokens += row_tokens
+            last_row = row_number
+        if group:
+            yield first_row, last_row, "\n".join(group)
@@ -0,0 +1,106 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import functools
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence, Tuple
+
+from llama_index.core.schema import Document
+
+if TYPE_CHECKING:
+    from docling.datamodel.document import ConversionResult
+    from docling.document_converter import DocumentConverter
+
+logger = logging.getLogger(__name__)
+
+
+@functools.cache
+def _converter() -> "DocumentConverter":
+    # imported here because docling pulls in torch, which only PDF parsing needs
+    from docling.document_converter import DocumentConverter
+
+    logger.info("Loading docling models")
+    return DocumentConverter()
+
+
+def convert_to_pages(file_path: Path) -> Optional[List[Document]]:
+    """
+    Convert a PDF to markdown with docling; None if it failed to convert.
+
+    The file becomes one markdown document per page, labelled with its page number like the
+    pages llama-index's PDF reader returns.
+
+    The converter and its layout and OCR models are loaded once per process and reused, so
+    this is cheap to call repeatedly from a long-lived parsing worker.
+    """
+    result = _converter().convert(file_path, raises_on_error=False)
+    return _pages(file_path, result)
+
+
+def convert_all_to_pages(
+    file_paths: Sequence[Path],
+) -> Iterator[Tuple[Path, Optional[List[Document]]]]:
+    """
+    Convert several PDFs in one call, yielding each file's pages as soon as it is converted.
+
+    docling works through the files in batches, which keeps its models busy between files;
+    the pages are the same as convert_to_pages() returns for each file.
+    """
+    if not file_paths:
+        return
+    results = _converter().convert_all(list(file_paths), raises_on_error=False)
+    # docling returns the results in the order of the files
+    for file_path, result in zip(file_paths, results):
+        yield file_path, _pages(file_path, result)
+
+
+def _pages(file_path: Path, result: "ConversionResult") -> Optional[List[Document]]:
+    from docling.datamodel.base_models import ConversionStatus
+
+    if result.status != ConversionStatus.SUCCESS:
+        logger.warning(
+            f"docling could not convert {file_path}: {result.status}, {result.errors}"
+        )
+        return None
+    pages = []
+    for page_no in sorted(result.document.pages):
+        page = Document(text=result.document.export_to_markdown(page_no=page_no))
+        page.metadata["page_label"] = str(page_no)
+        pages.append(page)
+    return pages
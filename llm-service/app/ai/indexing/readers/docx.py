@@ -39,21 +39,30 @@
 from pathlib import Path
 from typing import Any, List
 
-from llama_index.core.schema import TextNode
+from llama_index.core.schema import Document, TextNode
 from llama_index.readers.file import DocxReader as LlamaIndexDocxReader
 
-from .base_reader import BaseReader
+from ....services.parsed_text_cache import ExtractedPage, ExtractedText
+from .base_reader import BaseReader, CachedExtraction
 
 
-class DocxReader(BaseReader):
+class DocxReader(CachedExtraction, BaseReader):
+    parse_in_subprocess = True
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.inner = LlamaIndexDocxReader()
 
-    def load_chunks(self, file_path: Path) -> List[TextNode]:
+    def extract(self, file_path: Path) -> ExtractedText:
         documents = self.inner.load_data(file_path)
         assert len(documents) == 1
-        document = documents[0]
+        return ExtractedText(pages=[ExtractedPage(label="", text=documents[0].text)])
+
+    def load_chunks(self, file_path: Path) -> List[TextNode]:
+        extracted = self.extract_normalized(file_path)
+        document = Document(text=extracted.text)
         document.id_ = self.document_id
         self._add_document_metadata(document, file_path)
-        return self._chunks_in_document(document)
+        chunks = self._chunks_in_document(document)
+        self._add_normalization_metadata(chunks, extracted)
+        return chunks
@@ -0,0 +1,121 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import functools
+import hashlib
+import io
+import logging
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence
+
+from ....services.parsed_text_cache import get_parsed_text_cache
+
+if TYPE_CHECKING:
+    from PIL.Image import Image
+
+logger = logging.getLogger(__name__)
+
+# The model llama-index's PptxReader captions slide images with
+CAPTION_MODEL = "nlpconnect/vit-gpt2-image-captioning"
+# Images captioned by one call to the model
+CAPTION_BATCH_SIZE = 16
+
+
+@functools.cache
+def _model() -> Dict[str, Any]:
+    # imported here because transformers pulls in torch, which only captioning needs
+    from llama_index.core.utils import infer_torch_device
+    from transformers import (
+        AutoTokenizer,
+        VisionEncoderDecoderModel,
+        ViTFeatureExtractor,
+    )
+
+    logger.info("Loading image captioning model %s", CAPTION_MODEL)
+    device = infer_torch_device()
+    model = VisionEncoderDecoderModel.from_pretrained(CAPTION_MODEL)
+    model.to(device)
+    return {
+        "model": model,
+        "feature_extractor": ViTFeatureExtractor.from_pretrained(CAPTION_MODEL),
+        "tokenizer": AutoTokenizer.from_pretrained(CAPTION_MODEL),
+        "device": device,
+    }
+
+
+def _open_rgb(blob: bytes) -> "Image":
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(blob))
+    if image.mode != "RGB":
+        image = image.convert(mode="RGB")
+    return image
+
+
+def _caption_batch(blobs: Sequence[bytes]) -> List[str]:
+    parts = _model()
+    pixel_values = parts["feature_extractor"](
+        images=[_open_rgb(blob) for blob in blobs], return_tensors="pt"
+    ).pixel_values.to(parts["device"])
+    # the same generation settings as llama-index's PptxReader
+    output_ids = parts["model"].generate(pixel_values, max_length=16, num_beams=4)
+    predictions = parts["tokenizer"].batch_decode(output_ids, skip_special_tokens=True)
+    return [prediction.strip() for prediction in predictions]
+
+
+def caption_images(blobs: Sequence[bytes]) -> List[str]:
+    """
+    Caption images, in order.
+
+    Captions are cached by the hash of the image, so logos and backgrounds repeated across
+    slides and decks are only captioned once. The rest are captioned in batches.
+    """
+    cache = get_parsed_text_cache()
+    digests = [hashlib.sha256(blob).hexdigest() for blob in blobs]
+    captions = dict(zip(digests, cache.get_captions(CAPTION_MODEL, digests)))
+
+    missing = {
+        digest: blob for digest, blob in zip(digests, blobs) if captions[digest] is None
+    }
+    missing_digests = list(missing)
+    for start in range(0, len(missing_digests), CAPTION_BATCH_SIZE):
+        batch = missing_digests[start : start + CAPTION_BATCH_SIZE]
+        new_captions = _caption_batch([missing[digest] for digest in batch])
+        cache.put_captions(CAPTION_MODEL, list(zip(batch, new_captions)))
+        captions.update(zip(batch, new_captions))
+
+    return [captions[digest] or "" for digest in digests]
@@ -37,19 +37,302 @@
 #
 
 import json
+import re
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Iterable, Iterator, List, Optional, TextIO, Tuple
 
-from llama_index.core.schema import Document, TextNode
+from llama_index.core.schema import (
+    NodeRelationship,
+    ObjectType,
+    RelatedNodeInfo,
+    TextNode,
+)
+from llama_index.core.utils import get_tokenizer
 
+from ..splitting import get_sentence_splitter
 from .base_reader import BaseReader
 
+READ_SIZE = 1 << 16
+# Containers whose serialized size passes this many characters per token of the chunk size
+# are walked element by element instead of being loaded whole.
+CHARS_PER_TOKEN_BEFORE_STREAMING = 8
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_TOKEN = re.compile(
+    r'\s*(?:("[^"\\]*(?:\\.[^"\\]*)*")|([\[\]{}:,])|([^\s\[\]{}:,"]+))', re.DOTALL
+)
+
+# (JSON path, value)
+_Unit = Tuple[str, Any]
+# Where a value's JSON is in a serialized document: (start, end, [(key, member span)])
+_Span = Tuple[int, int, List[Tuple[Any, Any]]]
+
+
+def _child_path(path: str, key: Any) -> str:
+    if isinstance(key, int):
+        return f"{path}[{key}]"
+    if _IDENTIFIER.match(key):
+        return f"{path}.{key}"
+    return f"{path}[{json.dumps(key)}]"
+
+
+def _serialize(value: Any, parts: List[str], offset: int) -> _Span:
+    """
+    Append ``json.dumps(value, sort_keys=True)`` to ``parts``, starting at ``offset``, and
+    return where the value and each of its members ended up in it.
+    """
+    if isinstance(value, (dict, list)) and value:
+        is_object = isinstance(value, dict)
+        members: Iterable[Tuple[Any, Any]] = (
+            sorted(value.items()) if isinstance(value, dict) else enumerate(value)
+        )
+        parts.append("{" if is_object else "[")
+        position = offset + 1
+        spans: List[Tuple[Any, _Span]] = []
+        for i, (key, member) in enumerate(members):
+            separator = ", " if i else ""
+            if is_object:
+                separator += json.dumps(key) + ": "
+            parts.append(separator)
+            span = _serialize(member, parts, position + len(separator))
+            spans.append((key, span))
+            position = span[1]
+        parts.append("}" if is_object else "]")
+        return offset, position + 1, spans
+    serialized = json.dumps(value)
+    parts.append(serialized)
+    return offset, offset + len(serialized), []
+
+
+def _tokens(f: TextIO) -> Iterator[Tuple[str, str]]:
+    """JSON tokens, as (group, text), read from the file a block at a time."""
+    buffer = ""
+    position = 0
+    eof = False
+    while True:
+        match = _TOKEN.match(buffer, position)
+        # a token that reaches the end of the buffer may continue in the next block
+        if (match is None or match.end() == len(buffer)) and not eof:
+            buffer = buffer[position:]
+            position = 0
+            # grow the reads with the buffer, so that huge strings aren't rescanned too often
+            block = f.read(max(READ_SIZE, len(buffer)))
+            eof = not block
+            buffer += block
+            continue
+        if match is None:
+            rest = buffer[position:]
+            if rest.strip():
+                raise ValueError(f"Invalid JSON near {rest[:50]!r}")
+            return
+        position = match.end()
+        string, punctuation, literal = match.groups()
+        if string is not None:
+            yield "string", string
+        elif punctuation is not None:
+            yield "punctuation", punctuation
+        else:
+            yield "literal", literal
+
+
+class _Container:
+    def __init__(self, path: str, is_object: bool):
+        self.path = path
+        self.is_object = is_object
+        self.key: Optional[str] = None
+        self.index = 0
+        # completed members, kept until the container is known to be small enough to load
+        self.members: List[Tuple[Any, str, Any]] = []
+        self.size = 0
+        self.streaming = False
+
+    def child_path(self) -> str:
+        if self.is_object:
+            assert self.key is not None
+            return _child_path(self.path, self.key)
+        return _child_path(self.path, self.index)
+
+    def value(self) -> Any:
+        if self.is_object:
+            return {key: value for key, _, value in self.members}
+        return [value for _, _, value in self.members]
+
+
+def _units(tokens: Iterator[Tuple[str, str]], max_chars: int) -> Iterator[_Unit]:
+    """
+    Split a JSON document into (path, value) units in document order.
+
+    Containers are loaded whole while they stay under ``max_chars``. Past that, the members
+    loaded so far are emitted as units and the rest of the container is walked incrementally,
+    so memory is bounded by ``max_chars`` rather than by the size of the document.
+    """
+    stack: List[_Container] = []
+
+    def complete(path: str, value: Any, size: int) -> Iterator[_Unit]:
+        if not stack:
+            yield path, value
+            return
+        parent = stack[-1]
+        if parent.streaming:
+            yield path, value
+        else:
+            parent.members.append(
+                (parent.key if parent.is_object else parent.index, path, value)
+            )
+            parent.size += size
+            if parent.size > max_chars:
+                # every enclosing container is too large to load as well
+                for container in stack:
+                    if not container.streaming:
+                        container.streaming = True
+                        for _, member_path, member in container.members:
+                            yield member_path, member
+                        container.members = []
+        parent.key = None
+        parent.index += 1
+
+    for group, text in tokens:
+        if group == "punctuation":
+            if text in "[{":
+                path = stack[-1].child_path() if stack else "$"
+                stack.append(_Container(path, is_object=text == "{"))
+            elif text in "]}":
+                container = stack.pop()
+                if not container.streaming:
+                    yield from complete(
+                        container.path, container.value(), container.size + 2
+                    )
+                elif stack:
+                    stack[-1].key = None
+                    stack[-1].index += 1
+        elif (
+            group == "string"
+            and stack
+            and stack[-1].is_object
+            and stack[-1].key is None
+        ):
+            stack[-1].key = json.loads(text)
+        else:
+            path = stack[-1].child_path() if stack else "$"
+            yield from complete(path, json.loads(text), len(text))
+
 
 class JSONReader(BaseReader):
+    """
+    Chunks JSON and JSON Lines files along their structure.
+
+    Each chunk holds one or more consecutive values, one per line as ``<JSON path>: <JSON>``,
+    up to the splitter's chunk size in tokens. Values too large for a chunk are split into
+    their members, and single values, such as long strings, into sentences. ``json_path`` (and ``json_path_end`` for several values) record where in
+    the document the chunk comes from. A document small enough for a single chunk is kept
+    as one chunk of its JSON, as before.
+    """
+
+    parse_in_subprocess = True
+
     def load_chunks(self, file_path: Path) -> List[TextNode]:
+        return list(self.iter_chunks(file_path))
+
+    def iter_chunks(self, file_path: Path) -> Iterator[TextNode]:
+        budget = self.splitter.chunk_size
+        tokenizer = get_tokenizer()
+
+        def count_tokens(text: str) -> int:
+            return len(tokenizer(text))
+
         with open(file_path, "r") as f:
-            content = json.load(f)
-        document = Document(text=json.dumps(content, sort_keys=True))
-        document.id_ = self.document_id
-        self._add_document_metadata(document, file_path)
-        return [document]
+            if file_path.suffix == ".jsonl":
+                units: Iterator[_Unit] = self._jsonl_units(f)
+            else:
+                units = _units(_tokens(f), budget * CHARS_PER_TOKEN_BEFORE_STREAMING)
+            lines = (
+                line
+                for path, value in units
+                for line in self._lines(path, value, budget, count_tokens)
+            )
+            yield from self._chunks(lines, budget, file_path)
+
+    @staticmethod
+    def _jsonl_units(f: TextIO) -> Iterator[_Unit]:
+        index = 0
+        for line in f:
+            if line.strip():
+                yield f"$[{index}]", json.loads(line)
+                index += 1
+
+    def _lines(
+        self,
+        path: str,
+        value: Any,
+        budget: int,
+        count_tokens: Callable[[str], int],
+    ) -> Iterator[Tuple[str, str, int]]:
+        parts: List[str] = []
+        span = _serialize(value, parts, 0)
+        yield from self._span_lines(path, "".join(parts), span, budget, count_tokens)
+
+    def _span_lines(
+        self,
+        path: str,
+        serialized: str,
+        span: _Span,
+        budget: int,
+        count_tokens: Callable[[str], int],
+    ) -> Iterator[Tuple[str, str, int]]:
+        start, end, members = span
+        prefix = "" if path == "$" else f"{path}: "
+        line = prefix + serialized[start:end]
+        tokens = count_tokens(line)
+        if tokens <= budget:
+            yield path, line, tokens
+        elif members:
+            for key, member in members:
+                yield from self._span_lines(
+                    _child_path(path, key), serialized, member, budget, count_tokens
+                )
+        else:
+            # a single value, such as a long string, is split like prose under its path
+            size = max(budget - count_tokens(prefix), 1)
+            splitter = get_sentence_splitter(
+                size, min(self.splitter.chunk_overlap, size // 2)
+            )
+            for piece in splitter.split_text(serialized[start:end]):
+                piece_line = prefix + piece
+                yield path, piece_line, count_tokens(piece_line)
+
+    def _chunks(
+        self, lines: Iterator[Tuple[str, str, int]], budget: int, file_path: Path
+    ) -> Iterator[TextNode]:
+        chunk_lines: List[str] = []
+        paths: List[str] = []
+        chunk_tokens = 0
+        chunk_number = 0
+        for path, line, tokens in lines:
+            # plus one for the newline joining it to the previous line
+            if chunk_lines and chunk_tokens + tokens + 1 > budget:
+                yield self._chunk(chunk_lines, paths, chunk_number, file_path)
+                chunk_number += 1
+                chunk_lines, paths, chunk_tokens = [], [], 0
+            chunk_lines.append(line)
+            paths.append(path)
+            chunk_tokens += tokens + 1
+        if chunk_lines:
+            yield self._chunk(chunk_lines, paths, chunk_number, file_path)
+
+    def _chunk(
+        self, lines: List[str], paths: List[str], chunk_number: int, file_path: Path
+    ) -> TextNode:
+        chunk = TextNode(
+            text="\n".join(lines),
+            relationships={
+                NodeRelationship.SOURCE: RelatedNodeInfo(
+                    node_id=self.document_id, node_type=ObjectType.DOCUMENT
+                )
+            },
+        )
+        self._add_document_metadata(chunk, file_path)
+        chunk.metadata["chunk_number"] = chunk_number
+        chunk.metadata["json_path"] = paths[0]
+        if len(paths) > 1:
+            chunk.metadata["json_path_end"] = paths[-1]
+        return chunk
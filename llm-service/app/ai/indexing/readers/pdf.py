@@ -35,25 +35,35 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
+import bisect
 import logging
 import os
-import subprocess
 from pathlib import Path
-from subprocess import CompletedProcess
-from typing import Any, List
+from typing import Iterator, List
 
 from llama_index.core.schema import Document, TextNode
-from llama_index.readers.file import PDFReader as LlamaIndexPDFReader
 
-from .base_reader import BaseReader
-from .simple_file import SimpleFileReader
+from ....config import Settings
+from ....services.parsed_text_cache import (
+    ExtractedText,
+    file_digest,
+    get_parsed_text_cache,
+)
+from .base_reader import BaseReader, CachedExtraction
+from .pdf_engines import (
+    DoclingEngine,
+    engine_names,
+    extract_all_with_docling,
+    extract_with_docling_where_needed,
+    extract_with_fallback,
+)
 
 logger = logging.getLogger(__name__)
 
 
 class PageTracker:
     def __init__(self, pages: List[Document]) -> None:
-        self.page_numbers = [page.metadata["page_label"] for page in pages]
+        self.page_numbers: List[str] = [page.metadata["page_label"] for page in pages]
         self.page_contents: List[str] = [page.text for page in pages]
         self.page_start_index: List[int] = [0]
         for i, text in enumerate(self.page_contents):
@@ -72,13 +82,11 @@ class PageTracker:
             )
 
     def _find_page_number(self, start_index: int) -> str:
-        last_good_page_number = ""
-        for j, page_start in enumerate(self.page_start_index):
-            if start_index >= page_start:
-                last_good_page_number = self.page_numbers[j]
-            else:
-                break
-        return last_good_page_number
+        # the last page starting at or before the index; the final entry only marks the end
+        page = bisect.bisect_right(self.page_start_index, start_index) - 1
+        if page < 0:
+            return ""
+        return self.page_numbers[min(page, len(self.page_numbers) - 1)]
 
     def populate_chunk_page_numbers(self, chunks: List[TextNode]) -> None:
         for chunk in chunks:
@@ -86,58 +94,107 @@ class PageTracker:
             if chunk_start is not None:
                 chunk_label = self._find_page_number(chunk_start)
                 chunk.metadata["page_number"] = chunk_label
+                chunk.metadata["page_start"] = chunk_label
+                chunk_end = chunk.end_char_idx
+                chunk.metadata["page_end"] = (
+                    self._find_page_number(chunk_end - 1)
+                    if chunk_end is not None and chunk_end > chunk_start
+                    else chunk_label
+                )
+                # the span is for citations; leave the embedded text as it was
+                for excluded_keys in (
+                    chunk.excluded_embed_metadata_keys,
+                    chunk.excluded_llm_metadata_keys,
+                ):
+                    for key in ("page_start", "page_end"):
+                        if key not in excluded_keys:
+                            excluded_keys.append(key)
+
+
+def docling_enabled() -> bool:
+    return os.getenv("USE_ENHANCED_PDF_PROCESSING", "false").lower() == "true"
+
 
+class PDFReader(CachedExtraction, BaseReader):
+    parse_in_subprocess = True
 
-class PDFReader(BaseReader):
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        super().__init__(*args, **kwargs)
-        self.inner = LlamaIndexPDFReader(return_full_document=False)
-        self.markdown_reader = SimpleFileReader(*args, **kwargs)
+    @classmethod
+    def parsing_pool_name(cls, data_source_id: int) -> str:
+        # docling's models take a lot of memory, so they're only loaded by a few processes
+        if docling_enabled() or engine_names(data_source_id)[0] == DoclingEngine.name:
+            return "docling"
+        return super().parsing_pool_name(data_source_id)
+
+    @classmethod
+    def files_per_parse(cls, data_source_id: int) -> int:
+        # docling converts several PDFs per call; with docling only where needed, each PDF
+        # is first checked for a text layer, so they're parsed one at a time
+        if (
+            not docling_enabled()
+            and engine_names(data_source_id)[0] == DoclingEngine.name
+        ):
+            return Settings().docling_files_per_call
+        return 1
+
+    def prepare_files(self, file_paths: List[Path]) -> Iterator[Path]:
+        if len(file_paths) < 2 or self.files_per_parse(self.data_source_id) < 2:
+            yield from file_paths
+            return
+        cache = get_parsed_text_cache()
+        extractor = self.extractor_name()
+        digests = {file_path: file_digest(file_path) for file_path in file_paths}
+        pending = []
+        for file_path in file_paths:
+            if cache.get(digests[file_path], extractor) is None:
+                pending.append(file_path)
+            else:
+                yield file_path
+        converted = extract_all_with_docling(pending, Settings().pdf_min_chars_per_page)
+        for file_path, pages in converted:
+            # extract_cached() finds what docling converted; anything else is extracted as usual
+            if pages is not None:
+                cache.put(digests[file_path], extractor, ExtractedText(pages=pages))
+            pending.remove(file_path)
+            yield file_path
+        yield from pending
+
+    def extractor_name(self) -> str:
+        engines = engine_names(self.data_source_id)
+        if docling_enabled():
+            engines.append("docling-where-needed")
+        return f"{super().extractor_name()}:{'+'.join(engines)}"
+
+    def extract(self, file_path: Path) -> ExtractedText:
+        settings = Settings()
+        names = engine_names(self.data_source_id)
+        if docling_enabled():
+            pages = extract_with_docling_where_needed(
+                file_path,
+                names,
+                settings.pdf_min_chars_per_page,
+                settings.pdf_text_layer_sample_pages,
+            )
+        else:
+            pages = extract_with_fallback(
+                file_path, names, settings.pdf_min_chars_per_page
+            )
+        return ExtractedText(pages=pages)
 
     def load_chunks(self, file_path: Path) -> list[TextNode]:
         logger.debug(f"{file_path=}")
-        chunks: list[TextNode] = self.process_with_docling(file_path)
-        if chunks:
-            return chunks
+        extracted = self.extract_normalized(file_path)
+        pages: List[Document] = []
+        for page in extracted.pages:
+            page_document = Document(text=page.text)
+            page_document.metadata["page_label"] = page.label
+            pages.append(page_document)
 
-        pages: list[Document] = self.inner.load_data(file_path)
         page_counter = PageTracker(pages)
         document = Document(text=page_counter.document_text)
         document.id_ = self.document_id
         self._add_document_metadata(document, file_path)
         chunks = self._chunks_in_document(document)
         page_counter.populate_chunk_page_numbers(chunks)
+        self._add_normalization_metadata(chunks, extracted)
 
         return chunks
-
-    def process_with_docling(self, file_path: Path) -> list[TextNode] | None:
-        docling_enabled = (
-            os.getenv("USE_ENHANCED_PDF_PROCESSING", "false").lower() == "true"
-        )
-        if not docling_enabled:
-            return None
-        directory = file_path.parent
-        logger.debug(f"{directory=}")
-        with open("docling-output.txt", "a") as f:
-            process: CompletedProcess[bytes] = subprocess.run(
-                [
-                    "docling",
-                    "-v",
-                    "--image-export-mode=placeholder",
-                    "--abort-on-error",
-                    f"--output={directory}",
-                    str(file_path),
-                ],
-                stdout=f,
-                stderr=f,
-            )
-        logger.info(f"docling return code = {process.returncode}")
-        # todo: figure out page numbers & look into the docling llama-index integration
-        markdown_file_path = file_path.with_suffix(".md")
-        if process.returncode == 0 and markdown_file_path.exists():
-            # update chunk metadata to point at the original pdf
-            chunks = self.markdown_reader.load_chunks(markdown_file_path)
-            for chunk in chunks:
-                chunk.metadata["file_name"] = file_path.name
-            return chunks
-        return None
@@ -0,0 +1,293 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import logging
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import ClassVar, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+import pypdf
+import pypdfium2 as pdfium
+from llama_index.core.schema import Document
+
+from ....config import Settings
+from ....services.parsed_text_cache import ExtractedPage
+from .docling_converter import convert_all_to_pages, convert_to_pages
+from .pdf_text import extract_pages
+
+logger = logging.getLogger(__name__)
+
+# What an engine raises for a PDF it can't read, in which case the next engine is tried.
+# pdfium's and docling's errors are RuntimeErrors.
+ENGINE_ERRORS = (OSError, ValueError, RuntimeError, pypdf.errors.PyPdfError)
+
+
+class PdfEngine(ABC):
+    """Extracts the pages of a PDF as text, labelled like the document labels them."""
+
+    name: ClassVar[str]
+
+    @abstractmethod
+    def extract(self, file_path: Path) -> Optional[List[ExtractedPage]]:
+        """The pages of the file, or None if the engine can't handle it"""
+
+
+class PypdfEngine(PdfEngine):
+    name = "pypdf"
+
+    def extract(self, file_path: Path) -> Optional[List[ExtractedPage]]:
+        return extract_pages(file_path, Settings().pdf_page_processes)
+
+
+class PdfiumEngine(PdfEngine):
+    """PDFium's text layer extraction, which is native code and much faster than pypdf."""
+
+    name = "pypdfium2"
+
+    def extract(self, file_path: Path) -> Optional[List[ExtractedPage]]:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            pages = []
+            for i in range(len(pdf)):
+                page = pdf[i]
+                text_page = page.get_textpage()
+                text = text_page.get_text_range()
+                text_page.close()
+                page.close()
+                pages.append(
+                    ExtractedPage(
+                        # pypdf numbers pages without a label the same way
+                        label=pdf.get_page_label(i) or str(i + 1),
+                        text=text.replace("\r\n", "\n"),
+                    )
+                )
+            return pages
+        finally:
+            pdf.close()
+
+
+class DoclingEngine(PdfEngine):
+    """Layout analysis and OCR with docling's models; slow, but handles scanned documents."""
+
+    name = "docling"
+
+    def extract(self, file_path: Path) -> Optional[List[ExtractedPage]]:
+        return self._extracted(convert_to_pages(file_path))
+
+    def extract_all(
+        self, file_paths: Sequence[Path]
+    ) -> Iterator[Tuple[Path, Optional[List[ExtractedPage]]]]:
+        """The pages of several files converted in one call, each as soon as it's ready"""
+        for file_path, documents in convert_all_to_pages(file_paths):
+            yield file_path, self._extracted(documents)
+
+    @staticmethod
+    def _extracted(
+        documents: Optional[List[Document]],
+    ) -> Optional[List[ExtractedPage]]:
+        if documents is None:
+            return None
+        return [
+            ExtractedPage(label=document.metadata["page_label"], text=document.text)
+            for document in documents
+        ]
+
+
+PDF_ENGINES: Dict[str, Type[PdfEngine]] = {
+    engine.name: engine for engine in (PypdfEngine, PdfiumEngine, DoclingEngine)
+}
+# Engines that only read the text layer, in the order they are tried as fallbacks
+TEXT_LAYER_ENGINES = ["pypdfium2", "pypdf"]
+
+
+def engine_names(data_source_id: int) -> List[str]:
+    """The engines to try for a data source's PDFs, in order."""
+    settings = Settings()
+    configured = settings.pdf_engine_by_data_source.get(
+        data_source_id, settings.pdf_engine
+    )
+    if configured not in PDF_ENGINES:
+        raise ValueError(f"Unknown PDF engine {configured!r}")
+    return [configured] + [name for name in TEXT_LAYER_ENGINES if name != configured]
+
+
+def _chars_per_page(pages: List[ExtractedPage]) -> float:
+    return sum(len(page.text.strip()) for page in pages) / max(len(pages), 1)
+
+
+def extract_with_fallback(
+    file_path: Path, names: List[str], min_chars_per_page: int
+) -> List[ExtractedPage]:
+    """
+    Extract with the first engine that finds enough text.
+
+    An engine that fails or returns less than ``min_chars_per_page`` characters per page on
+    average hands over to the next one. If none finds enough, the pages with the most text
+    are used, so a document that really is empty still gets indexed.
+    """
+    best: Optional[List[ExtractedPage]] = None
+    error: Optional[Exception] = None
+    for name in names:
+        try:
+            pages = PDF_ENGINES[name]().extract(file_path)
+        except ENGINE_ERRORS as e:
+            logger.warning("PDF engine %s failed on %s: %s", name, file_path, e)
+            error = e
+            continue
+        if pages is None:
+            continue
+        if _chars_per_page(pages) >= min_chars_per_page:
+            return pages
+        logger.info(
+            "PDF engine %s found little text in %s; trying the next engine",
+            name,
+            file_path,
+        )
+        if best is None or _chars_per_page(pages) > _chars_per_page(best):
+            best = pages
+    if best is None:
+        if error:
+            raise error
+        raise ValueError(f"No PDF engine could extract {file_path}")
+    return best
+
+
+def extract_all_with_docling(
+    file_paths: Sequence[Path], min_chars_per_page: int
+) -> Iterator[Tuple[Path, Optional[List[ExtractedPage]]]]:
+    """
+    Convert several PDFs with docling in one call, yielding each file as it's converted.
+
+    A file docling fails on or finds too little text in comes with None, and is left to
+    extract_with_fallback(), which tries the text layer engines.
+    """
+    try:
+        for file_path, pages in DoclingEngine().extract_all(file_paths):
+            if pages is not None and _chars_per_page(pages) < min_chars_per_page:
+                pages = None
+            yield file_path, pages
+    except ENGINE_ERRORS as e:
+        logger.warning("docling failed to convert a batch of PDFs: %s", e)
+
+
+def _has_text(page: ExtractedPage, min_chars: int) -> bool:
+    return len(page.text.strip()) >= min_chars
+
+
+def _sample_indexes(page_count: int, sample_pages: int) -> List[int]:
+    if page_count <= sample_pages:
+        return list(range(page_count))
+    # spread across the document, since scanned appendices and covers are common
+    step = (page_count - 1) / max(sample_pages - 1, 1)
+    return sorted({round(i * step) for i in range(sample_pages)})
+
+
+def sampled_pages_have_text(
+    file_path: Path, sample_pages: int, min_chars_per_page: int
+) -> bool:
+    """Whether every page of a sample has a text layer, as a quick check for digital PDFs."""
+    pdf = pdfium.PdfDocument(file_path)
+    try:
+        for i in _sample_indexes(len(pdf), sample_pages):
+            page = pdf[i]
+            text_page = page.get_textpage()
+            text = text_page.get_text_range()
+            text_page.close()
+            page.close()
+            if len(text.strip()) < min_chars_per_page:
+                return False
+        return True
+    finally:
+        pdf.close()
+
+
+def _convert_pages_with_docling(
+    file_path: Path, indexes: List[int]
+) -> Optional[List[ExtractedPage]]:
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        subset_path = Path(tmpdirname, file_path.name)
+        reader = pypdf.PdfReader(file_path)
+        writer = pypdf.PdfWriter()
+        for i in indexes:
+            writer.add_page(reader.pages[i])
+        writer.write(subset_path)
+        return DoclingEngine().extract(subset_path)
+
+
+def extract_with_docling_where_needed(
+    file_path: Path,
+    names: List[str],
+    min_chars_per_page: int,
+    sample_pages: int,
+) -> List[ExtractedPage]:
+    """
+    Extract the text layer, only sending pages that lack one through docling.
+
+    Most PDFs are born digital and have a complete text layer, which a sample of their
+    pages shows without reading the rest. Otherwise the pages without enough text are
+    converted by docling, or the whole document if most of it is scanned.
+    """
+    if sampled_pages_have_text(file_path, sample_pages, min_chars_per_page):
+        return extract_with_fallback(file_path, names, min_chars_per_page)
+
+    pages = extract_with_fallback(file_path, names, 0)
+    missing = [
+        i for i, page in enumerate(pages) if not _has_text(page, min_chars_per_page)
+    ]
+    if not missing:
+        return pages
+    if len(missing) > len(pages) / 2:
+        logger.info("%s is mostly scanned; converting it with docling", file_path)
+        converted = DoclingEngine().extract(file_path)
+        return converted if converted else pages
+
+    logger.info(
+        "converting %d of %d pages of %s with docling",
+        len(missing),
+        len(pages),
+        file_path,
+    )
+    converted = _convert_pages_with_docling(file_path, missing)
+    if converted is None or len(converted) != len(missing):
+        logger.warning("docling could not convert the scanned pages of %s", file_path)
+        return pages
+    for i, page in zip(missing, converted):
+        # keep the document's own page labels, rather than those of the subset
+        pages[i] = ExtractedPage(label=pages[i].label, text=page.text)
+    return pages
@@ -0,0 +1,101 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+"""Text layer extraction from PDFs with pypdf, splitting large documents across processes."""
+
+import logging
+from pathlib import Path
+from typing import List, Tuple
+
+import pypdf
+
+from ....services.parsed_text_cache import ExtractedPage
+from ..helper_processes import map_in_helpers, usable_processes
+
+logger = logging.getLogger(__name__)
+
+# Pages extracted by a process at a time; smaller ranges balance better but reopen the file more often.
+PAGES_PER_TASK = 25
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[Tuple[str, str]]:
+    reader = pypdf.PdfReader(file_path)
+    # page_labels labels every page each time it's read, so only read it once
+    labels = reader.page_labels[start:stop]
+    return [
+        (label, reader.pages[i].extract_text())
+        for label, i in zip(labels, range(start, stop))
+    ]
+
+
+def _page_ranges(page_count: int) -> List[Tuple[int, int]]:
+    return [
+        (start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(0, page_count, PAGES_PER_TASK)
+    ]
+
+
+def extract_pages(file_path: Path, processes: int) -> List[ExtractedPage]:
+    """
+    Extract the text and label of every page, in page order.
+
+    Produces the same pages as llama-index's PDFReader with ``return_full_document=False``.
+    Documents of more than one range of pages are split across up to ``processes`` processes.
+    """
+    page_count = len(pypdf.PdfReader(file_path).pages)
+    ranges = _page_ranges(page_count)
+    processes = usable_processes(processes, len(ranges))
+    if processes <= 1:
+        pages = _extract_page_range(str(file_path), 0, page_count)
+    else:
+        logger.debug(
+            "extracting %d pages of %s in %d processes",
+            page_count,
+            file_path,
+            processes,
+        )
+        # results come in the order of the ranges, whatever order they finish in
+        results = map_in_helpers(
+            _extract_page_range,
+            processes,
+            [str(file_path)] * len(ranges),
+            [start for start, _ in ranges],
+            [stop for _, stop in ranges],
+        )
+        pages = [page for result in results for page in result]
+    return [ExtractedPage(label=label, text=text) for label, text in pages]
@@ -37,23 +37,72 @@
 #
 
 from pathlib import Path
-from typing import Any, List
+from typing import List, Union
 
-from llama_index.core.schema import TextNode
-from llama_index.readers.file import PptxReader as LlamaIndexPptxReader
+from llama_index.core.schema import Document, TextNode
+from pptx import Presentation
 
-from .base_reader import BaseReader
+from ....config import Settings
+from ....services.parsed_text_cache import ExtractedPage, ExtractedText
+from .base_reader import BaseReader, CachedExtraction
+from .image_captioning import caption_images
 
 
-class PptxReader(BaseReader):
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        super().__init__(*args, **kwargs)
-        self.inner = LlamaIndexPptxReader()
+class PptxReader(CachedExtraction, BaseReader):
+    parse_in_subprocess = True
+    extraction_version = 2
+
+    def _captioning(self) -> bool:
+        settings = Settings()
+        return settings.pptx_image_captioning_by_data_source.get(
+            self.data_source_id, settings.pptx_image_captioning
+        )
+
+    def extractor_name(self) -> str:
+        mode = "captions" if self._captioning() else "no-captions"
+        return f"{super().extractor_name()}:{mode}"
+
+    def extract(self, file_path: Path) -> ExtractedText:
+        """
+        The text of every slide, in the format of llama-index's PptxReader.
+
+        Images are collected from all the slides first, so that they can be captioned
+        in batches, and left out when captioning is off.
+        """
+        captioning = self._captioning()
+        # per slide, text and the contents of images that still have to be captioned
+        slides: List[List[Union[str, bytes]]] = []
+        for i, slide in enumerate(Presentation(str(file_path)).slides):
+            parts: List[Union[str, bytes]] = [f"\n\nSlide #{i}: \n"]
+            for shape in slide.shapes:
+                if captioning and hasattr(shape, "image"):
+                    parts.append(shape.image.blob)
+                if hasattr(shape, "text"):
+                    parts.append(f"{shape.text}\n")
+            slides.append(parts)
+
+        captions = iter(
+            caption_images(
+                [part for parts in slides for part in parts if isinstance(part, bytes)]
+            )
+        )
+
+        def slide_text(parts: List[Union[str, bytes]]) -> str:
+            return "".join(
+                part if isinstance(part, str) else f"\n Image: {next(captions)}\n\n"
+                for part in parts
+            )
+
+        # a page per slide, so that lines repeated on every slide can be told apart
+        return ExtractedText(
+            pages=[ExtractedPage(label="", text=slide_text(parts)) for parts in slides]
+        )
 
     def load_chunks(self, file_path: Path) -> List[TextNode]:
-        documents = self.inner.load_data(file_path)
-        assert len(documents) == 1
-        document = documents[0]
+        extracted = self.extract_normalized(file_path)
+        document = Document(text=extracted.text)
         document.id_ = self.document_id
         self._add_document_metadata(document, file_path)
-        return self._chunks_in_document(document)
+        chunks = self._chunks_in_document(document)
+        self._add_normalization_metadata(chunks, extracted)
+        return chunks
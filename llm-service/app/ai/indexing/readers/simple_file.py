@@ -36,18 +36,104 @@
 #  DATA.
 #
 
+import io
 from pathlib import Path
-from typing import List
+from typing import BinaryIO, Iterator, List, TextIO
 
-from llama_index.core.schema import Document, TextNode
+from llama_index.core.schema import (
+    Document,
+    NodeRelationship,
+    ObjectType,
+    RelatedNodeInfo,
+    TextNode,
+)
 
 from .base_reader import BaseReader
 
+# Characters read from the file at a time
+WINDOW_CHARS = 1024 * 1024
+
 
 class SimpleFileReader(BaseReader):
+    reads_streams = True
+
     def load_chunks(self, file_path: Path) -> List[TextNode]:
+        return list(self.iter_chunks(file_path))
+
+    def iter_chunks(self, file_path: Path) -> Iterator[TextNode]:
         with open(file_path, "r") as f:
-            document = Document(text=f.read())
+            yield from self._iter_text_chunks(f, file_path)
+
+    def iter_stream_chunks(
+        self, stream: BinaryIO, file_path: Path
+    ) -> Iterator[TextNode]:
+        # decoded the same way open() decodes the file
+        yield from self._iter_text_chunks(io.TextIOWrapper(stream), file_path)
+
+    def _iter_text_chunks(self, f: TextIO, file_path: Path) -> Iterator[TextNode]:
+        """
+        Split the file a window at a time, so that memory use doesn't depend on its size.
+
+        Every chunk the splitter makes of a window is kept except the last, which the end
+        of the window may have cut short. The next window starts where that chunk started,
+        so sentences are never split at a window edge and chunks still overlap across it.
+        """
+        metadata_str = self._metadata_str(self._empty_document(file_path))
+        chunk_number = 0
+        # where the buffer starts in the file, in characters
+        offset = 0
+        buffer = ""
+        at_end = False
+        while not at_end:
+            window = f.read(WINDOW_CHARS)
+            at_end = len(window) < WINDOW_CHARS
+            buffer += window
+            texts = self.splitter.split_text_metadata_aware(buffer, metadata_str)
+            if not at_end:
+                if len(texts) < 2:
+                    continue
+                texts, next_text = texts[:-1], texts[-1]
+
+            # chunks overlap, so each one starts after the start of the previous one
+            search_from = 0
+            end = 0
+            for text in texts:
+                start = buffer.find(text, search_from)
+                yield self._chunk(text, start, offset, chunk_number, file_path)
+                chunk_number += 1
+                if start >= 0:
+                    search_from = start + 1
+                    end = start + len(text)
+            if at_end:
+                break
+
+            next_start = buffer.find(next_text, search_from)
+            if next_start < 0:
+                # the splitter changed the text; carry on after the last chunk
+                next_start = end
+            offset += next_start
+            buffer = buffer[next_start:]
+
+    def _empty_document(self, file_path: Path) -> Document:
+        document = Document(text="")
         document.id_ = self.document_id
         self._add_document_metadata(document, file_path)
-        return self._chunks_in_document(document)
+        return document
+
+    def _chunk(
+        self, text: str, start: int, offset: int, chunk_number: int, file_path: Path
+    ) -> TextNode:
+        chunk = TextNode(
+            text=text,
+            relationships={
+                NodeRelationship.SOURCE: RelatedNodeInfo(
+                    node_id=self.document_id, node_type=ObjectType.DOCUMENT
+                )
+            },
+        )
+        if start >= 0:
+            chunk.start_char_idx = offset + start
+            chunk.end_char_idx = offset + start + len(text)
+        self._add_document_metadata(chunk, file_path)
+        chunk.metadata["chunk_number"] = chunk_number
+        return chunk
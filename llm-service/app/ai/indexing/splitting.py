@@ -0,0 +1,171 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import functools
+import logging
+from typing import List, Optional, Tuple
+
+from llama_index.core.node_parser import SentenceSplitter
+
+from .helper_processes import map_in_helpers, usable_processes
+
+logger = logging.getLogger(__name__)
+
+# Characters of a document split by one process; documents shorter than two sections are split
+# in the calling process.
+SECTION_CHARS = 256 * 1024
+
+# Chunks after a seam re-split to line the chunks up with those of the section again
+RESYNC_CHUNKS = 16
+
+# A chunk's text and where it starts in the text that was split, or -1 if it isn't found
+LocatedChunk = Tuple[str, int]
+
+
+@functools.cache
+def get_sentence_splitter(
+    chunk_size: int, chunk_overlap: Optional[int] = None
+) -> SentenceSplitter:
+    """
+    A splitter for the chunk configuration, shared by every request that uses it.
+
+    Splitters don't hold any state between calls, so they can be shared across threads.
+    """
+    if chunk_overlap is None:
+        return SentenceSplitter(chunk_size=chunk_size)
+    return SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+
+def _locate(texts: List[str], within: str, offset: int) -> List[LocatedChunk]:
+    located = []
+    # chunks overlap, so each one starts after the start of the previous one
+    search_from = 0
+    for text in texts:
+        start = within.find(text, search_from)
+        if start >= 0:
+            search_from = start + 1
+        located.append((text, offset + start if start >= 0 else -1))
+    return located
+
+
+def _split_section(
+    splitter: SentenceSplitter, text: str, metadata_str: str, offset: int
+) -> List[LocatedChunk]:
+    return _locate(splitter.split_text_metadata_aware(text, metadata_str), text, offset)
+
+
+def _split_section_in_helper(
+    chunk_size: int, chunk_overlap: int, text: str, metadata_str: str, offset: int
+) -> List[LocatedChunk]:
+    # the splitter's tokenizer isn't necessarily picklable, so each helper makes its own
+    splitter = get_sentence_splitter(chunk_size, chunk_overlap)
+    return _split_section(splitter, text, metadata_str, offset)
+
+
+def _section_starts(text: str, section_chars: int) -> List[int]:
+    starts = [0]
+    while len(text) - starts[-1] >= 2 * section_chars:
+        target = starts[-1] + section_chars
+        # prefer a paragraph break; the seams are re-split anyway, so any cut would do
+        paragraph = text.find("\n\n", target, target + section_chars // 2)
+        starts.append(paragraph + 2 if paragraph >= 0 else target)
+    return starts
+
+
+def _stitch(
+    splitter: SentenceSplitter,
+    text: str,
+    metadata_str: str,
+    sections: List[List[LocatedChunk]],
+) -> List[LocatedChunk]:
+    chunks: List[LocatedChunk] = []
+    for section in sections:
+        resync = section[:RESYNC_CHUNKS]
+        if not chunks or not section or any(start < 0 for _, start in resync):
+            chunks.extend(section)
+            continue
+        # Re-split from the start of the last chunk before the seam, which joins the
+        # sentences the seam cut and overlaps the chunks on either side. A chunk depends
+        # only on where it starts, so once a re-split chunk starts where one of the
+        # section's own does, the rest of the section matches splitting the whole text.
+        seam_start = chunks[-1][1]
+        seam_end = resync[-1][1] + len(resync[-1][0])
+        seam = _split_section(
+            splitter, text[seam_start:seam_end], metadata_str, seam_start
+        )
+        section_index = {start: i for i, (_, start) in enumerate(resync)}
+        # the last re-split chunk is cut short by the end of the region
+        for i, (_, start) in enumerate(seam[1:-1], start=1):
+            if start in section_index:
+                chunks[-1:] = seam[:i]
+                chunks.extend(section[section_index[start] :])
+                break
+        else:
+            chunks[-1:] = seam
+            chunks.extend(section[len(resync) :])
+    return chunks
+
+
+def split_text(
+    splitter: SentenceSplitter, text: str, metadata_str: str, processes: int
+) -> List[LocatedChunk]:
+    """
+    Split text into chunks like ``splitter.split_text_metadata_aware``, with their offsets.
+
+    Long texts are cut into sections that are split in parallel and stitched back together
+    by re-splitting the text around each seam, so the chunks normally match splitting the
+    whole text in one piece. If they don't line up within RESYNC_CHUNKS chunks of a seam,
+    the chunks after it are cut at different sentences, but still overlap the same way.
+    """
+    starts = _section_starts(text, SECTION_CHARS)
+    processes = usable_processes(processes, len(starts))
+    if processes <= 1:
+        return _split_section(splitter, text, metadata_str, 0)
+
+    logger.debug("splitting %d characters in %d processes", len(text), processes)
+    ends = starts[1:] + [len(text)]
+    sections = map_in_helpers(
+        _split_section_in_helper,
+        processes,
+        [splitter.chunk_size] * len(starts),
+        [splitter.chunk_overlap] * len(starts),
+        [text[start:end] for start, end in zip(starts, ends)],
+        [metadata_str] * len(starts),
+        starts,
+    )
+    return _stitch(splitter, text, metadata_str, sections)
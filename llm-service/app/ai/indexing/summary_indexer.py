@@ -41,7 +41,7 @@ import os
 import shutil
 from pathlib import Path
 from threading import Lock
-from typing import Any, Dict, Optional, cast
+from typing import Any, Dict, List, Optional, cast
 
 from llama_index.core import (
     DocumentSummaryIndex,
@@ -55,12 +55,14 @@ from llama_index.core.response_synthesizers import ResponseMode
 from llama_index.core.schema import (
     Document,
     NodeRelationship,
+    TextNode,
 )
 
 from app.services.models import get_noop_embedding_model
 
 from ...config import Settings
 from .base import get_reader_class
+from .parsing_pool import iter_file_chunks
 
 logger = logging.getLogger(__name__)
 
@@ -133,21 +135,39 @@ class SummaryIndexer:
             doc_summary_index = self.__init_summary_store(persist_dir)
             return doc_summary_index
 
-    def index_file(self, file_path: Path, document_id: str) -> None:
-        logger.debug(f"Creating summary for file {file_path}")
-
+    def parse_file(self, file_path: Path, document_id: str) -> List[TextNode]:
         reader_cls = get_reader_class(file_path)
 
-        reader = reader_cls(
-            splitter=self.splitter,
-            document_id=document_id,
-            data_source_id=self.data_source_id,
-        )
-
         logger.debug(f"Parsing file: {file_path}")
 
-        chunks = reader.load_chunks(file_path)
+        return list(
+            iter_file_chunks(
+                reader_cls,
+                self.splitter,
+                document_id,
+                self.data_source_id,
+                file_path,
+            )
+        )
 
+    def split_text(
+        self, text: str, file_path: Path, document_id: str
+    ) -> List[TextNode]:
+        """Chunks of a document's text that has already been parsed, e.g. by the embedding indexer."""
+        document = Document(text=text)
+        document.id_ = document_id
+        document.metadata["file_name"] = file_path.name
+        document.metadata["document_id"] = document_id
+        document.metadata["data_source_id"] = self.data_source_id
+        chunks = self.splitter.get_nodes_from_documents([document])
+        converted_chunks: List[TextNode] = []
+        for i, chunk in enumerate(chunks):
+            assert isinstance(chunk, TextNode)
+            chunk.metadata["chunk_number"] = i
+            converted_chunks.append(chunk)
+        return converted_chunks
+
+    def index_chunks(self, chunks: List[TextNode], document_id: str) -> None:
         with _write_lock:
             persist_dir = self.__persist_dir()
             summary_store = self.__summary_indexer(persist_dir)
@@ -156,6 +176,11 @@ class SummaryIndexer:
 
             self.__update_global_summary_store(summary_store, added_node_id=document_id)
 
+    def index_file(self, file_path: Path, document_id: str) -> None:
+        logger.debug(f"Creating summary for file {file_path}")
+
+        self.index_chunks(self.parse_file(file_path, document_id), document_id)
+
         logger.debug(f"Summary for file {file_path} created")
 
     def __update_global_summary_store(
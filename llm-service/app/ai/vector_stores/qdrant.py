@@ -35,30 +35,114 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
+import asyncio
 import logging
 import os
-from typing import List, Optional, cast
+import threading
+from typing import Any, Dict, List, Optional, Set, Union, cast
 
+import httpx
+import numpy as np
+import numpy.typing as npt
 import qdrant_client
 import umap
 from llama_index.core.base.embeddings.base import BaseEmbedding
 from llama_index.core.indices import VectorStoreIndex
+from llama_index.core.schema import TextNode
 from llama_index.core.vector_stores.types import BasePydanticVectorStore
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
 from llama_index.vector_stores.qdrant import (
     QdrantVectorStore as LlamaIndexQdrantVectorStore,
 )
-from qdrant_client.http.models import CountResult, Record
+from qdrant_client.http.exceptions import ApiException
+from qdrant_client.http.models import (
+    CountResult,
+    Distance,
+    FieldCondition,
+    Filter,
+    MatchValue,
+    OverwritePayloadOperation,
+    PayloadSchemaType,
+    PointIdsList,
+    Record,
+    SetPayload,
+    VectorParams,
+)
 
+from ...config import Settings
 from ...services import data_sources_metadata_api, models
+from ...services.embedding_cache import QueryCachingEmbedding
 from .vector_store import VectorStore
 
 logger = logging.getLogger(__name__)
 
+# Points per request when uploading chunks.
+UPLOAD_BATCH_SIZE = 256
+# Payload fields used to select a document's chunks: ours, and the one llama-index deletes by.
+DOCUMENT_PAYLOAD_FIELDS = ("document_id", "doc_id")
+
 
 def new_qdrant_client() -> qdrant_client.QdrantClient:
     host = os.environ.get("QDRANT_HOST", "localhost")
     port = 6333
-    return qdrant_client.QdrantClient(host=host, port=port)
+    settings = Settings()
+    return qdrant_client.QdrantClient(
+        host=host,
+        port=port,
+        grpc_port=settings.qdrant_grpc_port,
+        prefer_grpc=settings.qdrant_prefer_grpc,
+        # qdrant-client turns keep-alive off for localhost, which opens a connection per call
+        limits=httpx.Limits(
+            max_connections=settings.qdrant_max_connections,
+            max_keepalive_connections=settings.qdrant_max_connections,
+        ),
+    )
+
+
+_shared_client: Optional[qdrant_client.QdrantClient] = None
+_shared_client_lock = threading.Lock()
+
+
+def get_qdrant_client() -> qdrant_client.QdrantClient:
+    """
+    The client shared by every vector store in the process, and its connection pool.
+
+    The app opens it on startup; anything else running outside the app opens it on first use.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = new_qdrant_client()
+        return _shared_client
+
+
+def close_qdrant_client() -> None:
+    global _shared_client
+    with _shared_client_lock:
+        client, _shared_client = _shared_client, None
+    if client is not None:
+        client.close()
+
+
+def qdrant_is_healthy() -> bool:
+    try:
+        get_qdrant_client().get_collections()
+        return True
+    except (ApiException, httpx.HTTPError):
+        return False
+
+
+async def watch_qdrant_health(interval_seconds: float) -> None:
+    """Check Qdrant periodically, and log when it goes down and comes back."""
+    healthy = True
+    while True:
+        is_healthy = await asyncio.to_thread(qdrant_is_healthy)
+        if healthy and not is_healthy:
+            logger.warning("Qdrant is not reachable")
+        elif is_healthy and not healthy:
+            logger.info("Qdrant is reachable again")
+        healthy = is_healthy
+        await asyncio.sleep(interval_seconds)
 
 
 class QdrantVectorStore(VectorStore):
@@ -88,14 +172,19 @@ class QdrantVectorStore(VectorStore):
         data_source_id: int,
         client: Optional[qdrant_client.QdrantClient] = None,
     ):
-        self.client = client or new_qdrant_client()
+        self.client = client or get_qdrant_client()
         self.table_name = table_name
+        # name of the dense vector in the collection; None for an unnamed vector
+        self._vector_name: Optional[str] = None
+        self._collection_checked = False
         self.data_source_metadata = data_sources_metadata_api.get_metadata(
             data_source_id
         )
 
     def get_embedding_model(self) -> BaseEmbedding:
-        return models.get_embedding_model(self.data_source_metadata.embedding_model)
+        return QueryCachingEmbedding(
+            models.get_embedding_model(self.data_source_metadata.embedding_model)
+        )
 
     def size(self) -> Optional[int]:
         """If the collection does not exist, return None."""
@@ -107,6 +196,7 @@ class QdrantVectorStore(VectorStore):
     def delete(self) -> None:
         if self.exists():
             self.client.delete_collection(self.table_name)
+        self._collection_checked = False
 
     def delete_document(self, document_id: str) -> None:
         if self.exists():
@@ -116,6 +206,130 @@ class QdrantVectorStore(VectorStore):
             )
             index.delete_ref_doc(document_id)
 
+    def get_document_chunk_ids(self, document_id: str) -> Set[str]:
+        if not self.exists():
+            return set()
+        document_filter = Filter(
+            must=[
+                FieldCondition(key="document_id", match=MatchValue(value=document_id))
+            ]
+        )
+        chunk_ids: Set[str] = set()
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                self.table_name,
+                scroll_filter=document_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            chunk_ids.update(str(record.id) for record in records)
+            if offset is None:
+                return chunk_ids
+
+    @staticmethod
+    def _payload(chunk: TextNode) -> Dict[str, Any]:
+        # the same payload llama-index writes, so its retriever can rebuild the nodes
+        payload: Dict[str, Any] = node_to_metadata_dict(
+            chunk, remove_text=False, flat_metadata=False
+        )
+        return payload
+
+    def get_chunks_with_changed_metadata(
+        self, chunks: List[TextNode]
+    ) -> List[TextNode]:
+        if not chunks or not self.exists():
+            return []
+        records = self.client.retrieve(
+            self.table_name,
+            ids=[chunk.node_id for chunk in chunks],
+            with_payload=True,
+            with_vectors=False,
+        )
+        stored = {str(record.id): record.payload for record in records}
+        return [
+            chunk
+            for chunk in chunks
+            if stored.get(chunk.node_id) != self._payload(chunk)
+        ]
+
+    def update_chunk_metadata(self, chunks: List[TextNode], wait: bool = True) -> None:
+        if not chunks:
+            return
+        self.client.batch_update_points(
+            self.table_name,
+            update_operations=[
+                OverwritePayloadOperation(
+                    overwrite_payload=SetPayload(
+                        payload=self._payload(chunk), points=[chunk.node_id]
+                    )
+                )
+                for chunk in chunks
+            ],
+            wait=wait,
+        )
+
+    def upsert_chunks(
+        self,
+        chunks: List[TextNode],
+        embeddings: npt.NDArray[np.float32],
+        wait: bool = True,
+    ) -> None:
+        if not chunks:
+            return
+        vector_name = self._ensure_collection(embeddings.shape[1])
+        settings = Settings()
+        vectors: Union[npt.NDArray[np.float32], Dict[str, Any]] = embeddings
+        if vector_name is not None:
+            vectors = {vector_name: embeddings}
+        self.client.upload_collection(
+            self.table_name,
+            vectors=vectors,
+            payload=[self._payload(chunk) for chunk in chunks],
+            ids=[chunk.node_id for chunk in chunks],
+            batch_size=UPLOAD_BATCH_SIZE,
+            parallel=settings.qdrant_upload_parallelism,
+            wait=wait,
+        )
+
+    def _ensure_collection(self, dimensions: int) -> Optional[str]:
+        """Create the collection if needed, and return the name of its dense vector (None if unnamed)."""
+        if self._collection_checked:
+            return self._vector_name
+        if not self.exists():
+            try:
+                # matches the collection llama-index creates on its first add()
+                self.client.create_collection(
+                    self.table_name,
+                    vectors_config=VectorParams(
+                        size=dimensions, distance=Distance.COSINE
+                    ),
+                )
+            except Exception:
+                # another document of this data source may have created it first
+                if not self.exists():
+                    raise
+            for field in DOCUMENT_PAYLOAD_FIELDS:
+                self.client.create_payload_index(
+                    self.table_name,
+                    field_name=field,
+                    field_schema=PayloadSchemaType.KEYWORD,
+                )
+        vectors = self.client.get_collection(self.table_name).config.params.vectors
+        if isinstance(vectors, dict):
+            self._vector_name = next(iter(vectors))
+        self._collection_checked = True
+        return self._vector_name
+
+    def delete_chunks(self, chunk_ids: List[str]) -> None:
+        if chunk_ids and self.exists():
+            self.client.delete(
+                self.table_name,
+                points_selector=PointIdsList(points=list(chunk_ids)),
+            )
+
     def exists(self) -> bool:
         return self.client.collection_exists(self.table_name)
 
@@ -164,7 +378,7 @@ class QdrantVectorStore(VectorStore):
                 (cast(tuple[float, float], tuple(coordinate)), filename)
                 for filename, coordinate in zip(filenames, reduced_embeddings)
             ]
-        except Exception as e:
-            # Log the error
+        except (ValueError, TypeError) as e:
+            # UMAP can't reduce too few embeddings, or embeddings of different sizes
             logger.error(f"Error during UMAP transformation: {e}")
             return []
@@ -37,9 +37,12 @@
 #
 
 from abc import abstractmethod, ABCMeta
-from typing import Optional
+from typing import List, Optional, Set
 
+import numpy as np
+import numpy.typing as npt
 from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import TextNode
 from llama_index.core.vector_stores.types import BasePydanticVectorStore
 
 
@@ -60,6 +63,37 @@ class VectorStore(metaclass=ABCMeta):
     def delete_document(self, document_id: str) -> None:
         """Delete a single document from the vector store"""
 
+    @abstractmethod
+    def get_document_chunk_ids(self, document_id: str) -> Set[str]:
+        """IDs of the chunks currently stored for a single document"""
+
+    @abstractmethod
+    def get_chunks_with_changed_metadata(
+        self, chunks: List[TextNode]
+    ) -> List[TextNode]:
+        """Of the given stored chunks, the ones whose stored metadata differs from theirs"""
+
+    @abstractmethod
+    def upsert_chunks(
+        self,
+        chunks: List[TextNode],
+        embeddings: npt.NDArray[np.float32],
+        wait: bool = True,
+    ) -> None:
+        """
+        Write chunks with their embeddings, one row per chunk, creating the store if needed.
+        Without wait, the write may still be in progress when this returns; a later write with
+        wait also waits for every write issued before it.
+        """
+
+    @abstractmethod
+    def update_chunk_metadata(self, chunks: List[TextNode], wait: bool = True) -> None:
+        """Rewrite the metadata of stored chunks, keeping their embeddings"""
+
+    @abstractmethod
+    def delete_chunks(self, chunk_ids: List[str]) -> None:
+        """Delete individual chunks from the vector store"""
+
     @abstractmethod
     def llama_vector_store(self) -> BasePydanticVectorStore:
         """Access the underlying llama-index vector store implementation"""
@@ -46,6 +46,7 @@ simply the field name in all capital letters.
 
 import logging
 import os.path
+from typing import Dict
 
 from pydantic_settings import BaseSettings
 
@@ -55,3 +56,58 @@ class Settings(BaseSettings):
 
     rag_log_level: int = logging.INFO
     rag_databases_dir: str = os.path.join("..", "databases")
+
+    # Maximum number of embedding batches being computed at once while indexing a file.
+    embedding_max_in_flight: int = 20
+    # Maximum number of parsed chunks buffered ahead of the embedding stage.
+    indexing_queue_depth: int = 1000
+    # Size limit of the on-disk embedding cache; least recently used embeddings are evicted first.
+    embedding_cache_max_bytes: int = 2 * 1024 * 1024 * 1024
+    # Size limit of the on-disk cache of text extracted from documents, so re-chunking doesn't re-parse.
+    parsed_text_cache_max_bytes: int = 1024 * 1024 * 1024
+    # Upper bounds for the adaptive per-endpoint embedding concurrency and batch size.
+    embedding_max_concurrency: int = 32
+    embedding_max_batch_size: int = 100
+    # Ask CAII for base64 float32 embeddings instead of JSON arrays; only for endpoints that support it.
+    caii_embedding_base64: bool = False
+    # Talk to Qdrant over gRPC instead of REST.
+    qdrant_prefer_grpc: bool = False
+    qdrant_grpc_port: int = 6334
+    # Connections the shared Qdrant client keeps open, and how often the app checks on Qdrant.
+    qdrant_max_connections: int = 32
+    qdrant_health_check_seconds: float = 30
+    # Processes used to upload each batch of points; every upload starts its own workers.
+    qdrant_upload_parallelism: int = 1
+    # Ingestion jobs that run at once, and how many more may wait before new ones are rejected.
+    ingestion_max_workers: int = 4
+    ingestion_max_queued_jobs: int = 100
+    # Processes that parse PDF, Office and CSV files; 0 uses one per core, -1 parses in-process.
+    parsing_processes: int = 0
+    parsing_timeout_seconds: float = 600
+    # Added to the parsing processes' niceness, to keep interactive requests responsive.
+    parsing_niceness: int = 10
+    # Processes that keep docling's models loaded, when USE_ENHANCED_PDF_PROCESSING is on.
+    docling_processes: int = 1
+    # PDFs converted per docling call, for data sources whose PDF engine is docling.
+    docling_files_per_call: int = 4
+    # Processes that extract the pages of one large PDF in parallel; 1 extracts them in order.
+    pdf_page_processes: int = 4
+    # Processes that split the sections of one long document into chunks in parallel.
+    splitting_processes: int = 4
+    # Engine that extracts the text layer of PDFs (pypdf or pypdfium2), and per data source overrides.
+    pdf_engine: str = "pypdf"
+    pdf_engine_by_data_source: Dict[int, str] = {}
+    # Fall back to the next PDF engine when one finds fewer characters than this per page on average.
+    pdf_min_chars_per_page: int = 16
+    # Pages sampled to tell whether a PDF has a text layer, before sending it through docling.
+    pdf_text_layer_sample_pages: int = 8
+    # Caption the images in slide decks with a local model, and per data source overrides.
+    pptx_image_captioning: bool = True
+    pptx_image_captioning_by_data_source: Dict[int, bool] = {}
+    # Collapse whitespace and drop headers and footers repeated on at least this fraction of
+    # a document's pages before chunking; off unless turned on, globally or per data source.
+    boilerplate_stripping: bool = False
+    boilerplate_stripping_by_data_source: Dict[int, bool] = {}
+    boilerplate_min_pages_fraction: float = 0.5
+    # Pack consecutive CSV rows into chunks of up to the chunk size, instead of one chunk per row.
+    csv_group_rows: bool = False
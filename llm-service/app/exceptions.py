@@ -54,6 +54,19 @@ P = ParamSpec("P")
 logger = logging.getLogger(__name__)
 
 
+class UpstreamHTTPError(Exception):
+    """
+    An error response from a service the app calls, such as a model endpoint.
+
+    :func:`propagates` passes its status code and message on to the client.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"Upstream service responded with {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+
 @contextlib.contextmanager
 def _exception_propagation() -> Iterator[None]:
     """
@@ -79,6 +92,9 @@ def _exception_propagation() -> Iterator[None]:
             status_code=e.response.status_code,
             detail=e.response.text,
         ) from e
+    except UpstreamHTTPError as e:
+        logger.exception("Encountered upstream HTTP error")
+        raise HTTPException(status_code=e.status_code, detail=e.detail) from e
     except Exception as e:
         # unhandled exception; wrap as HTTP 500
         logger.exception("Encountered internal error")
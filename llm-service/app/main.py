@@ -36,18 +36,20 @@
 #  DATA.
 # ##############################################################################
 
+import asyncio
 import functools
 import logging
 import sys
 import time
 from collections.abc import Awaitable, Callable
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from typing import AsyncGenerator
 
 from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from uvicorn.logging import DefaultFormatter
 
+from .ai.vector_stores import qdrant
 from .config import Settings
 from .routers import index
 
@@ -128,7 +130,19 @@ def initialize_logging() -> None:
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     initialize_logging()
-    yield
+    # every request shares one Qdrant client and its connections
+    qdrant.get_qdrant_client()
+    health_check = asyncio.create_task(
+        qdrant.watch_qdrant_health(Settings().qdrant_health_check_seconds)
+    )
+    try:
+        yield
+    finally:
+        health_check.cancel()
+        with suppress(asyncio.CancelledError):
+            await health_check
+        qdrant.close_qdrant_client()
+        logger.info("Closed the Qdrant client.")
 
 
 ###################################
@@ -44,6 +44,7 @@ from . import data_source
 from . import sessions
 from . import amp_update
 from . import models
+from . import ingestion_jobs
 
 logger = logging.getLogger(__name__)
 
@@ -55,3 +56,4 @@ router.include_router(amp_update.router)
 # include this for legacy UI calls
 router.include_router(amp_update.router, prefix="/index", deprecated=True)
 router.include_router(models.router)
+router.include_router(ingestion_jobs.router)
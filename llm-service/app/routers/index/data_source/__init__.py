@@ -28,25 +28,51 @@
 #  DATA.
 # ##############################################################################
 
+import functools
 import logging
 import tempfile
-from typing import Any, Dict, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi_utils.cbv import cbv
-from llama_index.core.node_parser import SentenceSplitter
 from pydantic import BaseModel
 
 from .... import exceptions
-from ....ai.indexing.embedding_indexer import EmbeddingIndexer
+from ....ai.indexing.base import NotSupportedFileExtensionError, get_reader_class
+from ....ai.indexing.document_text import DocumentTextCollector
+from ....ai.indexing.embedding_indexer import EmbeddingIndexer, IndexingResult
+from ....ai.indexing.splitting import get_sentence_splitter
 from ....ai.indexing.summary_indexer import SummaryIndexer
 from ....ai.vector_stores.qdrant import QdrantVectorStore
 from ....ai.vector_stores.vector_store import VectorStore
+from ....config import Settings
 from ....services import (
     data_sources_metadata_api,
     document_storage,
     models,
 )
+from ....services.document_storage.base import DocumentStorage
+from ....services.ingestion_jobs import (
+    IngestionJob,
+    JobKind,
+    JobProgress,
+    QueueFullError,
+    get_ingestion_job_queue,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -74,11 +100,75 @@ class RagIndexDocumentRequest(BaseModel):
     configuration: RagIndexDocumentConfiguration = RagIndexDocumentConfiguration()
 
 
+class RagIndexBatchDocument(RagIndexDocumentRequest):
+    document_id: str
+
+
+class RagIndexDocumentsRequest(BaseModel):
+    documents: List[RagIndexBatchDocument]
+
+
+class DocumentIndexingStatus(BaseModel):
+    document_id: str
+    success: bool
+    result: Optional[IndexingResult] = None
+    error: Optional[str] = None
+
+
+class DocumentIngestionResult(BaseModel):
+    indexing: IndexingResult
+    # None when the knowledge base has no summarization model
+    summary: Optional[str] = None
+
+
 class ChunkContentsResponse(BaseModel):
     text: str
     metadata: Dict[str, Any]
 
 
+def _submit_job(
+    kind: JobKind,
+    data_source_id: int,
+    doc_id: str,
+    run: Callable[[JobProgress], Any],
+) -> IngestionJob:
+    try:
+        return get_ingestion_job_queue().submit(kind, data_source_id, doc_id, run)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after_seconds)},
+        ) from e
+
+
+def _download_unless_streamed(
+    doc_storage: DocumentStorage,
+    temp_dir: str,
+    request: RagIndexDocumentRequest,
+) -> Tuple[Path, Optional[Callable[[], BinaryIO]]]:
+    """
+    Where to index a stored document from. Documents whose reader reads streams aren't
+    downloaded: the path only names them, and they're read from storage with what's returned.
+    """
+    try:
+        reads_streams = get_reader_class(Path(request.original_filename)).reads_streams
+    except NotSupportedFileExtensionError:
+        reads_streams = False
+    if reads_streams:
+        open_stream = functools.partial(
+            doc_storage.open, request.s3_bucket_name, request.s3_document_key
+        )
+        return Path(temp_dir, request.original_filename), open_stream
+    file_path = doc_storage.download(
+        temp_dir,
+        request.s3_bucket_name,
+        request.s3_document_key,
+        request.original_filename,
+    )
+    return file_path, None
+
+
 @cbv(router)
 class DataSourceController:
     chunks_vector_store: VectorStore = Depends(
@@ -92,7 +182,7 @@ class DataSourceController:
             return None
         return SummaryIndexer(
             data_source_id=data_source_id,
-            splitter=SentenceSplitter(chunk_size=2048),
+            splitter=get_sentence_splitter(2048),
             llm=models.get_llm(datasource.summarization_model),
         )
 
@@ -140,10 +230,200 @@ class DataSourceController:
         data_source_id: int,
         doc_id: str,
         request: RagIndexDocumentRequest,
-    ) -> None:
+        response: Response,
+        run_async: bool = False,
+    ) -> Union[IndexingResult, IngestionJob]:
+        if run_async:
+            response.status_code = 202
+            return _submit_job(
+                "index",
+                data_source_id,
+                doc_id,
+                lambda progress: self._index_document(
+                    data_source_id, doc_id, request, progress
+                ),
+            )
+        return self._index_document(data_source_id, doc_id, request)
+
+    def _index_document(
+        self,
+        data_source_id: int,
+        doc_id: str,
+        request: RagIndexDocumentRequest,
+        progress: Optional[JobProgress] = None,
+    ) -> IndexingResult:
         datasource = data_sources_metadata_api.get_metadata(data_source_id)
         with tempfile.TemporaryDirectory() as tmpdirname:
             logger.debug("created temporary directory %s", tmpdirname)
+            if progress:
+                progress.stage("downloading")
+            doc_storage = document_storage.from_environment()
+            file_path, open_stream = _download_unless_streamed(
+                doc_storage, tmpdirname, request
+            )
+
+            indexer = self._get_embedding_indexer(
+                data_source_id, datasource.embedding_model, request.configuration
+            )
+            if progress:
+                progress.stage("indexing")
+            # Only new or changed chunks are embedded; chunks that are gone get deleted.
+            return indexer.index_file(
+                file_path,
+                doc_id,
+                progress.chunks_processed if progress else None,
+                open_stream=open_stream,
+            )
+
+    @router.post(
+        "/documents/index",
+        summary="Download and index a batch of documents",
+        response_model=None,
+    )
+    @exceptions.propagates
+    def download_and_index_batch(
+        self,
+        data_source_id: int,
+        request: RagIndexDocumentsRequest,
+    ) -> List[DocumentIndexingStatus]:
+        document_ids = [document.document_id for document in request.documents]
+        if len(set(document_ids)) != len(document_ids):
+            raise HTTPException(
+                status_code=400, detail="Each document may only appear once per batch"
+            )
+        datasource = data_sources_metadata_api.get_metadata(data_source_id)
+        # documents indexed with the same configuration share one pipeline
+        groups: Dict[Tuple[int, int], List[RagIndexBatchDocument]] = {}
+        for document in request.documents:
+            configuration = document.configuration
+            key = (configuration.chunk_size, configuration.chunk_overlap)
+            groups.setdefault(key, []).append(document)
+
+        statuses: Dict[str, DocumentIndexingStatus] = {}
+        for documents in groups.values():
+            indexer = self._get_embedding_indexer(
+                data_source_id, datasource.embedding_model, documents[0].configuration
+            )
+            streams: Dict[str, Callable[[], BinaryIO]] = {}
+            results = indexer.index_files(
+                self._download_each(documents, statuses, streams), streams=streams
+            )
+            for document_id, result in results.items():
+                if isinstance(result, Exception):
+                    statuses[document_id] = DocumentIndexingStatus(
+                        document_id=document_id, success=False, error=str(result)
+                    )
+                else:
+                    statuses[document_id] = DocumentIndexingStatus(
+                        document_id=document_id, success=True, result=result
+                    )
+        return [
+            statuses.get(document_id)
+            or DocumentIndexingStatus(
+                document_id=document_id,
+                success=False,
+                error="Not indexed because indexing the batch failed",
+            )
+            for document_id in document_ids
+        ]
+
+    @staticmethod
+    def _download_each(
+        documents: List[RagIndexBatchDocument],
+        statuses: Dict[str, DocumentIndexingStatus],
+        streams: Dict[str, Callable[[], BinaryIO]],
+    ) -> Iterator[Tuple[Path, str]]:
+        """
+        Download the documents one at a time, as the indexer asks for them. Documents whose
+        reader reads streams are added to ``streams`` instead.
+
+        The indexer only asks for the next file once it's done parsing the previous ones,
+        except that it reads up to docling_files_per_call PDFs ahead to convert them
+        together. So that many files are kept, and older ones are deleted as the generator
+        resumes.
+        """
+        doc_storage = document_storage.from_environment()
+        kept: Deque[tempfile.TemporaryDirectory[str]] = deque()
+        try:
+            for document in documents:
+                # a directory per document, since original file names can repeat
+                tmpdir = tempfile.TemporaryDirectory()
+                kept.append(tmpdir)
+                while len(kept) > max(Settings().docling_files_per_call, 1):
+                    kept.popleft().cleanup()
+                try:
+                    file_path, open_stream = _download_unless_streamed(
+                        doc_storage, tmpdir.name, document
+                    )
+                except Exception as e:
+                    logger.exception(
+                        "Failed to download document %s", document.document_id
+                    )
+                    statuses[document.document_id] = DocumentIndexingStatus(
+                        document_id=document.document_id, success=False, error=str(e)
+                    )
+                    continue
+                if open_stream:
+                    streams[document.document_id] = open_stream
+                yield file_path, document.document_id
+        finally:
+            for tmpdir in kept:
+                tmpdir.cleanup()
+
+    def _get_embedding_indexer(
+        self,
+        data_source_id: int,
+        embedding_model: str,
+        configuration: RagIndexDocumentConfiguration,
+    ) -> EmbeddingIndexer:
+        return EmbeddingIndexer(
+            data_source_id,
+            splitter=get_sentence_splitter(
+                configuration.chunk_size,
+                int(configuration.chunk_overlap * 0.01 * configuration.chunk_size),
+            ),
+            embedding_model=models.get_embedding_model(embedding_model),
+            chunks_vector_store=self.chunks_vector_store,
+        )
+
+    @router.post(
+        "/documents/{doc_id}/ingest",
+        summary="Download a document once, then index and summarize it",
+        response_model=None,
+    )
+    @exceptions.propagates
+    def download_and_ingest(
+        self,
+        data_source_id: int,
+        doc_id: str,
+        request: RagIndexDocumentRequest,
+        response: Response,
+        run_async: bool = False,
+    ) -> Union[DocumentIngestionResult, IngestionJob]:
+        if run_async:
+            response.status_code = 202
+            return _submit_job(
+                "ingest",
+                data_source_id,
+                doc_id,
+                lambda progress: self._ingest_document(
+                    data_source_id, doc_id, request, progress
+                ),
+            )
+        return self._ingest_document(data_source_id, doc_id, request)
+
+    def _ingest_document(
+        self,
+        data_source_id: int,
+        doc_id: str,
+        request: RagIndexDocumentRequest,
+        progress: Optional[JobProgress] = None,
+    ) -> DocumentIngestionResult:
+        datasource = data_sources_metadata_api.get_metadata(data_source_id)
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            logger.debug("created temporary directory %s", tmpdirname)
+            if progress:
+                progress.stage("downloading")
             doc_storage = document_storage.from_environment()
             file_path = doc_storage.download(
                 tmpdirname,
@@ -152,22 +432,53 @@ class DataSourceController:
                 request.original_filename,
             )
 
-            indexer = EmbeddingIndexer(
-                data_source_id,
-                splitter=SentenceSplitter(
-                    chunk_size=request.configuration.chunk_size,
-                    chunk_overlap=int(
-                        request.configuration.chunk_overlap
-                        * 0.01
-                        * request.configuration.chunk_size
-                    ),
-                ),
-                embedding_model=models.get_embedding_model(datasource.embedding_model),
-                chunks_vector_store=self.chunks_vector_store,
+            embedding_indexer = self._get_embedding_indexer(
+                data_source_id, datasource.embedding_model, request.configuration
             )
-            # Delete to avoid duplicates
-            self.chunks_vector_store.delete_document(doc_id)
-            indexer.index_file(file_path, doc_id)
+            summary_indexer = self._get_summary_indexer(data_source_id)
+            on_progress = progress.chunks_processed if progress else None
+            if progress:
+                progress.stage("indexing")
+            if not summary_indexer:
+                return DocumentIngestionResult(
+                    indexing=embedding_indexer.index_file(
+                        file_path, doc_id, on_progress
+                    )
+                )
+
+            # The file is parsed once, by the embedding indexer, which hands the text of the
+            # document to the summary as soon as it's parsed, while it keeps embedding.
+            text_collector = DocumentTextCollector()
+            with ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="ingest-summary"
+            ) as executor:
+                summarizing = executor.submit(
+                    self._summarize_parsed_text,
+                    summary_indexer,
+                    text_collector,
+                    file_path,
+                    doc_id,
+                )
+                indexing_result = embedding_indexer.index_file(
+                    file_path, doc_id, on_progress, text_collector
+                )
+                summarizing.result()
+
+            return DocumentIngestionResult(
+                indexing=indexing_result, summary=summary_indexer.get_summary(doc_id)
+            )
+
+    @staticmethod
+    def _summarize_parsed_text(
+        summary_indexer: SummaryIndexer,
+        text_collector: DocumentTextCollector,
+        file_path: Path,
+        doc_id: str,
+    ) -> None:
+        chunks = summary_indexer.split_text(text_collector.wait(), file_path, doc_id)
+        # Delete to avoid duplicates
+        summary_indexer.delete_document(doc_id)
+        summary_indexer.index_chunks(chunks, doc_id)
 
     @router.get(
         "/documents/{doc_id}/summary",
@@ -195,9 +506,32 @@ class DataSourceController:
         data_source_id: int,
         doc_id: str,
         request: SummarizeDocumentRequest,
+        response: Response,
+        run_async: bool = False,
+    ) -> Union[str, IngestionJob]:
+        if run_async:
+            response.status_code = 202
+            return _submit_job(
+                "summarize",
+                data_source_id,
+                doc_id,
+                lambda progress: self._summarize_document(
+                    data_source_id, doc_id, request, progress
+                ),
+            )
+        return self._summarize_document(data_source_id, doc_id, request)
+
+    def _summarize_document(
+        self,
+        data_source_id: int,
+        doc_id: str,
+        request: SummarizeDocumentRequest,
+        progress: Optional[JobProgress] = None,
     ) -> str:
         with tempfile.TemporaryDirectory() as tmpdirname:
             logger.debug("created temporary directory %s", tmpdirname)
+            if progress:
+                progress.stage("downloading")
             doc_storage = document_storage.from_environment()
             file_path = doc_storage.download(
                 tmpdirname,
@@ -209,6 +543,8 @@ class DataSourceController:
             indexer = self._get_summary_indexer(data_source_id)
             if not indexer:
                 return SUMMARIZATION_DISABLED
+            if progress:
+                progress.stage("summarizing")
             # Delete to avoid duplicates
             indexer.delete_document(doc_id)
             indexer.index_file(file_path, doc_id)
@@ -40,6 +40,10 @@ from typing import List, Literal
 from fastapi import APIRouter
 
 from .... import exceptions
+from ....ai.indexing.adaptive_concurrency import (
+    ControllerSnapshot,
+    controller_snapshots,
+)
 from ....services.caii.types import ModelResponse
 from ....services.models import (
     ModelSource,
@@ -77,6 +81,15 @@ def llm_model_test(model_name: str) -> Literal["ok"]:
     return test_llm_model(model_name)
 
 
+@router.get(
+    "/embedding/throughput",
+    summary="Current adaptive concurrency settings and observed throughput per embedding endpoint.",
+)
+@exceptions.propagates
+def embedding_throughput() -> List[ControllerSnapshot]:
+    return controller_snapshots()
+
+
 @router.get("/embedding/{model_name}/test", summary="Test Embedding model.")
 @exceptions.propagates
 def embedding_model_test(model_name: str) -> str:
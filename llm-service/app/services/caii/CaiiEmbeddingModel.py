@@ -35,17 +35,63 @@
 #  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
 #  DATA.
 #
-import http.client as http_client
+import asyncio
+import base64
+import functools
 import json
+import logging
 import os
+import time
+import weakref
 from typing import Any, List
 
+import httpx
+import numpy as np
+import numpy.typing as npt
 from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
 from pydantic import Field
 
+from ...config import Settings
+from ...exceptions import UpstreamHTTPError
 from .types import Endpoint
 from .utils import build_auth_headers
 
+logger = logging.getLogger(__name__)
+
+REQUEST_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+CONNECTION_LIMITS = httpx.Limits(
+    max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0
+)
+MAX_ATTEMPTS = 3
+# Gateway errors are retried here. Throttling (429/503) is raised so that callers can back off.
+RETRYABLE_STATUS_CODES = {502, 504}
+# Errors that typically mean a pooled keep-alive connection was closed by the server.
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.RemoteProtocolError, httpx.ReadError)
+
+
+@functools.cache
+def _http_client() -> httpx.Client:
+    return httpx.Client(timeout=REQUEST_TIMEOUT, limits=CONNECTION_LIMITS)
+
+
+_async_http_clients: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop, httpx.AsyncClient
+] = weakref.WeakKeyDictionary()
+
+
+def _async_http_client() -> httpx.AsyncClient:
+    # async clients are bound to the event loop they were created on
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT, limits=CONNECTION_LIMITS)
+        _async_http_clients[loop] = client
+    return client
+
+
+def _backoff(attempt: int) -> float:
+    return 0.25 * (1 << attempt)
+
 
 class CaiiEmbeddingModel(BaseEmbedding):
     endpoint: Endpoint = Field(
@@ -53,67 +99,149 @@ class CaiiEmbeddingModel(BaseEmbedding):
     )
 
     def __init__(self, endpoint: Endpoint):
-        super().__init__()
+        # batching is controlled by the indexer, so don't split its batches any further
+        super().__init__(
+            model_name=endpoint.endpointmetadata.model_name, embed_batch_size=100
+        )
         self.endpoint = endpoint
 
     def _get_text_embedding(self, text: str) -> Embedding:
         return self._get_embedding(text, "passage")
 
-    async def _aget_query_embedding(self, query: str) -> Embedding:
-        raise NotImplementedError("Not implemented")
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return await self._aget_embedding(text, "passage")
 
     def _get_query_embedding(self, query: str) -> Embedding:
         return self._get_embedding(query, "query")
 
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return await self._aget_embedding(query, "query")
+
     def _get_embedding(self, query: str, input_type: str) -> Embedding:
-        model = self.endpoint.endpointmetadata.model_name
-        body = json.dumps(
-            {
-                "input": query,
-                "input_type": input_type,
-                "truncate": "END",
-                "model": model,
-            }
+        structured_response = self.make_embedding_request(
+            self._request_body([query], input_type)
         )
-        structured_response = self.make_embedding_request(body)
-        embedding = structured_response["data"][0]["embedding"]
-        assert isinstance(embedding, list)
-        assert all(isinstance(x, float) for x in embedding)
-
+        embedding: Embedding = self._parse_embeddings(structured_response, 1)[
+            0
+        ].tolist()
         return embedding
 
-    def make_embedding_request(self, body: str) -> Any:
-        domain = os.environ["CAII_DOMAIN"]
+    async def _aget_embedding(self, query: str, input_type: str) -> Embedding:
+        structured_response = await self.amake_embedding_request(
+            self._request_body([query], input_type)
+        )
+        embedding: Embedding = self._parse_embeddings(structured_response, 1)[
+            0
+        ].tolist()
+        return embedding
 
-        connection = http_client.HTTPSConnection(domain, 443)
-        headers = build_auth_headers()
-        headers["Content-Type"] = "application/json"
-        connection.request("POST", self.endpoint.url, body=body, headers=headers)
-        res = connection.getresponse()
-        data = res.read()
-        json_response = data.decode("utf-8")
-        structured_response = json.loads(json_response)
-        return structured_response
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        embeddings: List[Embedding] = self.get_text_embedding_array(texts).tolist()
+        return embeddings
 
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        embeddings: List[Embedding] = (
+            await self.aget_text_embedding_array(texts)
+        ).tolist()
+        return embeddings
 
-    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
-        if len(texts) == 1:
-            return [self._get_text_embedding(texts[0])]
-
-        model = self.endpoint.endpointmetadata.model_name
-        body = json.dumps(
-            {
-                "input": texts,
-                "input_type": "passage",
-                "truncate": "END",
-                "model": model,
-            }
+    def get_text_embedding_array(self, texts: List[str]) -> npt.NDArray[np.float32]:
+        """Embed passages into a (len(texts), dimensions) float32 array."""
+        structured_response = self.make_embedding_request(
+            self._request_body(texts, "passage")
         )
-        structured_response = self.make_embedding_request(body)
+        return self._parse_embeddings(structured_response, len(texts))
 
-        embeddings = list(map(lambda data: data["embedding"], structured_response["data"]))
-        assert isinstance(embeddings, list)
-        assert all(isinstance(x, list) for x in embeddings)
-        assert all(all(isinstance(y, float) for y in x) for x in embeddings)
+    async def aget_text_embedding_array(
+        self, texts: List[str]
+    ) -> npt.NDArray[np.float32]:
+        structured_response = await self.amake_embedding_request(
+            self._request_body(texts, "passage")
+        )
+        return self._parse_embeddings(structured_response, len(texts))
+
+    def _request_body(self, texts: List[str], input_type: str) -> str:
+        body = {
+            "input": texts,
+            "input_type": input_type,
+            "truncate": "END",
+            "model": self.endpoint.endpointmetadata.model_name,
+        }
+        if Settings().caii_embedding_base64:
+            # raw float32 bytes decode without creating a Python float per dimension
+            body["encoding_format"] = "base64"
+        return json.dumps(body)
+
+    @staticmethod
+    def _parse_embeddings(
+        structured_response: Any, expected: int
+    ) -> npt.NDArray[np.float32]:
+        data = structured_response["data"]
+        if len(data) != expected:
+            raise ValueError(f"Expected {expected} embeddings, got {len(data)}")
+        if data and isinstance(data[0]["embedding"], str):
+            buffer = b"".join(base64.b64decode(item["embedding"]) for item in data)
+            embeddings = np.frombuffer(buffer, dtype=np.float32).reshape(expected, -1)
+        else:
+            embeddings = np.array(
+                [item["embedding"] for item in data], dtype=np.float32
+            )
+        if embeddings.ndim != 2:
+            raise ValueError("Embeddings of different sizes in one response")
+        if not np.isfinite(embeddings).all():
+            raise ValueError("Embeddings contain NaN or infinite values")
 
         return embeddings
+
+    def _url(self) -> str:
+        if self.endpoint.url.startswith(("http://", "https://")):
+            return self.endpoint.url
+        return f"https://{os.environ['CAII_DOMAIN']}{self.endpoint.url}"
+
+    @staticmethod
+    def _headers() -> dict[str, str]:
+        headers = build_auth_headers()
+        headers["Content-Type"] = "application/json"
+        return headers
+
+    @staticmethod
+    def _handle_response(response: httpx.Response) -> Any:
+        if response.status_code >= 400:
+            # surfaces throttling (429/503) to the indexer's adaptive concurrency control
+            raise UpstreamHTTPError(response.status_code, response.text)
+        return response.json()
+
+    def make_embedding_request(self, body: str) -> Any:
+        """POST to the endpoint over the shared keep-alive connection pool."""
+        for attempt in range(MAX_ATTEMPTS):
+            last_attempt = attempt == MAX_ATTEMPTS - 1
+            try:
+                response = _http_client().post(
+                    self._url(), content=body, headers=self._headers()
+                )
+            except RETRYABLE_ERRORS as e:
+                if last_attempt:
+                    raise
+                logger.debug(f"Retrying embedding request after {e!r}")
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+                    return self._handle_response(response)
+            time.sleep(_backoff(attempt))
+        raise AssertionError("unreachable")
+
+    async def amake_embedding_request(self, body: str) -> Any:
+        for attempt in range(MAX_ATTEMPTS):
+            last_attempt = attempt == MAX_ATTEMPTS - 1
+            try:
+                response = await _async_http_client().post(
+                    self._url(), content=body, headers=self._headers()
+                )
+            except RETRYABLE_ERRORS as e:
+                if last_attempt:
+                    raise
+                logger.debug(f"Retrying embedding request after {e!r}")
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES or last_attempt:
+                    return self._handle_response(response)
+            await asyncio.sleep(_backoff(attempt))
+        raise AssertionError("unreachable")
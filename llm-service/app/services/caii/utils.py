@@ -36,12 +36,31 @@
 #  DATA.
 #
 import json
-from typing import Dict
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+JWT_PATH = "/tmp/jwt"
+
+# (path, modification time, access token) of the last JWT we read
+_cached_token: Optional[Tuple[str, float, str]] = None
+_cached_token_lock = threading.Lock()
+
+
+def _access_token() -> str:
+    global _cached_token
+    mtime = os.stat(JWT_PATH).st_mtime
+    with _cached_token_lock:
+        if _cached_token and _cached_token[:2] == (JWT_PATH, mtime):
+            return _cached_token[2]
+        with open(JWT_PATH, "r") as file:
+            jwt_contents = json.load(file)
+        access_token: str = jwt_contents["access_token"]
+        _cached_token = (JWT_PATH, mtime, access_token)
+        return access_token
 
 
 def build_auth_headers() -> Dict[str, str]:
-    with open("/tmp/jwt", "r") as file:
-        jwt_contents = json.load(file)
-    access_token = jwt_contents["access_token"]
-    headers = {"Authorization": f"Bearer {access_token}"}
+    # the token file is only re-read when it changes
+    headers = {"Authorization": f"Bearer {_access_token()}"}
     return headers
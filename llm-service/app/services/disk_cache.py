@@ -0,0 +1,201 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .utils import batch_sequence
+
+logger = logging.getLogger(__name__)
+
+# Stay well below SQLite's limit on the number of bound parameters in a statement.
+_MAX_KEYS_PER_QUERY = 500
+# When the cache overflows, evict down to this fraction of the limit so we don't evict on every write.
+_EVICTION_TARGET = 0.9
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    size_bytes: int
+    max_size_bytes: int
+
+
+class DiskLRUCache:
+    """
+    A persistent key/value store bounded by size, evicting the least recently used entries.
+
+    Entries live in a single SQLite file so that the cache can be shared by threads and
+    processes working on the same databases directory.
+    """
+
+    def __init__(self, path: str, max_size_bytes: int):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, timeout=30, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+        )
+        self._size_bytes = self._stored_size()
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key])[0]
+
+    def put(self, key: str, value: bytes) -> None:
+        self.put_many([(key, value)])
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            for key_batch in batch_sequence(keys, _MAX_KEYS_PER_QUERY):
+                placeholders = ",".join("?" * len(key_batch))
+                rows = self._connection.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})",
+                    key_batch,
+                ).fetchall()
+                found.update(rows)
+                if rows:
+                    hit_keys = [key for key, _ in rows]
+                    self._connection.execute(
+                        f"UPDATE entries SET last_access = ? WHERE key IN ({','.join('?' * len(hit_keys))})",
+                        [time.time(), *hit_keys],
+                    )
+            values = [found.get(key) for key in keys]
+            hits = sum(1 for value in values if value is not None)
+            self.hits += hits
+            self.misses += len(values) - hits
+        return values
+
+    def put_many(self, items: Sequence[Tuple[str, bytes]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        # a key given twice keeps its last value, like the inserts would
+        entries = dict(items)
+        with self._lock, self._transaction():
+            # replaced entries no longer take up their old size
+            replaced_size = 0
+            for key_batch in batch_sequence(list(entries), _MAX_KEYS_PER_QUERY):
+                (size,) = self._connection.execute(
+                    f"SELECT COALESCE(SUM(size), 0) FROM entries WHERE key IN ({','.join('?' * len(key_batch))})",
+                    key_batch,
+                ).fetchone()
+                replaced_size += size
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                [
+                    (key, value, len(key) + len(value), now)
+                    for key, value in entries.items()
+                ],
+            )
+            self._size_bytes += (
+                sum(len(key) + len(value) for key, value in entries.items())
+                - replaced_size
+            )
+            if self._size_bytes > self.max_size_bytes:
+                self._evict()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                size_bytes=self._size_bytes,
+                max_size_bytes=self.max_size_bytes,
+            )
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def _stored_size(self) -> int:
+        (size,) = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return int(size)
+
+    def _evict(self) -> None:
+        # Other processes may have written to the same file, so start from the real size.
+        self._size_bytes = self._stored_size()
+        excess = self._size_bytes - int(self.max_size_bytes * _EVICTION_TARGET)
+        if excess <= 0:
+            return
+        evicted: List[str] = []
+        for key, size in self._connection.execute(
+            "SELECT key, size FROM entries ORDER BY last_access"
+        ):
+            if excess <= 0:
+                break
+            evicted.append(key)
+            excess -= size
+        for key_batch in batch_sequence(evicted, _MAX_KEYS_PER_QUERY):
+            self._connection.execute(
+                f"DELETE FROM entries WHERE key IN ({','.join('?' * len(key_batch))})",
+                key_batch,
+            )
+        self._size_bytes = self._stored_size()
+        logger.info(
+            "evicted %d entries from %s, now %d bytes",
+            len(evicted),
+            self.path,
+            self._size_bytes,
+        )
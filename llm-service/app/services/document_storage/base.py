@@ -68,12 +68,23 @@
 
 from abc import abstractmethod, ABC
 from pathlib import Path
+from typing import BinaryIO
 
 class DocumentStorage(ABC):
     @abstractmethod
     def download(self, temp_dir: str, bucket_name: str, document_key: str, original_filename: str) -> Path:
         """
-        Copy file from storage into the temp directory
+        Make the file available in the temp directory under its original file name.
+
+        The path may link to the stored document itself, so it must only be read.
+        """
+
+    @abstractmethod
+    def open(self, bucket_name: str, document_key: str) -> BinaryIO:
+        """
+        Open the stored document for reading, without making a local copy of it.
+
+        The stream is seekable, so readers that take file objects can read just the parts they need.
         """
 
 
@@ -36,8 +36,9 @@
 #  DATA.
 #
 
-import shutil
+import os
 from pathlib import Path
+from typing import BinaryIO
 
 from app.config import Settings
 
@@ -45,13 +46,21 @@ from .base import DocumentStorage
 
 
 class FileSystemDocumentStorage(DocumentStorage):
+    @staticmethod
+    def _source_file(document_key: str) -> Path:
+        return Path(Settings().rag_databases_dir, "file_storage", document_key)
+
     def download(
         self, temp_dir: str, bucket_name: str, document_key: str, original_filename: str
     ) -> Path:
         """
-        Copy file from local filesystem into the temp directory
+        Link the stored file into the temp directory instead of copying it
         """
-        source_file = Path(Settings().rag_databases_dir, "file_storage", document_key)
+        # fail here, like a copy would, rather than in whichever reader opens the link
+        source_file = self._source_file(document_key).resolve(strict=True)
         target_file = Path(temp_dir, original_filename)
-        shutil.copy(source_file, target_file)
+        os.symlink(source_file, target_file)
         return target_file
+
+    def open(self, bucket_name: str, document_key: str) -> BinaryIO:
+        return open(self._source_file(document_key), "rb")
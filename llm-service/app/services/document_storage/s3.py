@@ -66,9 +66,11 @@
 #  DATA.
 # ##############################################################################
 
+import io
 import logging
 import os
 from pathlib import Path
+from typing import Any, BinaryIO, Optional
 
 import boto3
 from fastapi import HTTPException
@@ -77,6 +79,64 @@ from .base import DocumentStorage
 
 logger = logging.getLogger(__name__)
 
+# Bytes fetched per ranged GET; reads in between are served from the buffer
+RANGE_BYTES = 8 * 1024 * 1024
+
+
+class S3RangeReader(io.RawIOBase):
+    """
+    A seekable, read-only view of an S3 object that fetches byte ranges as they are read.
+    """
+
+    def __init__(self, client: Any, bucket_name: str, document_key: str):
+        self.client = client
+        self.bucket_name = bucket_name
+        self.document_key = document_key
+        self.size: int = client.head_object(Bucket=bucket_name, Key=document_key)[
+            "ContentLength"
+        ]
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"invalid whence: {whence}")
+        if position < 0:
+            raise ValueError(f"negative seek position {position}")
+        self.position = position
+        return position
+
+    def readinto(self, buffer: Any) -> Optional[int]:
+        view = memoryview(buffer).cast("B")
+        stop = min(self.position + len(view), self.size)
+        if stop <= self.position:
+            return 0
+        response = self.client.get_object(
+            Bucket=self.bucket_name,
+            Key=self.document_key,
+            Range=f"bytes={self.position}-{stop - 1}",
+        )
+        count = 0
+        for chunk in response["Body"].iter_chunks():
+            view[count : count + len(chunk)] = chunk
+            count += len(chunk)
+        self.position += count
+        return count
+
 
 class S3DocumentStorage(DocumentStorage):
     def download(self, temp_dir: str, bucket_name: str, document_key: str, original_filename: str) -> Path:
@@ -85,6 +145,14 @@ class S3DocumentStorage(DocumentStorage):
         """
         return _download(temp_dir, bucket_name, document_key, original_filename)
 
+    def open(self, bucket_name: str, document_key: str) -> BinaryIO:
+        """
+        Stream document from S3 in ranges, without downloading it first
+        """
+        session = boto3.session.Session()
+        reader = S3RangeReader(session.client("s3"), bucket_name, document_key)
+        return io.BufferedReader(reader, buffer_size=RANGE_BYTES)
+
 def _download(tmpdirname: str, bucket_name: str, document_key: str, original_filename: str) -> Path:
     """
     Download document from S3
@@ -0,0 +1,163 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import asyncio
+import functools
+import hashlib
+import os
+from typing import List, Literal, Optional, Sequence, Union
+
+import numpy as np
+import numpy.typing as npt
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from pydantic import PrivateAttr
+
+from ..config import Settings
+from .disk_cache import CacheStats, DiskLRUCache
+
+InputType = Literal["passage", "query"]
+
+
+def _model_key(embedding_model: BaseEmbedding) -> str:
+    # include the class so that two providers that don't report a model name can't collide
+    return f"{type(embedding_model).__name__}:{embedding_model.model_name}"
+
+
+class EmbeddingCache:
+    """Content-addressed embeddings, keyed by embedding model, input type and text."""
+
+    def __init__(self, store: DiskLRUCache):
+        self.store = store
+
+    @staticmethod
+    def _key(model_key: str, input_type: InputType, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{model_key}:{input_type}:{digest}"
+
+    def get_many(
+        self,
+        embedding_model: BaseEmbedding,
+        input_type: InputType,
+        texts: Sequence[str],
+    ) -> List[Optional[npt.NDArray[np.float32]]]:
+        model_key = _model_key(embedding_model)
+        values = self.store.get_many(
+            [self._key(model_key, input_type, text) for text in texts]
+        )
+        return [
+            None if value is None else np.frombuffer(value, dtype=np.float32)
+            for value in values
+        ]
+
+    def put_many(
+        self,
+        embedding_model: BaseEmbedding,
+        input_type: InputType,
+        texts: Sequence[str],
+        embeddings: Union[Sequence[Embedding], npt.NDArray[np.float32]],
+    ) -> None:
+        model_key = _model_key(embedding_model)
+        # stored as float32, which is also the precision Qdrant keeps
+        rows = np.asarray(embeddings, dtype=np.float32)
+        self.store.put_many(
+            [
+                (self._key(model_key, input_type, text), row.tobytes())
+                for text, row in zip(texts, rows)
+            ]
+        )
+
+    def stats(self) -> CacheStats:
+        return self.store.stats()
+
+
+@functools.cache
+def _embedding_cache(path: str, max_size_bytes: int) -> EmbeddingCache:
+    return EmbeddingCache(DiskLRUCache(path, max_size_bytes))
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    settings = Settings()
+    return _embedding_cache(
+        os.path.join(settings.rag_databases_dir, "embedding_cache.sqlite"),
+        settings.embedding_cache_max_bytes,
+    )
+
+
+class QueryCachingEmbedding(BaseEmbedding):
+    """Wraps an embedding model, serving repeated query embeddings from the embedding cache."""
+
+    _inner: BaseEmbedding = PrivateAttr()
+
+    def __init__(self, inner: BaseEmbedding):
+        super().__init__(
+            model_name=inner.model_name, embed_batch_size=inner.embed_batch_size
+        )
+        self._inner = inner
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        cache = get_embedding_cache()
+        cached = cache.get_many(self._inner, "query", [query])[0]
+        if cached is not None:
+            embedding: Embedding = cached.tolist()
+            return embedding
+        embedding = self._inner.get_query_embedding(query)
+        cache.put_many(self._inner, "query", [query], [embedding])
+        return embedding
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        cache = get_embedding_cache()
+        # SQLite blocks, and may wait on writes from other threads and processes
+        [cached] = await asyncio.to_thread(
+            cache.get_many, self._inner, "query", [query]
+        )
+        if cached is not None:
+            embedding: Embedding = cached.tolist()
+            return embedding
+        embedding = await self._inner.aget_query_embedding(query)
+        await asyncio.to_thread(
+            cache.put_many, self._inner, "query", [query], [embedding]
+        )
+        return embedding
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        embedding: Embedding = self._inner.get_text_embedding(text)
+        return embedding
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        embeddings: List[Embedding] = self._inner.get_text_embedding_batch(texts)
+        return embeddings
@@ -0,0 +1,191 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import functools
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Callable, List, Literal, Optional
+
+from ..config import Settings
+
+logger = logging.getLogger(__name__)
+
+JobKind = Literal["index", "summarize", "ingest"]
+JobStage = Literal[
+    "queued", "downloading", "indexing", "summarizing", "completed", "failed"
+]
+
+# Finished jobs kept around so that clients can still read their outcome.
+MAX_FINISHED_JOBS = 1000
+
+
+@dataclass
+class IngestionJob:
+    id: str
+    kind: JobKind
+    data_source_id: int
+    document_id: str
+    stage: JobStage = "queued"
+    chunks_processed: int = 0
+    error: Optional[str] = None
+    result: Any = None
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ("completed", "failed")
+
+
+class QueueFullError(Exception):
+    def __init__(self, retry_after_seconds: int):
+        super().__init__("Too many ingestion jobs are queued; try again later")
+        self.retry_after_seconds = retry_after_seconds
+
+
+class JobProgress:
+    """Handed to a running job so it can report its stage and progress."""
+
+    def __init__(self, queue: "IngestionJobQueue", job_id: str):
+        self._queue = queue
+        self._job_id = job_id
+
+    def stage(self, stage: JobStage) -> None:
+        self._queue._update(self._job_id, stage=stage)
+
+    def chunks_processed(self, count: int) -> None:
+        self._queue._update(self._job_id, chunks_processed=count)
+
+
+class IngestionJobQueue:
+    """
+    Runs indexing and summarization jobs on a bounded pool of worker threads.
+
+    Jobs run independently of the request that submitted them, so they keep going if the
+    client disconnects. Once ``max_workers`` jobs are running and ``max_queued`` more are
+    waiting, new jobs are rejected with :class:`QueueFullError`.
+    """
+
+    def __init__(self, max_workers: int, max_queued: int):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingestion-job"
+        )
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        self._unfinished = 0
+
+    def submit(
+        self,
+        kind: JobKind,
+        data_source_id: int,
+        document_id: str,
+        run: Callable[[JobProgress], Any],
+    ) -> IngestionJob:
+        with self._lock:
+            if self._unfinished >= self.max_workers + self.max_queued:
+                raise QueueFullError(retry_after_seconds=30)
+            now = time.time()
+            job = IngestionJob(
+                id=str(uuid.uuid4()),
+                kind=kind,
+                data_source_id=data_source_id,
+                document_id=document_id,
+                created_at=now,
+                updated_at=now,
+            )
+            self._jobs[job.id] = job
+            self._unfinished += 1
+            snapshot = replace(job)
+        self._executor.submit(self._run, job.id, run)
+        return snapshot
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else replace(job)
+
+    def list_jobs(self, data_source_id: Optional[int] = None) -> List[IngestionJob]:
+        with self._lock:
+            return [
+                replace(job)
+                for job in self._jobs.values()
+                if data_source_id is None or job.data_source_id == data_source_id
+            ]
+
+    def _run(self, job_id: str, run: Callable[[JobProgress], Any]) -> None:
+        try:
+            result = run(JobProgress(self, job_id))
+        except Exception as e:
+            logger.exception(f"Ingestion job {job_id} failed")
+            self._update(job_id, stage="failed", error=str(e))
+        else:
+            self._update(job_id, stage="completed", result=result)
+
+    def _update(self, job_id: str, **changes: Any) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            for name, value in changes.items():
+                setattr(job, name, value)
+            job.updated_at = time.time()
+            if job.finished:
+                self._unfinished -= 1
+                self._forget_old_jobs()
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+
+@functools.cache
+def _ingestion_job_queue(max_workers: int, max_queued: int) -> IngestionJobQueue:
+    return IngestionJobQueue(max_workers, max_queued)
+
+
+def get_ingestion_job_queue() -> IngestionJobQueue:
+    settings = Settings()
+    return _ingestion_job_queue(
+        settings.ingestion_max_workers, settings.ingestion_max_queued_jobs
+    )
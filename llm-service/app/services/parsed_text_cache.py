@@ -0,0 +1,149 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+
+import functools
+import hashlib
+import json
+import os
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+from ..config import Settings
+from .disk_cache import CacheStats, DiskLRUCache
+
+# Large enough that hashing is bound by the disk rather than per-call overhead.
+_HASH_READ_SIZE = 1024 * 1024
+
+
+@dataclass
+class ExtractedPage:
+    label: str
+    text: str
+
+
+@dataclass
+class ExtractedText:
+    """The normalized text of a file as extracted by a reader, one entry per page."""
+
+    pages: List[ExtractedPage]
+    # What normalizing the text removed, if it was normalized; not cached, since the text is
+    # normalized after it's read from the cache.
+    characters_removed: Optional[int] = None
+    tokens_removed: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        return "\n".join(page.text for page in self.pages)
+
+    def to_bytes(self) -> bytes:
+        payload = [[page.label, page.text] for page in self.pages]
+        # text compresses well, and the fastest level is plenty for a cache
+        return zlib.compress(json.dumps(payload).encode("utf-8"), 1)
+
+    @classmethod
+    def from_bytes(cls, value: bytes) -> "ExtractedText":
+        payload = json.loads(zlib.decompress(value).decode("utf-8"))
+        return cls(pages=[ExtractedPage(label, text) for label, text in payload])
+
+
+def file_digest(file_path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while block := f.read(_HASH_READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ParsedTextCache:
+    """
+    Extracted text, keyed by the file's content and the extractor that produced it.
+
+    Also holds the captions of images, keyed by the image's content and the captioning model.
+    """
+
+    def __init__(self, store: DiskLRUCache):
+        self.store = store
+
+    @staticmethod
+    def _key(content_digest: str, extractor: str) -> str:
+        return f"{extractor}:{content_digest}"
+
+    def get(self, content_digest: str, extractor: str) -> Optional[ExtractedText]:
+        value = self.store.get(self._key(content_digest, extractor))
+        if value is None:
+            return None
+        return ExtractedText.from_bytes(value)
+
+    def put(
+        self, content_digest: str, extractor: str, extracted: ExtractedText
+    ) -> None:
+        self.store.put(self._key(content_digest, extractor), extracted.to_bytes())
+
+    def get_captions(
+        self, model: str, image_digests: Sequence[str]
+    ) -> List[Optional[str]]:
+        values = self.store.get_many(
+            [f"caption:{model}:{digest}" for digest in image_digests]
+        )
+        return [None if value is None else value.decode("utf-8") for value in values]
+
+    def put_captions(self, model: str, captions: Sequence[Tuple[str, str]]) -> None:
+        self.store.put_many(
+            [
+                (f"caption:{model}:{digest}", caption.encode("utf-8"))
+                for digest, caption in captions
+            ]
+        )
+
+    def stats(self) -> CacheStats:
+        return self.store.stats()
+
+
+@functools.cache
+def _parsed_text_cache(path: str, max_size_bytes: int) -> ParsedTextCache:
+    return ParsedTextCache(DiskLRUCache(path, max_size_bytes))
+
+
+def get_parsed_text_cache() -> ParsedTextCache:
+    settings = Settings()
+    return _parsed_text_cache(
+        os.path.join(settings.rag_databases_dir, "parsed_text_cache.sqlite"),
+        settings.parsed_text_cache_max_bytes,
+    )
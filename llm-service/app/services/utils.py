@@ -36,8 +36,11 @@
 #  DATA.
 # ##############################################################################
 
+import queue
 import re
-from typing import Generator, List, Sequence, Tuple, TypeVar, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Generator, Iterable, List, Sequence, Tuple, TypeVar, Union
 
 # TODO delete this if it's not being used
 
@@ -83,7 +86,7 @@ T = TypeVar("T")
 
 
 def batch_sequence(
-    sequence: Union[Sequence[T], Generator[T, None, None]], batch_size: int
+    sequence: Iterable[T], batch_size: int
 ) -> Generator[List[T], None, None]:
     batch = []
     for val in sequence:
@@ -101,3 +104,53 @@ def flatten_sequence(
     for sublist in sequence:
         for item in sublist:
             yield item
+
+
+_PREFETCH_DONE = object()
+
+
+def prefetch_sequence(
+    iterable: Iterable[T], max_buffered: int
+) -> Generator[T, None, None]:
+    """
+    Iterate ``iterable`` on a background thread, keeping at most ``max_buffered`` items ahead of the consumer.
+
+    Exceptions raised by the source are re-raised to the consumer.  If the consumer stops early,
+    the background thread stops pulling from the source, and closing the generator waits for
+    it to do so, so that state the source shares with the consumer is left alone afterwards.
+    """
+    buffer: queue.Queue[Any] = queue.Queue(maxsize=max_buffered)
+    stopped = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        finally:
+            # the future holds whatever the source raised
+            put(_PREFETCH_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+    producer = executor.submit(produce)
+    executor.shutdown(wait=False)
+    try:
+        while True:
+            item = buffer.get()
+            if item is _PREFETCH_DONE:
+                producer.result()
+                return
+            yield item
+    finally:
+        stopped.set()
+        # the source may be in the middle of an item, which it finishes before it sees the stop
+        wait([producer])
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.ai.indexing.adaptive_concurrency import (
+    AdaptiveConcurrencyController,
+    classify_overload,
+)
+from app.exceptions import UpstreamHTTPError
+
+
+def succeed(controller: AdaptiveConcurrencyController, times: int) -> None:
+    for _ in range(times):
+        with controller.slot():
+            # a steady 100ms per request
+            controller.record_success(time.monotonic() - 0.1, 10)
+
+
+class TestAdaptiveConcurrencyController:
+    @staticmethod
+    def test_grows_while_latency_is_steady() -> None:
+        controller = AdaptiveConcurrencyController("test", initial_concurrency=2)
+        succeed(controller, 2 + 3 + 4)
+        assert controller.concurrency_limit == 5
+
+    @staticmethod
+    def test_does_not_exceed_maximum() -> None:
+        controller = AdaptiveConcurrencyController(
+            "test", initial_concurrency=2, max_concurrency=3
+        )
+        succeed(controller, 50)
+        assert controller.concurrency_limit == 3
+
+    @staticmethod
+    def test_halves_once_per_congestion_event() -> None:
+        controller = AdaptiveConcurrencyController("test", initial_concurrency=16)
+        started = time.monotonic()
+        controller.record_overload(started, "throttled")
+        # other requests that were already in flight see the same throttling
+        controller.record_overload(started, "throttled")
+        assert controller.concurrency_limit == 8
+        assert controller.batch_size == controller.max_batch_size
+        assert controller.throttled_requests == 2
+
+    @staticmethod
+    def test_timeouts_shrink_batches_until_requests_succeed() -> None:
+        controller = AdaptiveConcurrencyController(
+            "test", initial_concurrency=4, max_batch_size=100
+        )
+        controller.record_overload(time.monotonic(), "timeout")
+        assert controller.batch_size == 50
+        assert controller.concurrency_limit == 2
+        succeed(controller, 2)
+        assert controller.batch_size == 100
+
+    @staticmethod
+    def test_reports_throughput() -> None:
+        controller = AdaptiveConcurrencyController("test")
+        succeed(controller, 6)
+        snapshot = controller.snapshot()
+        assert snapshot.throughput_texts_per_second == pytest.approx(1.0)
+        assert snapshot.in_flight == 0
+
+
+@pytest.mark.parametrize(
+    "error, expected",
+    [
+        (HTTPException(status_code=429), "throttled"),
+        (HTTPException(status_code=503), "throttled"),
+        (HTTPException(status_code=400), None),
+        (UpstreamHTTPError(429, "Too Many Requests"), "throttled"),
+        (TimeoutError(), "timeout"),
+        (ValueError(), None),
+    ],
+)
+def test_classifies_overload(error: BaseException, expected: str) -> None:
+    assert classify_overload(error) == expected
@@ -1,10 +1,15 @@
+import json
 import tempfile
 import uuid
 from pathlib import Path
 
+import pytest
 from app.ai.indexing.embedding_indexer import EmbeddingIndexer
+from app.ai.indexing.readers import csv
+from app.ai.indexing.readers.csv import CSVReader
 from app.ai.vector_stores.qdrant import QdrantVectorStore
 from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.utils import get_tokenizer
 from llama_index.core.vector_stores import VectorStoreQuery
 
 from ....services import models
@@ -43,3 +48,53 @@ def test_csv_indexing() -> None:
         VectorStoreQuery(query_embedding=[0.66] * 1024, similarity_top_k=3)
     )
     assert len(vectors.nodes or []) == 0
+
+
+def _write_csv(path: Path, rows: int) -> Path:
+    with open(path, "w") as f:
+        f.write("name,url,age\n")
+        for i in range(rows):
+            f.write(f"person {i},https://example.com/{i},{20 + i % 50}\n")
+    return path
+
+
+def test_csv_rows_are_streamed_in_order(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(csv, "ROWS_PER_READ", 7)
+    reader = CSVReader(splitter=SentenceSplitter(), document_id="doc", data_source_id=1)
+
+    chunks = list(reader.iter_chunks(_write_csv(tmp_path / "people.csv", 50)))
+
+    assert [chunk.metadata["row_number"] for chunk in chunks] == list(range(1, 51))
+    assert [chunk.metadata["chunk_number"] for chunk in chunks] == list(range(50))
+    assert json.loads(chunks[3].text) == {
+        "age": 23,
+        "name": "person 3",
+        "url": "https://example.com/3",
+    }
+    assert chunks[0].ref_doc_id == "doc"
+
+
+def test_csv_rows_can_be_grouped_by_token_budget(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("CSV_GROUP_ROWS", "true")
+    monkeypatch.setattr(csv, "ROWS_PER_READ", 7)
+    reader = CSVReader(
+        splitter=SentenceSplitter(chunk_size=100, chunk_overlap=0),
+        document_id="doc",
+        data_source_id=1,
+    )
+
+    chunks = list(reader.iter_chunks(_write_csv(tmp_path / "people.csv", 50)))
+
+    assert 1 < len(chunks) < 50
+    expected_first_row = 1
+    for chunk in chunks:
+        assert chunk.metadata["row_number"] == expected_first_row
+        lines = chunk.text.splitlines()
+        assert chunk.metadata["row_number_end"] == expected_first_row + len(lines) - 1
+        assert len(get_tokenizer()(chunk.text)) <= 100
+        expected_first_row = chunk.metadata["row_number_end"] + 1
+    assert expected_first_row == 51
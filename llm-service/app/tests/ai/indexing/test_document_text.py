@@ -0,0 +1,39 @@
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import Document, TextNode
+
+from app.ai.indexing.document_text import DocumentTextCollector
+
+
+class TestDocumentTextCollector:
+    @staticmethod
+    def test_rebuilds_the_text_of_overlapping_chunks() -> None:
+        text = " ".join(f"Sentence number {i} of the document." for i in range(400))
+        chunks = SentenceSplitter(
+            chunk_size=64, chunk_overlap=16
+        ).get_nodes_from_documents([Document(text=text)])
+        collector = DocumentTextCollector()
+        for chunk in chunks:
+            assert isinstance(chunk, TextNode)
+            collector.add(chunk)
+        collector.finish()
+
+        assert len(chunks) > 10
+        assert collector.wait().split() == text.split()
+
+    @staticmethod
+    def test_joins_chunks_without_offsets_by_line() -> None:
+        collector = DocumentTextCollector()
+        collector.add(TextNode(text="first row"))
+        collector.add(TextNode(text="second row"))
+        collector.finish()
+
+        assert collector.wait() == "first row\nsecond row"
+
+    @staticmethod
+    def test_raises_the_error_that_stopped_parsing() -> None:
+        collector = DocumentTextCollector()
+        collector.finish(ValueError("unreadable"))
+
+        with pytest.raises(ValueError, match="unreadable"):
+            collector.wait()
@@ -0,0 +1,157 @@
+import tracemalloc
+import uuid
+from pathlib import Path
+from typing import Any, Iterator, List
+
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import NodeRelationship, RelatedNodeInfo, TextNode
+
+from app.ai.indexing import base
+from app.ai.indexing.embedding_indexer import (
+    EmbeddedBatch,
+    EmbeddingIndexer,
+    _parsing_groups,
+)
+from app.ai.indexing.readers.base_reader import BaseReader
+from app.ai.vector_stores.qdrant import QdrantVectorStore
+
+from ....services import models
+
+
+class SyntheticReader(BaseReader):
+    """Generates a document of ``<chunk count>.synthetic`` chunks without touching the disk."""
+
+    edition = 1
+
+    def load_chunks(self, file_path: Path) -> List[TextNode]:
+        return list(self.iter_chunks(file_path))
+
+    def iter_chunks(self, file_path: Path) -> Iterator[TextNode]:
+        for i in range(int(file_path.stem)):
+            chunk = TextNode(
+                text=f"chunk {i} " + "x" * 1000,
+                relationships={
+                    NodeRelationship.SOURCE: RelatedNodeInfo(node_id=self.document_id)
+                },
+            )
+            chunk.metadata["file_name"] = file_path.name
+            chunk.metadata["document_id"] = self.document_id
+            chunk.metadata["data_source_id"] = self.data_source_id
+            chunk.metadata["chunk_number"] = i
+            chunk.metadata["edition"] = self.edition
+            yield chunk
+
+
+@pytest.fixture
+def indexed_chunks(monkeypatch: pytest.MonkeyPatch) -> List[int]:
+    monkeypatch.setitem(base.READERS, ".synthetic", SyntheticReader)
+    counts: List[int] = []
+
+    # discard the chunks so that the vector store itself doesn't grow with the document
+    def add_to_vector_store(
+        self: EmbeddingIndexer, batch: EmbeddedBatch, wait: bool
+    ) -> None:
+        assert batch.embeddings.shape == (len(batch.chunks), 1024)
+        counts.append(len(batch.chunks))
+
+    monkeypatch.setattr(EmbeddingIndexer, "_add_to_vector_store", add_to_vector_store)
+    return counts
+
+
+class TestEmbeddingIndexer:
+    @staticmethod
+    def _indexer() -> EmbeddingIndexer:
+        return EmbeddingIndexer(
+            1,
+            splitter=SentenceSplitter(),
+            embedding_model=models.get_embedding_model("dummy_model"),
+            chunks_vector_store=QdrantVectorStore.for_chunks(1),
+            max_in_flight=2,
+            queue_depth=50,
+        )
+
+    @staticmethod
+    def _peak_memory_while_indexing(chunk_count: int) -> int:
+        indexer = TestEmbeddingIndexer._indexer()
+        tracemalloc.start()
+        try:
+            indexer.index_file(Path(f"{chunk_count}.synthetic"), str(uuid.uuid4()))
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    @staticmethod
+    def test_indexes_every_chunk(indexed_chunks: List[int]) -> None:
+        TestEmbeddingIndexer._indexer().index_file(
+            Path("2500.synthetic"), str(uuid.uuid4())
+        )
+        assert sum(indexed_chunks) == 2500
+
+    @staticmethod
+    def test_peak_memory_does_not_grow_with_document_size(
+        indexed_chunks: List[int],
+    ) -> None:
+        small = TestEmbeddingIndexer._peak_memory_while_indexing(5_000)
+        large = TestEmbeddingIndexer._peak_memory_while_indexing(25_000)
+        assert sum(indexed_chunks) == 30_000
+        assert large < small * 1.5
+
+    @staticmethod
+    def test_reindexing_only_rewrites_changed_metadata(
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setitem(base.READERS, ".synthetic", SyntheticReader)
+        indexer = TestEmbeddingIndexer._indexer()
+        document_id = str(uuid.uuid4())
+        first = indexer.index_file(Path("300.synthetic"), document_id)
+
+        upserted: List[int] = []
+        updated: List[int] = []
+        vector_store = indexer.chunks_vector_store
+        upsert_chunks = vector_store.upsert_chunks
+        update_chunk_metadata = vector_store.update_chunk_metadata
+
+        def counting_upsert(chunks: List[TextNode], *args: Any, **kwargs: Any) -> None:
+            upserted.append(len(chunks))
+            upsert_chunks(chunks, *args, **kwargs)
+
+        def counting_update(chunks: List[TextNode], *args: Any, **kwargs: Any) -> None:
+            updated.append(len(chunks))
+            update_chunk_metadata(chunks, *args, **kwargs)
+
+        monkeypatch.setattr(vector_store, "upsert_chunks", counting_upsert)
+        monkeypatch.setattr(vector_store, "update_chunk_metadata", counting_update)
+
+        unchanged = indexer.index_file(Path("300.synthetic"), document_id)
+        assert first.chunks_added == 300
+        assert (unchanged.chunks_added, unchanged.chunks_reused) == (0, 300)
+        assert upserted == [] and updated == []
+
+        monkeypatch.setattr(SyntheticReader, "edition", 2)
+        edited = indexer.index_file(Path("300.synthetic"), document_id)
+        assert (edited.chunks_added, edited.chunks_reused) == (0, 300)
+        assert upserted == [] and sum(updated) == 300
+        assert vector_store.size() == 300
+
+    @staticmethod
+    def test_chunks_without_a_source_are_attributed_to_the_document() -> None:
+        [chunk] = EmbeddingIndexer._assign_chunk_ids([TextNode(text="text")], "doc")
+        assert chunk.ref_doc_id == "doc"
+
+    @staticmethod
+    def test_pdfs_converted_by_docling_are_parsed_together(
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setenv("PDF_ENGINE_BY_DATA_SOURCE", '{"7": "docling"}')
+        monkeypatch.setenv("DOCLING_FILES_PER_CALL", "2")
+        files = [(Path(name), name) for name in ("a.pdf", "b.pdf", "c.txt", "d.pdf")]
+
+        groups = [
+            [document_id for _, document_id in group]
+            for _, group in _parsing_groups(files, 7)
+        ]
+
+        assert groups == [["a.pdf", "b.pdf"], ["c.txt"], ["d.pdf"]]
+        assert len(list(_parsing_groups(files, 8))) == 4
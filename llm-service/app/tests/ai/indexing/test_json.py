@@ -0,0 +1,87 @@
+import json
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import TextNode
+from llama_index.core.utils import get_tokenizer
+
+from app.ai.indexing.readers import json as json_reader
+from app.ai.indexing.readers.json import JSONReader
+
+
+def read(path: Path, chunk_size: int = 512) -> List[TextNode]:
+    reader = JSONReader(
+        splitter=SentenceSplitter(chunk_size=chunk_size, chunk_overlap=0),
+        document_id="doc",
+        data_source_id=1,
+    )
+    return list(reader.iter_chunks(path))
+
+
+def write_json(path: Path, content: Any) -> Path:
+    path.write_text(json.dumps(content))
+    return path
+
+
+def test_small_document_is_a_single_chunk(tmp_path: Path) -> None:
+    content = {"b": [1, 2, 3], "a": {"nested": "value"}}
+    [chunk] = read(write_json(tmp_path / "small.json", content))
+    assert chunk.text == json.dumps(content, sort_keys=True)
+    assert chunk.metadata["json_path"] == "$"
+    assert chunk.ref_doc_id == "doc"
+
+
+def test_large_documents_are_chunked_along_their_structure(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(json_reader, "READ_SIZE", 64)
+    records = [{"id": i, "name": f"record {i}", "tags": ["a", "b"]} for i in range(500)]
+    path = write_json(tmp_path / "export.json", {"count": 500, "records": records})
+
+    chunks = read(path, chunk_size=100)
+
+    assert len(chunks) > 1
+    assert chunks[0].metadata["json_path"] == "$.count"
+    for chunk in chunks:
+        assert len(get_tokenizer()(chunk.text)) <= 100
+    values = {}
+    for chunk in chunks:
+        for line in chunk.text.splitlines():
+            json_path, value = line.split(": ", 1)
+            values[json_path] = json.loads(value)
+    assert [values[f"$.records[{i}]"] for i in range(500)] == records
+    assert chunks[-1].metadata["json_path_end"] == "$.records[499]"
+
+
+def test_values_too_large_for_a_chunk_are_split_into_members(tmp_path: Path) -> None:
+    content = {"text": {f"part {i}": "word " * 30 for i in range(10)}}
+    chunks = read(write_json(tmp_path / "nested.json", content), chunk_size=50)
+    paths = [
+        line.split(": ", 1)[0] for chunk in chunks for line in chunk.text.splitlines()
+    ]
+    assert paths == [f'$.text["part {i}"]' for i in range(10)]
+
+
+def test_values_too_long_for_a_chunk_are_split_into_sentences(tmp_path: Path) -> None:
+    text = " ".join(f"Sentence number {i} of the description." for i in range(100))
+    content = {"id": 1, "description": text}
+    chunks = read(write_json(tmp_path / "long.json", content), chunk_size=50)
+    assert len(chunks) > 2
+    for chunk in chunks:
+        assert len(get_tokenizer()(chunk.text)) <= 50
+    lines = [line for chunk in chunks for line in chunk.text.splitlines()]
+    assert lines[0] == "$.id: 1"
+    assert all(line.startswith("$.description: ") for line in lines[1:])
+    assert "Sentence number 99 of the description." in lines[-1]
+    assert chunks[-1].metadata["json_path"] == "$.description"
+
+
+def test_json_lines(tmp_path: Path) -> None:
+    path = tmp_path / "events.jsonl"
+    path.write_text('{"event": "a"}\n\n{"event": "b"}\n')
+    [chunk] = read(path)
+    assert chunk.text == '$[0]: {"event": "a"}\n$[1]: {"event": "b"}'
+    assert chunk.metadata["json_path"] == "$[0]"
+    assert chunk.metadata["json_path_end"] == "$[1]"
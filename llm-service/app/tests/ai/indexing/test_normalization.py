@@ -0,0 +1,147 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import MetadataMode
+from llama_index.core.utils import get_tokenizer
+
+from app.ai.indexing.normalization import normalize_pages
+from app.ai.indexing.readers.docx import DocxReader
+from app.services.parsed_text_cache import ExtractedPage, ExtractedText
+
+
+def report_pages(page_count: int) -> List[ExtractedPage]:
+    return [
+        ExtractedPage(
+            label=str(i + 1),
+            text=(
+                "ACME Corp   Quarterly Report\n"
+                f"Findings  of\tsection {i}.\n\n\n\n"
+                f"Section {i} goes on.\n"
+                "Confidential. Do not distribute.\n"
+                f"Page {i + 1} of {page_count}"
+            ),
+        )
+        for i in range(page_count)
+    ]
+
+
+def table_pages(page_count: int) -> List[ExtractedPage]:
+    return [
+        ExtractedPage(
+            label=str(i + 1),
+            text="\n".join(
+                [
+                    f"Region {i + 1} sales",
+                    "Q1",
+                    "100",
+                    "Q2",
+                    "N/A",
+                    "Total",
+                    "300",
+                    "ACME Corp confidential",
+                ]
+            ),
+        )
+        for i in range(page_count)
+    ]
+
+
+class TestNormalizePages:
+    @staticmethod
+    def test_removes_headers_and_footers_repeated_across_pages() -> None:
+        normalized = normalize_pages(report_pages(12), 0.5)
+
+        assert [page.text for page in normalized.pages[:2]] == [
+            "Findings of section 0.\n\nSection 0 goes on.",
+            "Findings of section 1.\n\nSection 1 goes on.",
+        ]
+        assert [page.label for page in normalized.pages] == [
+            str(i + 1) for i in range(12)
+        ]
+        assert len(normalized.removed_lines) == 36
+        assert "Page 7 of 12" in normalized.removed_lines
+        assert "Page 12 of 12" in normalized.removed_lines
+        assert normalized.characters_removed == sum(
+            len(page.text) for page in report_pages(12)
+        ) - sum(len(page.text) for page in normalized.pages)
+
+    @staticmethod
+    def test_keeps_short_lines_and_lines_that_only_share_the_page_number() -> None:
+        normalized = normalize_pages(table_pages(4), 0.5)
+
+        assert normalized.removed_lines == ["ACME Corp confidential"] * 4
+        assert (
+            normalized.pages[0].text == "Region 1 sales\nQ1\n100\nQ2\nN/A\nTotal\n300"
+        )
+
+    @staticmethod
+    def test_keeps_repeated_lines_in_the_body_of_a_page() -> None:
+        pages = [
+            ExtractedPage(
+                label=str(i + 1),
+                text=f"Intro {i}\nmore {i}\nyet more {i}\n"
+                "A repeated sentence in the middle.\n"
+                f"Outro {i}\nend {i}\nthe end {i}",
+            )
+            for i in range(6)
+        ]
+
+        assert normalize_pages(pages, 0.5).removed_lines == []
+
+    @staticmethod
+    def test_keeps_lines_on_too_few_pages() -> None:
+        pages = report_pages(12)[:2] + [
+            ExtractedPage(label=str(i), text=f"Only on page {chr(96 + i)}.")
+            for i in range(3, 13)
+        ]
+
+        normalized = normalize_pages(pages, 0.5)
+
+        assert normalized.removed_lines == []
+        assert normalized.pages[0].text.startswith("ACME Corp Quarterly Report\n")
+
+
+class TestReaderNormalization:
+    @staticmethod
+    def test_chunks_record_what_was_removed(
+        monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        monkeypatch.setenv("BOILERPLATE_STRIPPING", "true")
+        monkeypatch.setattr(
+            DocxReader,
+            "extract",
+            lambda self, file_path: ExtractedText(pages=report_pages(12)),
+        )
+        file_path = tmp_path / "report.docx"
+        file_path.write_bytes(b"a report")
+
+        reader = DocxReader(SentenceSplitter(), "document", 1)
+        chunks = reader.load_chunks(file_path)
+
+        normalized = normalize_pages(report_pages(12), 0.5)
+        tokens = len(get_tokenizer()("\n".join(normalized.removed_lines)))
+        assert tokens > 0
+        for chunk in chunks:
+            assert chunk.metadata["boilerplate_characters_removed"] == (
+                normalized.characters_removed
+            )
+            assert chunk.metadata["boilerplate_tokens_removed"] == tokens
+            assert "boilerplate" not in chunk.get_metadata_str(MetadataMode.EMBED)
+
+    @staticmethod
+    def test_nothing_is_recorded_without_stripping(
+        monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        monkeypatch.setattr(
+            DocxReader,
+            "extract",
+            lambda self, file_path: ExtractedText(pages=report_pages(12)),
+        )
+        file_path = tmp_path / "report.docx"
+        file_path.write_bytes(b"a report")
+
+        chunks = DocxReader(SentenceSplitter(), "document", 1).load_chunks(file_path)
+
+        assert "boilerplate_tokens_removed" not in chunks[0].metadata
@@ -0,0 +1,75 @@
+import uuid
+from pathlib import Path
+from typing import List
+
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import Document, TextNode
+
+from app.ai.indexing.readers.base_reader import BaseReader, CachedExtraction
+from app.services.parsed_text_cache import (
+    ExtractedPage,
+    ExtractedText,
+    get_parsed_text_cache,
+)
+
+
+class CountingReader(CachedExtraction, BaseReader):
+    """Treats each line of the file as a page, counting how often the file is parsed."""
+
+    extractions = 0
+
+    def extract(self, file_path: Path) -> ExtractedText:
+        CountingReader.extractions += 1
+        lines = file_path.read_text().splitlines()
+        return ExtractedText(
+            pages=[
+                ExtractedPage(label=str(i + 1), text=line)
+                for i, line in enumerate(lines)
+            ]
+        )
+
+    def load_chunks(self, file_path: Path) -> List[TextNode]:
+        document = Document(text=self.extract_cached(file_path).text)
+        document.id_ = self.document_id
+        self._add_document_metadata(document, file_path)
+        return self._chunks_in_document(document)
+
+
+def _reader(chunk_size: int) -> CountingReader:
+    splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=0)
+    return CountingReader(splitter, str(uuid.uuid4()), 1)
+
+
+class TestParsedTextCache:
+    @staticmethod
+    def test_round_trips_pages() -> None:
+        extracted = ExtractedText(
+            pages=[ExtractedPage("i", "first"), ExtractedPage("2", "sécond\npage")]
+        )
+        assert ExtractedText.from_bytes(extracted.to_bytes()) == extracted
+        assert extracted.text == "first\nsécond\npage"
+
+    @staticmethod
+    def test_rechunking_does_not_parse_again(tmp_path: Path) -> None:
+        file_path = tmp_path / "doc.txt"
+        file_path.write_text("\n".join(f"Sentence number {i}." for i in range(200)))
+        CountingReader.extractions = 0
+
+        large = _reader(chunk_size=512).load_chunks(file_path)
+        small = _reader(chunk_size=64).load_chunks(file_path)
+
+        assert CountingReader.extractions == 1
+        assert len(small) > len(large)
+        assert get_parsed_text_cache().stats().hits == 1
+
+    @staticmethod
+    def test_changed_content_is_parsed_again(tmp_path: Path) -> None:
+        file_path = tmp_path / "doc.txt"
+        CountingReader.extractions = 0
+        file_path.write_text("before")
+        _reader(chunk_size=512).load_chunks(file_path)
+        file_path.write_text("after")
+        chunks = _reader(chunk_size=512).load_chunks(file_path)
+
+        assert CountingReader.extractions == 2
+        assert chunks[0].text == "after"
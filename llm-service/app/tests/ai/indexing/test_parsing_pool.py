@@ -0,0 +1,126 @@
+import os
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import TextNode
+
+from app.ai.indexing.helper_processes import usable_processes
+from app.ai.indexing.parsing_pool import ParsingPool, ParsingTimeoutError
+from app.ai.indexing.readers.base_reader import BaseReader
+from app.ai.indexing.readers.csv import CSVReader
+from app.config import Settings
+
+
+class HelperCountReader(BaseReader):
+    """Reports how many helpers a worker would split a long document with."""
+
+    parse_in_subprocess = True
+
+    def load_chunks(self, file_path: Path) -> List[TextNode]:
+        processes = usable_processes(Settings().splitting_processes, tasks=64)
+        return [TextNode(text=str(processes))]
+
+
+@pytest.fixture
+def pool() -> Iterator[ParsingPool]:
+    pool = ParsingPool(processes=1, timeout_seconds=60, niceness=0)
+    yield pool
+    pool.shutdown()
+
+
+@pytest.fixture
+def csv_file(tmp_path: Path) -> Path:
+    path = tmp_path / "people.csv"
+    path.write_text("name,age\nJohn,25\nJane,30\nJim,35")
+    return path
+
+
+class TestParsingPool:
+    @staticmethod
+    def test_matches_parsing_in_process(pool: ParsingPool, csv_file: Path) -> None:
+        splitter = SentenceSplitter(chunk_size=100, chunk_overlap=0)
+        expected = CSVReader(
+            splitter=splitter, document_id="doc", data_source_id=1
+        ).load_chunks(csv_file)
+
+        chunks = pool.parse(CSVReader, splitter, "doc", 1, csv_file)
+
+        assert [chunk.text for chunk in chunks] == [chunk.text for chunk in expected]
+        assert [chunk.metadata for chunk in chunks] == [
+            chunk.metadata for chunk in expected
+        ]
+
+    @staticmethod
+    def test_propagates_parser_errors(pool: ParsingPool, tmp_path: Path) -> None:
+        with pytest.raises(FileNotFoundError):
+            pool.parse(
+                CSVReader, SentenceSplitter(), "doc", 1, tmp_path / "missing.csv"
+            )
+        # the worker survives a failed file
+        assert len(pool._workers) == 1
+
+    @staticmethod
+    def test_replaces_workers_that_time_out(pool: ParsingPool, csv_file: Path) -> None:
+        pool.parse(CSVReader, SentenceSplitter(), "doc", 1, csv_file)
+        [worker] = pool._workers
+
+        pool.timeout_seconds = 0.000001
+        with pytest.raises(ParsingTimeoutError):
+            pool.parse(CSVReader, SentenceSplitter(), "doc", 1, csv_file)
+        assert not worker.process.is_alive()
+
+        pool.timeout_seconds = 60
+        assert len(pool.parse(CSVReader, SentenceSplitter(), "doc", 1, csv_file)) == 3
+
+    @staticmethod
+    def test_parses_several_files_in_one_call(
+        pool: ParsingPool, csv_file: Path, tmp_path: Path
+    ) -> None:
+        files = [
+            ("first", csv_file),
+            ("missing", tmp_path / "missing.csv"),
+            ("last", csv_file),
+        ]
+
+        parsed = pool.iter_parse_files(CSVReader, SentenceSplitter(), 1, files)
+        first = list(next(parsed))
+        # a file that fails doesn't stop the ones after it
+        with pytest.raises(FileNotFoundError):
+            list(next(parsed))
+        last = list(next(parsed))
+
+        assert [chunk.metadata["document_id"] for chunk in first + last] == [
+            "first"
+        ] * 3 + ["last"] * 3
+        assert list(parsed) == []
+        [worker] = pool._workers
+        assert worker.files_parsed == 3
+
+    @staticmethod
+    def test_skips_the_chunks_left_unread(pool: ParsingPool, csv_file: Path) -> None:
+        files = [("first", csv_file), ("second", csv_file)]
+
+        parsed = pool.iter_parse_files(CSVReader, SentenceSplitter(), 1, files)
+        next(next(parsed))
+        second = list(next(parsed))
+
+        assert [chunk.metadata["document_id"] for chunk in second] == ["second"] * 3
+
+    @staticmethod
+    def test_a_file_parsed_on_its_own_is_split_in_parallel(
+        monkeypatch: pytest.MonkeyPatch, csv_file: Path
+    ) -> None:
+        monkeypatch.setattr(os, "cpu_count", lambda: 8)
+        # a worker per core, like the default parsing_processes=0
+        pool = ParsingPool(processes=8, timeout_seconds=60, niceness=0)
+        try:
+            [chunk] = pool.parse(
+                HelperCountReader, SentenceSplitter(), "doc", 1, csv_file
+            )
+        finally:
+            pool.shutdown()
+
+        # the idle workers leave their cores to the busy one
+        assert chunk.text == str(Settings().splitting_processes)
@@ -0,0 +1,207 @@
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+from pypdf import PdfReader
+
+from app.ai.indexing.readers import pdf_engines
+from app.ai.indexing.readers.pdf import PDFReader
+from app.ai.indexing.readers.pdf_engines import (
+    DoclingEngine,
+    PdfEngine,
+    PdfiumEngine,
+    PypdfEngine,
+    engine_names,
+    extract_with_docling_where_needed,
+    extract_with_fallback,
+)
+from app.services.parsed_text_cache import ExtractedPage
+
+from .test_pdf_text import write_text_pdf
+
+
+class FixedEngine(PdfEngine):
+    name = "fixed"
+    text = ""
+
+    def extract(self, file_path: Path) -> Optional[List[ExtractedPage]]:
+        return [ExtractedPage(label="1", text=self.text)]
+
+
+class EmptyEngine(FixedEngine):
+    name = "empty"
+
+
+class TextEngine(FixedEngine):
+    name = "text"
+    text = "A page with plenty of text on it."
+
+
+class FailingEngine(PdfEngine):
+    name = "failing"
+
+    def extract(self, file_path: Path) -> Optional[List[ExtractedPage]]:
+        raise RuntimeError("cannot read this")
+
+
+@pytest.fixture
+def fake_engines(monkeypatch: pytest.MonkeyPatch) -> None:
+    engines = {e.name: e for e in (EmptyEngine, TextEngine, FailingEngine)}
+    monkeypatch.setattr(pdf_engines, "PDF_ENGINES", engines)
+
+
+class TestPdfEngines:
+    @staticmethod
+    def test_text_layer_engines_agree(tmp_path: Path) -> None:
+        file_path = tmp_path / "pages.pdf"
+        write_text_pdf(file_path, 12)
+
+        pypdf_pages = PypdfEngine().extract(file_path)
+        pdfium_pages = PdfiumEngine().extract(file_path)
+
+        assert pypdf_pages and pdfium_pages
+        assert [page.label for page in pdfium_pages] == [
+            page.label for page in pypdf_pages
+        ]
+        assert [page.text.split() for page in pdfium_pages] == [
+            page.text.split() for page in pypdf_pages
+        ]
+
+    @staticmethod
+    @pytest.mark.usefixtures("fake_engines")
+    def test_falls_back_when_an_engine_finds_little_text() -> None:
+        pages = extract_with_fallback(Path("any.pdf"), ["failing", "empty", "text"], 16)
+        assert pages[0].text == TextEngine.text
+
+    @staticmethod
+    @pytest.mark.usefixtures("fake_engines")
+    def test_keeps_the_most_text_when_no_engine_finds_enough() -> None:
+        pages = extract_with_fallback(Path("any.pdf"), ["text", "empty"], 1000)
+        assert pages[0].text == TextEngine.text
+
+    @staticmethod
+    @pytest.mark.usefixtures("fake_engines")
+    def test_raises_when_every_engine_fails() -> None:
+        with pytest.raises(RuntimeError):
+            extract_with_fallback(Path("any.pdf"), ["failing"], 16)
+
+    @staticmethod
+    def test_engine_can_be_chosen_per_data_source(
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setenv("PDF_ENGINE_BY_DATA_SOURCE", '{"7": "pypdfium2"}')
+        assert engine_names(7) == ["pypdfium2", "pypdf"]
+        assert engine_names(8) == ["pypdf", "pypdfium2"]
+
+    @staticmethod
+    def test_data_sources_using_docling_parse_in_the_docling_pool(
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setenv("PDF_ENGINE_BY_DATA_SOURCE", '{"7": "docling"}')
+        assert PDFReader.parsing_pool_name(7) == "docling"
+        assert PDFReader.parsing_pool_name(8) == "default"
+
+    @staticmethod
+    def test_docling_converts_several_pdfs_in_one_call(
+        monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        monkeypatch.setenv("PDF_ENGINE_BY_DATA_SOURCE", '{"7": "docling"}')
+        calls: List[List[Path]] = []
+
+        def extract_all(
+            self: DoclingEngine, file_paths: Sequence[Path]
+        ) -> Iterator[Tuple[Path, Optional[List[ExtractedPage]]]]:
+            calls.append(list(file_paths))
+            for file_path in file_paths:
+                text = f"docling text of {file_path.name}"
+                yield file_path, [ExtractedPage(label="1", text=text)]
+
+        def extract(self: DoclingEngine, file_path: Path) -> List[ExtractedPage]:
+            raise AssertionError(f"{file_path.name} was converted on its own")
+
+        monkeypatch.setattr(DoclingEngine, "extract_all", extract_all)
+        monkeypatch.setattr(DoclingEngine, "extract", extract)
+        file_paths = []
+        for i in range(3):
+            file_path = tmp_path / f"{i}.pdf"
+            write_text_pdf(file_path, i + 1)
+            file_paths.append(file_path)
+
+        preparing = PDFReader(
+            splitter=SentenceSplitter(), document_id="", data_source_id=7
+        )
+        assert list(preparing.prepare_files(file_paths)) == file_paths
+        assert calls == [file_paths]
+
+        # parsing a file afterwards uses what the batch converted
+        reader = PDFReader(
+            splitter=SentenceSplitter(), document_id="doc", data_source_id=7
+        )
+        chunks = reader.load_chunks(file_paths[1])
+        assert [chunk.text for chunk in chunks] == ["docling text of 1.pdf"]
+
+
+class TestDoclingWhereNeeded:
+    @staticmethod
+    @pytest.fixture
+    def docling_calls(monkeypatch: pytest.MonkeyPatch) -> List[int]:
+        """Stands in for docling, recording the number of pages it was given."""
+        calls: List[int] = []
+
+        def extract(self: DoclingEngine, file_path: Path) -> List[ExtractedPage]:
+            page_count = len(PdfReader(file_path).pages)
+            calls.append(page_count)
+            return [
+                ExtractedPage(label=str(i + 1), text=f"OCR text of page {i + 1}")
+                for i in range(page_count)
+            ]
+
+        monkeypatch.setattr(DoclingEngine, "extract", extract)
+        return calls
+
+    @staticmethod
+    def _extract(file_path: Path) -> List[ExtractedPage]:
+        return extract_with_docling_where_needed(
+            file_path, ["pypdfium2", "pypdf"], min_chars_per_page=5, sample_pages=8
+        )
+
+    @staticmethod
+    def test_digital_pdf_skips_docling(
+        tmp_path: Path, docling_calls: List[int]
+    ) -> None:
+        file_path = tmp_path / "digital.pdf"
+        write_text_pdf(file_path, 12)
+
+        pages = TestDoclingWhereNeeded._extract(file_path)
+
+        assert docling_calls == []
+        assert pages[4].text.strip() == "Page 4 text"
+
+    @staticmethod
+    def test_only_scanned_pages_go_to_docling(
+        tmp_path: Path, docling_calls: List[int]
+    ) -> None:
+        file_path = tmp_path / "partly_scanned.pdf"
+        write_text_pdf(file_path, 12, blank_pages={3, 9})
+
+        pages = TestDoclingWhereNeeded._extract(file_path)
+
+        assert docling_calls == [2]
+        assert pages[3].text == "OCR text of page 1"
+        assert pages[9].text == "OCR text of page 2"
+        assert pages[4].text.strip() == "Page 4 text"
+        # labels stay those of the original document
+        assert [pages[3].label, pages[9].label] == ["1", "7"]
+
+    @staticmethod
+    def test_mostly_scanned_pdf_goes_to_docling_whole(
+        tmp_path: Path, docling_calls: List[int]
+    ) -> None:
+        file_path = tmp_path / "scanned.pdf"
+        write_text_pdf(file_path, 12, blank_pages=set(range(1, 12)))
+
+        pages = TestDoclingWhereNeeded._extract(file_path)
+
+        assert docling_calls == [12]
+        assert len(pages) == 12
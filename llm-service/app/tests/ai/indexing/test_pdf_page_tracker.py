@@ -1,10 +1,35 @@
+from typing import List
+
 import pytest
+from hypothesis import given
+from hypothesis import strategies as st
 from llama_index.core import Document
 from llama_index.core.schema import TextNode
 
 from app.ai.indexing.readers.pdf import PageTracker
 
 
+def make_pages(texts: List[str]) -> List[Document]:
+    pages = [Document(text=text) for text in texts]
+    for i, page in enumerate(pages):
+        page.metadata["page_label"] = str(i + 1)
+    return pages
+
+
+def page_containing(texts: List[str], index: int) -> str:
+    """Reference lookup: walk the pages, counting the newline that joins them."""
+    page_start = 0
+    for i, text in enumerate(texts):
+        page_end = page_start + len(text) + 1
+        if index < page_end:
+            return str(i + 1)
+        page_start = page_end
+    return str(len(texts))
+
+
+page_texts = st.lists(st.text(max_size=50), min_size=1, max_size=30)
+
+
 class TestPageTracker:
     @staticmethod
     def test_initializes_correctly() -> None:
@@ -66,3 +91,44 @@ class TestPageTracker:
         chunks = [TextNode(start_char_idx=0)]
         page_counter.populate_chunk_page_numbers(chunks)
         assert chunks[0].metadata["page_number"] == "1"
+
+    @staticmethod
+    def test_chunk_spanning_pages_records_page_span() -> None:
+        page_counter = PageTracker(make_pages(["Page 1", "Page 2", "Page 3"]))
+        chunks = [TextNode(start_char_idx=3, end_char_idx=16)]
+        page_counter.populate_chunk_page_numbers(chunks)
+        assert chunks[0].metadata["page_number"] == "1"
+        assert chunks[0].metadata["page_start"] == "1"
+        assert chunks[0].metadata["page_end"] == "3"
+        assert "page_end" in chunks[0].excluded_embed_metadata_keys
+
+    @staticmethod
+    @given(texts=page_texts, data=st.data())
+    def test_finds_the_page_containing_every_index(
+        texts: List[str], data: st.DataObject
+    ) -> None:
+        page_counter = PageTracker(make_pages(texts))
+        index = data.draw(
+            st.integers(min_value=0, max_value=len(page_counter.document_text))
+        )
+        assert page_counter._find_page_number(index) == page_containing(texts, index)
+
+    @staticmethod
+    @given(texts=page_texts, data=st.data())
+    def test_page_span_covers_the_chunk(texts: List[str], data: st.DataObject) -> None:
+        page_counter = PageTracker(make_pages(texts))
+        document_length = len(page_counter.document_text)
+        start = data.draw(st.integers(min_value=0, max_value=document_length))
+        end = data.draw(st.integers(min_value=start, max_value=document_length))
+        chunk = TextNode(start_char_idx=start, end_char_idx=end)
+
+        page_counter.populate_chunk_page_numbers([chunk])
+
+        page_start = chunk.metadata["page_start"]
+        page_end = chunk.metadata["page_end"]
+        assert page_start == page_containing(texts, start)
+        assert int(page_start) <= int(page_end)
+        if end > start:
+            assert page_end == page_containing(texts, end - 1)
+        else:
+            assert page_end == page_start
@@ -0,0 +1,61 @@
+import os
+from pathlib import Path
+from typing import Collection, cast
+
+import pytest
+from llama_index.readers.file import PDFReader as LlamaIndexPDFReader
+from pypdf import PdfWriter
+from pypdf.constants import PageLabelStyle
+from pypdf.generic import ContentStream, DictionaryObject, NameObject
+
+from app.ai.indexing.readers import pdf_text
+from app.ai.indexing.readers.pdf_text import extract_pages
+
+
+def write_text_pdf(
+    path: Path, page_count: int, blank_pages: Collection[int] = ()
+) -> None:
+    """A PDF with a line of text per page, labelled i-iii then from 1."""
+    writer = PdfWriter()
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    for i in range(page_count):
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+        if i in blank_pages:
+            # like a scanned page, which has no text layer
+            continue
+        content = ContentStream(None, writer)
+        content.set_data(f"BT /F1 12 Tf 72 720 Td (Page {i} text) Tj ET".encode())
+        page.replace_contents(content)
+    # pypdf types the members of PageLabelStyle as plain strings
+    roman = cast(PageLabelStyle, PageLabelStyle.LOWERCASE_ROMAN)
+    decimal = cast(PageLabelStyle, PageLabelStyle.DECIMAL)
+    writer.set_page_label(0, 2, style=roman)
+    writer.set_page_label(3, page_count - 1, style=decimal, start=1)
+    writer.write(path)
+
+
+@pytest.mark.parametrize("processes", [1, 3])
+def test_matches_llama_index_pdf_reader(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path, processes: int
+) -> None:
+    monkeypatch.setattr(pdf_text, "PAGES_PER_TASK", 4)
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    file_path = tmp_path / "pages.pdf"
+    write_text_pdf(file_path, 17)
+
+    expected = LlamaIndexPDFReader(return_full_document=False).load_data(file_path)
+    pages = extract_pages(file_path, processes)
+
+    assert [(page.label, page.text) for page in pages] == [
+        (document.metadata["page_label"], document.text) for document in expected
+    ]
+    assert [page.label for page in pages[:5]] == ["i", "ii", "iii", "1", "2"]
@@ -0,0 +1,92 @@
+import io
+from pathlib import Path
+from typing import List, Sequence
+
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+
+from app.ai.indexing.readers import image_captioning
+from app.ai.indexing.readers.pptx import PptxReader
+
+
+def png(color: str) -> io.BytesIO:
+    image = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(image, format="PNG")
+    image.seek(0)
+    return image
+
+
+def write_deck(path: Path, slide_images: List[List[str]]) -> None:
+    """A deck with a title on each slide, followed by images of the given colors."""
+    presentation = Presentation()
+    for i, colors in enumerate(slide_images):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[5])
+        slide.shapes.title.text = f"Slide title {i}"
+        for color in colors:
+            slide.shapes.add_picture(png(color), Inches(1), Inches(2))
+    presentation.save(str(path))
+
+
+@pytest.fixture
+def captioned_batches(monkeypatch: pytest.MonkeyPatch) -> List[int]:
+    """Stands in for the captioning model, recording the size of each batch."""
+    batches: List[int] = []
+
+    def caption_batch(blobs: Sequence[bytes]) -> List[str]:
+        batches.append(len(blobs))
+        return [f"{Image.open(io.BytesIO(blob)).getpixel((0, 0))}" for blob in blobs]
+
+    monkeypatch.setattr(image_captioning, "_caption_batch", caption_batch)
+    return batches
+
+
+def _reader(data_source_id: int = 1) -> PptxReader:
+    return PptxReader(SentenceSplitter(), "document", data_source_id)
+
+
+class TestPptxReader:
+    @staticmethod
+    def test_captions_images_in_one_batch_across_slides(
+        tmp_path: Path, captioned_batches: List[int]
+    ) -> None:
+        file_path = tmp_path / "deck.pptx"
+        write_deck(file_path, [["red"], ["blue", "red"], []])
+
+        text = _reader().extract(file_path).text
+
+        # the repeated image is only captioned once
+        assert captioned_batches == [2]
+        assert text.startswith("\n\nSlide #0: \nSlide title 0\n")
+        assert "\n Image: (255, 0, 0)\n\n" in text
+        assert "\n Image: (0, 0, 255)\n\n" in text
+        assert "Slide #2: \nSlide title 2\n" in text
+
+    @staticmethod
+    def test_captions_are_cached_by_image(
+        tmp_path: Path, captioned_batches: List[int]
+    ) -> None:
+        write_deck(tmp_path / "first.pptx", [["red"]])
+        write_deck(tmp_path / "second.pptx", [["green"], ["red"]])
+
+        _reader().extract(tmp_path / "first.pptx")
+        _reader().extract(tmp_path / "second.pptx")
+
+        assert captioned_batches == [1, 1]
+
+    @staticmethod
+    def test_captioning_can_be_turned_off_per_data_source(
+        monkeypatch: pytest.MonkeyPatch, tmp_path: Path, captioned_batches: List[int]
+    ) -> None:
+        monkeypatch.setenv("PPTX_IMAGE_CAPTIONING_BY_DATA_SOURCE", '{"2": false}')
+        file_path = tmp_path / "deck.pptx"
+        write_deck(file_path, [["red"], ["blue"]])
+
+        text = _reader(data_source_id=2).extract(file_path).text
+
+        assert captioned_batches == []
+        assert "Image:" not in text
+        assert "Slide title 1" in text
+        assert _reader(2).extractor_name() != _reader(1).extractor_name()
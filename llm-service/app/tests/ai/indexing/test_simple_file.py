@@ -0,0 +1,89 @@
+import io
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from llama_index.core import Document
+from llama_index.core.node_parser import SentenceSplitter
+
+from app.ai.indexing.readers import simple_file
+from app.ai.indexing.readers.simple_file import SimpleFileReader
+
+
+def write_text(path: Path, sentences: int) -> str:
+    text = "".join(
+        f"Sentence {i} says something about the topic of paragraph {i // 7}. "
+        + ("\n\n" if i % 7 == 6 else "")
+        for i in range(sentences)
+    )
+    path.write_text(text)
+    return text
+
+
+def _reader() -> SimpleFileReader:
+    return SimpleFileReader(
+        SentenceSplitter(chunk_size=128, chunk_overlap=16), "document", 1
+    )
+
+
+class TestSimpleFileReader:
+    @staticmethod
+    def test_windows_produce_the_chunks_of_the_whole_file(
+        monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        monkeypatch.setattr(simple_file, "WINDOW_CHARS", 2000)
+        file_path = tmp_path / "notes.txt"
+        text = write_text(file_path, 1000)
+
+        chunks = _reader().load_chunks(file_path)
+
+        document = Document(text=text)
+        _reader()._add_document_metadata(document, file_path)
+        expected = _reader().splitter.get_nodes_from_documents([document])
+        assert [chunk.text for chunk in chunks] == [
+            node.get_content() for node in expected
+        ]
+        for i, chunk in enumerate(chunks):
+            assert chunk.start_char_idx is not None and chunk.end_char_idx is not None
+            assert text[chunk.start_char_idx : chunk.end_char_idx] == chunk.text
+            assert chunk.metadata["chunk_number"] == i
+            assert chunk.metadata["document_id"] == "document"
+
+    @staticmethod
+    def test_reading_a_stream_matches_reading_the_file(
+        monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        monkeypatch.setattr(simple_file, "WINDOW_CHARS", 2000)
+        file_path = tmp_path / "notes.txt"
+        write_text(file_path, 500)
+
+        stream = io.BytesIO(file_path.read_bytes())
+        streamed = list(_reader().iter_stream_chunks(stream, Path("notes.txt")))
+
+        chunks = _reader().load_chunks(file_path)
+        assert [chunk.text for chunk in streamed] == [chunk.text for chunk in chunks]
+        assert [chunk.metadata for chunk in streamed] == [
+            chunk.metadata for chunk in chunks
+        ]
+
+    @staticmethod
+    def test_peak_memory_does_not_grow_with_file_size(
+        monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ) -> None:
+        monkeypatch.setattr(simple_file, "WINDOW_CHARS", 32 * 1024)
+
+        def peak_memory(sentences: int) -> int:
+            file_path = tmp_path / f"{sentences}.txt"
+            write_text(file_path, sentences)
+            tracemalloc.start()
+            try:
+                for _ in _reader().iter_chunks(file_path):
+                    pass
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            return peak
+
+        small = peak_memory(5_000)
+        large = peak_memory(25_000)
+        assert large < small * 1.5
@@ -0,0 +1,56 @@
+import os
+import random
+
+import pytest
+from llama_index.core.node_parser import SentenceSplitter
+
+from app.ai.indexing import helper_processes, splitting
+from app.ai.indexing.helper_processes import limit_cores, usable_processes
+from app.ai.indexing.splitting import get_sentence_splitter, split_text
+
+
+def make_text(sentences: int) -> str:
+    rng = random.Random(0)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+    return "".join(
+        f"Sentence {i} "
+        + " ".join(rng.choices(words, k=rng.randrange(2, 30)))
+        + "."
+        + ("\n\n" if rng.random() < 0.1 else " ")
+        for i in range(sentences)
+    )
+
+
+def test_splitters_are_shared_per_configuration() -> None:
+    assert get_sentence_splitter(512, 51) is get_sentence_splitter(512, 51)
+    assert get_sentence_splitter(512, 51) is not get_sentence_splitter(256, 51)
+    assert get_sentence_splitter(2048).chunk_overlap == SentenceSplitter().chunk_overlap
+
+
+def test_sections_split_in_parallel_match_splitting_in_one_piece(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(splitting, "SECTION_CHARS", 8000)
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+    splitter = SentenceSplitter(chunk_size=64, chunk_overlap=16)
+    text = make_text(3000)
+
+    serial = split_text(splitter, text, "", processes=1)
+    parallel = split_text(splitter, text, "", processes=4)
+
+    assert [chunk for chunk, _ in serial] == splitter.split_text(text)
+    assert parallel == serial
+
+
+def test_parsing_workers_only_start_helpers_for_their_share_of_cores(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    monkeypatch.setattr(helper_processes, "_cores", None)
+    assert usable_processes(16, 16) == 8
+
+    limit_cores(2)
+    assert usable_processes(16, 16) == 2
+
+    limit_cores(0)
+    assert usable_processes(16, 16) == 1
@@ -0,0 +1,24 @@
+from fastapi.testclient import TestClient
+
+from app.ai.vector_stores import qdrant
+from app.ai.vector_stores.qdrant import QdrantVectorStore
+from app.main import app
+
+
+class TestSharedQdrantClient:
+    @staticmethod
+    def test_vector_stores_share_one_client() -> None:
+        chunks = QdrantVectorStore("index_1", 1)
+        summaries = QdrantVectorStore("summary_index_1", 1)
+
+        assert chunks.client is summaries.client is qdrant.get_qdrant_client()
+        assert qdrant.qdrant_is_healthy()
+
+    @staticmethod
+    def test_app_opens_the_client_on_startup_and_closes_it_on_shutdown() -> None:
+        with TestClient(app):
+            opened = qdrant._shared_client
+            assert opened is not None
+            assert QdrantVectorStore("index_1", 1).client is opened
+
+        assert qdrant._shared_client is None
@@ -51,6 +51,7 @@ from fastapi.testclient import TestClient
 from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
 from llama_index.core.llms import LLM
 
+from app.ai.vector_stores import qdrant
 from app.ai.vector_stores.qdrant import QdrantVectorStore
 from app.main import app
 from app.services import data_sources_metadata_api, models
@@ -119,6 +120,16 @@ class DummyEmbeddingModel(BaseEmbedding):
         return [0.1] * 1024
 
 
+@pytest.fixture(autouse=True)
+def shared_qdrant_client(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    """The client the app opens on startup, in memory instead of connecting to Qdrant."""
+    monkeypatch.setattr(
+        qdrant, "new_qdrant_client", lambda: q_client.QdrantClient(":memory:")
+    )
+    yield
+    qdrant.close_qdrant_client()
+
+
 @pytest.fixture(autouse=True)
 def vector_store(
     monkeypatch: pytest.MonkeyPatch, qdrant_client: q_client.QdrantClient
@@ -37,6 +37,7 @@
 # ##############################################################################
 
 """Integration tests for app/routers/index/data_source/."""
+import time
 from pathlib import Path
 from typing import Any
 
@@ -78,6 +79,29 @@ class TestDocumentIndexing:
         )
         assert len(vectors.nodes or []) == 1
 
+    @staticmethod
+    def test_indexed_chunks_are_readable_by_llama_index(
+        client: TestClient,
+        index_document_request_body: dict[str, Any],
+        document_id: str,
+        data_source_id: int,
+        test_file: Path,
+    ) -> None:
+        response = client.post(
+            f"/data_sources/{data_source_id}/documents/{document_id}/index",
+            json=index_document_request_body,
+        )
+
+        assert response.status_code == 200
+        index = get_vector_store_index(data_source_id)
+        vectors = index.vector_store.query(
+            VectorStoreQuery(query_embedding=[0.66] * 1024)
+        )
+        [node] = vectors.nodes or []
+        assert node.metadata["document_id"] == document_id
+        assert node.get_content()
+        assert node.get_content() in test_file.read_text()
+
     @staticmethod
     def test_double_create_document(
         client: TestClient,
@@ -191,3 +215,114 @@ class TestDocumentIndexing:
         response = client.get(f"/data_sources/{data_source_id}/size")
         assert response.status_code == 200
         assert response.json() > 0
+
+    @staticmethod
+    def test_reindex_only_embeds_changed_chunks(
+        client: TestClient,
+        data_source_id: int,
+        document_id: str,
+        index_document_request_body: dict[str, Any],
+        test_file: Path,
+    ) -> None:
+        index_url = f"/data_sources/{data_source_id}/documents/{document_id}/index"
+        first = client.post(index_url, json=index_document_request_body).json()
+        assert first["chunks_added"] > 0
+        assert first["chunks_reused"] == 0
+
+        unchanged = client.post(index_url, json=index_document_request_body).json()
+        assert unchanged == {
+            "chunks_added": 0,
+            "chunks_reused": first["chunks_added"],
+            "chunks_removed": 0,
+        }
+
+        with open(test_file, "a") as f:
+            f.write("\n\nA brand new closing paragraph. " * 100)
+        edited = client.post(index_url, json=index_document_request_body).json()
+        assert edited["chunks_reused"] > 0
+        assert edited["chunks_added"] > 0
+
+        size = client.get(f"/data_sources/{data_source_id}/size").json()
+        assert size == edited["chunks_reused"] + edited["chunks_added"]
+
+    @staticmethod
+    def test_batch_index_reports_each_document(
+        client: TestClient,
+        data_source_id: int,
+        databases_dir: str,
+        index_document_request_body: dict[str, Any],
+    ) -> None:
+        documents = []
+        for i in range(3):
+            key = f"test/batch-{i}"
+            if i != 1:
+                path = Path(databases_dir, "file_storage", key)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_text(f"Small document number {i}. " * 20)
+            documents.append(
+                {
+                    **index_document_request_body,
+                    "s3_document_key": key,
+                    "document_id": f"batch-{i}",
+                }
+            )
+
+        response = client.post(
+            f"/data_sources/{data_source_id}/documents/index",
+            json={"documents": documents},
+        )
+
+        assert response.status_code == 200
+        statuses = response.json()
+        assert [status["document_id"] for status in statuses] == [
+            "batch-0",
+            "batch-1",
+            "batch-2",
+        ]
+        assert [status["success"] for status in statuses] == [True, False, True]
+        assert statuses[1]["error"]
+        size = client.get(f"/data_sources/{data_source_id}/size").json()
+        assert size == sum(
+            status["result"]["chunks_added"] for status in statuses if status["success"]
+        )
+
+    @staticmethod
+    def test_batch_index_rejects_repeated_documents(
+        client: TestClient,
+        data_source_id: int,
+        index_document_request_body: dict[str, Any],
+    ) -> None:
+        document = {**index_document_request_body, "document_id": "repeated"}
+        response = client.post(
+            f"/data_sources/{data_source_id}/documents/index",
+            json={"documents": [document, document]},
+        )
+        assert response.status_code == 400
+
+    @staticmethod
+    def test_index_document_as_job(
+        client: TestClient,
+        data_source_id: int,
+        document_id: str,
+        index_document_request_body: dict[str, Any],
+        test_file: Path,
+    ) -> None:
+        response = client.post(
+            f"/data_sources/{data_source_id}/documents/{document_id}/index",
+            params={"run_async": True},
+            json=index_document_request_body,
+        )
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+
+        deadline = time.monotonic() + 30
+        job = client.get(f"/ingestion_jobs/{job_id}").json()
+        while job["stage"] not in ("completed", "failed"):
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+            job = client.get(f"/ingestion_jobs/{job_id}").json()
+
+        assert job["stage"] == "completed", job["error"]
+        assert job["document_id"] == document_id
+        assert job["chunks_processed"] == job["result"]["chunks_added"]
+        assert client.get("/ingestion_jobs/unknown").status_code == 404
@@ -38,12 +38,60 @@
 from pathlib import Path
 from typing import Any
 
+import pytest
 from fastapi.testclient import TestClient
 
+from app.ai.indexing import embedding_indexer, summary_indexer
+from app.ai.indexing.parsing_pool import iter_file_chunks
+from app.services.document_storage.file_storage import FileSystemDocumentStorage
+
 from ...conftest import BotoObject
 
 
 class TestDocumentSummaries:
+    @staticmethod
+    def test_ingest_downloads_once_to_index_and_summarize(
+        client: TestClient,
+        monkeypatch: pytest.MonkeyPatch,
+        index_document_request_body: dict[str, Any],
+        data_source_id: int,
+        document_id: str,
+        test_file: Path,
+    ) -> None:
+        downloads: list[str] = []
+        download = FileSystemDocumentStorage.download
+
+        def counting_download(
+            self: FileSystemDocumentStorage, temp_dir: str, *args: Any
+        ) -> Path:
+            downloads.append(temp_dir)
+            return download(self, temp_dir, *args)
+
+        monkeypatch.setattr(FileSystemDocumentStorage, "download", counting_download)
+
+        parses: list[Path] = []
+
+        def counting_iter_file_chunks(*args: Any) -> Any:
+            parses.append(args[-1])
+            return iter_file_chunks(*args)
+
+        for module in (embedding_indexer, summary_indexer):
+            monkeypatch.setattr(module, "iter_file_chunks", counting_iter_file_chunks)
+
+        response = client.post(
+            f"/data_sources/{data_source_id}/documents/{document_id}/ingest",
+            json=index_document_request_body,
+        )
+
+        assert response.status_code == 200
+        assert len(downloads) == 1
+        assert len(parses) == 1
+        chunks_added = response.json()["indexing"]["chunks_added"]
+        assert chunks_added > 0
+        assert response.json()["summary"] == "this is a completion response"
+        size = client.get(f"/data_sources/{data_source_id}/size").json()
+        assert size == chunks_added
+
     @staticmethod
     def test_generate_summary(
         client: TestClient,
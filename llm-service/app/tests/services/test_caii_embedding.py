@@ -0,0 +1,222 @@
+# ##############################################################################
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. (“Cloudera”) to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+# ##############################################################################
+
+
+import asyncio
+import base64
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+import pytest
+
+from app.exceptions import UpstreamHTTPError
+from app.services.caii import utils
+from app.services.caii.CaiiEmbeddingModel import CaiiEmbeddingModel
+from app.services.caii.types import Endpoint, EndpointMetadata
+
+
+class StubServer(ThreadingHTTPServer):
+    # status codes to answer with before responding normally
+    failures: List[int]
+    connections: int = 0
+    encoding_formats: List[str]
+
+
+class StubEmbeddingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StubServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connections += 1
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        assert self.headers["Authorization"] == "Bearer test-token"
+        if self.server.failures:
+            self._respond(self.server.failures.pop(0), {"error": "unavailable"})
+            return
+        encoding_format = body.get("encoding_format", "float")
+        self.server.encoding_formats.append(encoding_format)
+        embeddings = [[float(len(text)), 0.5] for text in body["input"]]
+        data: List[Dict[str, Any]]
+        if encoding_format == "base64":
+            data = [
+                {
+                    "embedding": base64.b64encode(
+                        np.array(embedding, dtype=np.float32).tobytes()
+                    ).decode("ascii")
+                }
+                for embedding in embeddings
+            ]
+        else:
+            data = [{"embedding": embedding} for embedding in embeddings]
+        self._respond(200, {"data": data})
+
+    def _respond(self, status: int, payload: Any) -> None:
+        response = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def stub_server(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+) -> Iterator[StubServer]:
+    jwt_path = tmp_path / "jwt"
+    jwt_path.write_text(json.dumps({"access_token": "test-token"}))
+    monkeypatch.setattr(utils, "JWT_PATH", str(jwt_path))
+
+    server = StubServer(("127.0.0.1", 0), StubEmbeddingHandler)
+    server.failures = []
+    server.encoding_formats = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def model(stub_server: StubServer) -> CaiiEmbeddingModel:
+    return CaiiEmbeddingModel(
+        Endpoint(
+            namespace="serving-default",
+            name="stub",
+            url=f"http://127.0.0.1:{stub_server.server_address[1]}/v1/embeddings",
+            observed_generation=1,
+            replica_count=1,
+            created_by="test",
+            description="",
+            created_at="",
+            resources={},
+            autoscaling={},
+            endpointmetadata=EndpointMetadata(model_name="stub"),
+            traffic={},
+            api_standard="openai",
+            has_chat_template=False,
+            metricFormat="",
+            task="EMBED",
+            instance_type="",
+        )
+    )
+
+
+class TestCaiiEmbeddingModel:
+    @staticmethod
+    def test_reuses_connections(
+        model: CaiiEmbeddingModel, stub_server: StubServer
+    ) -> None:
+        for _ in range(5):
+            assert model.get_query_embedding("four") == [4.0, 0.5]
+        assert stub_server.connections == 1
+
+    @staticmethod
+    def test_embeds_batches(model: CaiiEmbeddingModel) -> None:
+        assert model.get_text_embedding_batch(["a", "bb", "ccc"]) == [
+            [1.0, 0.5],
+            [2.0, 0.5],
+            [3.0, 0.5],
+        ]
+
+    @staticmethod
+    def test_embeds_passages_into_float32_array(
+        model: CaiiEmbeddingModel,
+        stub_server: StubServer,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        monkeypatch.setenv("CAII_EMBEDDING_BASE64", "true")
+        embeddings = model.get_text_embedding_array(["a", "bb"])
+        assert embeddings.dtype == np.float32
+        assert embeddings.tolist() == [[1.0, 0.5], [2.0, 0.5]]
+        assert stub_server.encoding_formats == ["base64"]
+
+    @staticmethod
+    def test_decodes_json_float_embeddings(
+        model: CaiiEmbeddingModel, stub_server: StubServer
+    ) -> None:
+        assert model.get_text_embedding_array(["a"]).tolist() == [[1.0, 0.5]]
+        assert stub_server.encoding_formats == ["float"]
+
+    @staticmethod
+    def test_rejects_non_finite_embeddings() -> None:
+        with pytest.raises(ValueError):
+            CaiiEmbeddingModel._parse_embeddings(
+                {"data": [{"embedding": [float("nan")]}]}, 1
+            )
+
+    @staticmethod
+    def test_rejects_missing_embeddings() -> None:
+        with pytest.raises(ValueError):
+            CaiiEmbeddingModel._parse_embeddings({"data": [{"embedding": [1.0]}]}, 2)
+
+    @staticmethod
+    def test_async_query_embedding(model: CaiiEmbeddingModel) -> None:
+        async def embed() -> List[List[float]]:
+            return list(
+                await asyncio.gather(
+                    model.aget_query_embedding("one"),
+                    model.aget_text_embedding("three"),
+                )
+            )
+
+        assert asyncio.run(embed()) == [[3.0, 0.5], [5.0, 0.5]]
+
+    @staticmethod
+    def test_retries_gateway_errors(
+        model: CaiiEmbeddingModel, stub_server: StubServer
+    ) -> None:
+        stub_server.failures = [502, 504]
+        assert model.get_query_embedding("four") == [4.0, 0.5]
+
+    @staticmethod
+    def test_raises_throttling_to_the_caller(
+        model: CaiiEmbeddingModel, stub_server: StubServer
+    ) -> None:
+        stub_server.failures = [429]
+        with pytest.raises(UpstreamHTTPError) as e:
+            model.get_query_embedding("four")
+        assert e.value.status_code == 429
@@ -0,0 +1,115 @@
+# ##############################################################################
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. (“Cloudera”) to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+
+import io
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+import pytest
+
+from app.services.document_storage.file_storage import FileSystemDocumentStorage
+from app.services.document_storage.s3 import S3RangeReader
+
+
+class FakeBody:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        for start in range(0, len(self.data), 3):
+            yield self.data[start : start + 3]
+
+
+class FakeS3Client:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.ranges: list[str] = []
+
+    def head_object(self, Bucket: str, Key: str) -> Dict[str, Any]:
+        return {"ContentLength": len(self.data)}
+
+    def get_object(self, Bucket: str, Key: str, Range: str) -> Dict[str, Any]:
+        self.ranges.append(Range)
+        start, stop = Range.removeprefix("bytes=").split("-")
+        return {"Body": FakeBody(self.data[int(start) : int(stop) + 1])}
+
+
+class TestFileSystemDocumentStorage:
+    @staticmethod
+    def test_download_links_the_stored_file(databases_dir: str, tmp_path: Path) -> None:
+        stored = Path(databases_dir, "file_storage", "docs", "key")
+        stored.parent.mkdir(parents=True)
+        stored.write_bytes(b"stored document")
+        temp_dir = tmp_path / "download"
+        temp_dir.mkdir()
+
+        path = FileSystemDocumentStorage().download(
+            str(temp_dir), "bucket", "docs/key", "report.txt"
+        )
+
+        assert path == temp_dir / "report.txt"
+        assert path.samefile(stored)
+        assert path.read_bytes() == b"stored document"
+        with FileSystemDocumentStorage().open("bucket", "docs/key") as f:
+            assert f.read() == b"stored document"
+
+    @staticmethod
+    def test_download_of_a_missing_file_fails(tmp_path: Path) -> None:
+        temp_dir = tmp_path / "download"
+        temp_dir.mkdir()
+        with pytest.raises(FileNotFoundError):
+            FileSystemDocumentStorage().download(
+                str(temp_dir), "bucket", "docs/missing", "report.txt"
+            )
+        assert list(temp_dir.iterdir()) == []
+
+
+class TestS3RangeReader:
+    @staticmethod
+    def test_reads_only_the_requested_ranges() -> None:
+        data = bytes(range(256)) * 4
+        client = FakeS3Client(data)
+        stream = io.BufferedReader(
+            S3RangeReader(client, "bucket", "key"), buffer_size=100
+        )
+
+        assert stream.read(10) == data[:10]
+        stream.seek(-24, io.SEEK_END)
+        assert stream.read() == data[-24:]
+        stream.seek(500)
+        assert stream.read(50) == data[500:550]
+        assert client.ranges == ["bytes=0-99", "bytes=1000-1023", "bytes=500-599"]
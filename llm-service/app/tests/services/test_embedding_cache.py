@@ -0,0 +1,148 @@
+# ##############################################################################
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. (“Cloudera”) to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+# ##############################################################################
+
+
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+
+from app.services.disk_cache import DiskLRUCache
+from app.services.embedding_cache import QueryCachingEmbedding, get_embedding_cache
+
+
+class CountingEmbeddingModel(BaseEmbedding):
+    calls: int = 0
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        self.calls += 1
+        return [0.5] * 8
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        self.calls += 1
+        return [float(len(text))] * 8
+
+
+class TestDiskLRUCache:
+    @staticmethod
+    def test_counts_hits_and_misses(tmp_path: Path) -> None:
+        cache = DiskLRUCache(os.path.join(tmp_path, "cache.sqlite"), 1024 * 1024)
+        cache.put("a", b"1")
+        assert cache.get_many(["a", "b"]) == [b"1", None]
+        stats = cache.stats()
+        assert (stats.hits, stats.misses) == (1, 1)
+
+    @staticmethod
+    def test_evicts_least_recently_used(tmp_path: Path) -> None:
+        cache = DiskLRUCache(os.path.join(tmp_path, "cache.sqlite"), 1000)
+        cache.put_many([(f"old{i}", b"x" * 100) for i in range(5)])
+        time.sleep(0.01)
+        assert cache.get("old0") is not None
+        time.sleep(0.01)
+        cache.put_many([(f"new{i}", b"x" * 100) for i in range(5)])
+
+        assert cache.stats().size_bytes <= 1000
+        assert cache.get("old1") is None
+        assert cache.get("old0") is not None
+        assert cache.get("new4") is not None
+
+    @staticmethod
+    def test_replacing_an_entry_counts_only_its_new_size(tmp_path: Path) -> None:
+        cache = DiskLRUCache(os.path.join(tmp_path, "cache.sqlite"), 1024 * 1024)
+        cache.put("a", b"x" * 100)
+        cache.put("a", b"x" * 10)
+        cache.put_many([("b", b"x" * 100), ("b", b"x" * 20)])
+
+        assert cache.stats().size_bytes == len("a") + 10 + len("b") + 20
+        assert cache.get("b") == b"x" * 20
+
+    @staticmethod
+    def test_persists_across_instances(tmp_path: Path) -> None:
+        path = os.path.join(tmp_path, "cache.sqlite")
+        DiskLRUCache(path, 1000).put("a", b"1")
+        assert DiskLRUCache(path, 1000).get("a") == b"1"
+
+
+class TestEmbeddingCache:
+    @staticmethod
+    def test_keys_on_input_type() -> None:
+        model = CountingEmbeddingModel()
+        cache = get_embedding_cache()
+        cache.put_many(model, "passage", ["hello"], [[1.0, 2.0]])
+        hit, miss = cache.get_many(model, "passage", ["hello", "bye"])
+        assert hit is not None and hit.tolist() == [1.0, 2.0]
+        assert miss is None
+        assert cache.get_many(model, "query", ["hello"]) == [None]
+
+    @staticmethod
+    def test_query_embeddings_are_cached() -> None:
+        model = CountingEmbeddingModel()
+        cached_model = QueryCachingEmbedding(model)
+        first: List[float] = cached_model.get_query_embedding("what is rag?")
+        second: List[float] = cached_model.get_query_embedding("what is rag?")
+        assert first == second
+        assert model.calls == 1
+
+    @staticmethod
+    def test_async_query_embeddings_are_cached() -> None:
+        model = CountingEmbeddingModel()
+        cached_model = QueryCachingEmbedding(model)
+        first = asyncio.run(cached_model.aget_query_embedding("what is rag?"))
+        second = asyncio.run(cached_model.aget_query_embedding("what is rag?"))
+        assert first == second
+        assert model.calls == 1
+
+    @staticmethod
+    def test_cache_lives_in_databases_dir(databases_dir: str) -> None:
+        assert get_embedding_cache().store.path.startswith(databases_dir)
+
+
+@pytest.mark.parametrize("text", ["", "naïve café", "x" * 10_000])
+def test_round_trips_float32_embeddings(text: str) -> None:
+    model = CountingEmbeddingModel()
+    cache = get_embedding_cache()
+    cache.put_many(model, "passage", [text], [[0.25, -1.5, 3.0]])
+    [cached] = cache.get_many(model, "passage", [text])
+    assert cached is not None and cached.tolist() == [0.25, -1.5, 3.0]
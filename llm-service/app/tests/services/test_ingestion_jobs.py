@@ -0,0 +1,112 @@
+# ##############################################################################
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. (“Cloudera”) to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+# ##############################################################################
+
+
+import threading
+import time
+
+import pytest
+
+from app.services.ingestion_jobs import (
+    IngestionJob,
+    IngestionJobQueue,
+    JobProgress,
+    QueueFullError,
+)
+
+
+def wait_until_finished(queue: IngestionJobQueue, job_id: str) -> IngestionJob:
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        assert job is not None
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+class TestIngestionJobQueue:
+    @staticmethod
+    def test_reports_progress_and_result() -> None:
+        queue = IngestionJobQueue(max_workers=1, max_queued=0)
+
+        def run(progress: JobProgress) -> str:
+            progress.stage("indexing")
+            progress.chunks_processed(42)
+            return "done"
+
+        job = queue.submit("index", 1, "doc", run)
+        assert job.stage == "queued"
+        finished = wait_until_finished(queue, job.id)
+        assert finished.stage == "completed"
+        assert finished.chunks_processed == 42
+        assert finished.result == "done"
+
+    @staticmethod
+    def test_records_failures() -> None:
+        queue = IngestionJobQueue(max_workers=1, max_queued=0)
+
+        def run(progress: JobProgress) -> None:
+            raise ValueError("unparseable")
+
+        job = queue.submit("index", 1, "doc", run)
+        finished = wait_until_finished(queue, job.id)
+        assert finished.stage == "failed"
+        assert finished.error == "unparseable"
+
+    @staticmethod
+    def test_rejects_jobs_when_saturated() -> None:
+        queue = IngestionJobQueue(max_workers=1, max_queued=1)
+        release = threading.Event()
+        jobs = [
+            queue.submit("index", 1, f"doc{i}", lambda _: release.wait(10))
+            for i in range(2)
+        ]
+        with pytest.raises(QueueFullError):
+            queue.submit("index", 1, "doc2", lambda _: None)
+
+        release.set()
+        for job in jobs:
+            wait_until_finished(queue, job.id)
+        queue.submit("index", 1, "doc3", lambda _: None)
+        assert [job.document_id for job in queue.list_jobs(data_source_id=1)] == [
+            "doc0",
+            "doc1",
+            "doc3",
+        ]
@@ -0,0 +1,82 @@
+# ##############################################################################
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. (“Cloudera”) to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+# ##############################################################################
+
+import threading
+import time
+from typing import Iterator, List
+
+import pytest
+
+from app.services.utils import prefetch_sequence
+
+
+class TestPrefetchSequence:
+    @staticmethod
+    def test_yields_every_item_in_order() -> None:
+        assert list(prefetch_sequence(range(100), 3)) == list(range(100))
+
+    @staticmethod
+    def test_reraises_what_the_source_raises() -> None:
+        def source() -> Iterator[int]:
+            yield 1
+            raise ValueError("source failed")
+
+        with pytest.raises(ValueError, match="source failed"):
+            list(prefetch_sequence(source(), 3))
+
+    @staticmethod
+    def test_closing_waits_for_the_source_to_stop() -> None:
+        producing = threading.Event()
+        produced: List[int] = []
+
+        def source() -> Iterator[int]:
+            for i in range(100):
+                producing.set()
+                # stands in for parsing, which updates state the consumer reads afterwards
+                time.sleep(0.05)
+                produced.append(i)
+                yield i
+
+        items = prefetch_sequence(source(), 1)
+        assert next(items) == 0
+        producing.wait()
+        items.close()
+
+        count = len(produced)
+        time.sleep(0.2)
+        assert len(produced) == count < 100
@@ -0,0 +1,180 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Benchmark CaiiEmbeddingModel's pooled HTTP client against a new connection per request.
+
+Runs a local stub of the CAII embeddings API, so no CAII access is needed::
+
+    uv run python -m benchmarks.caii_embedding --requests 500
+
+The stub speaks plain HTTP, so the per-request baseline only pays for TCP setup.
+Against CAII, every one of those requests also pays for a TLS handshake.
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, List
+
+from app.services.caii import utils
+from app.services.caii.CaiiEmbeddingModel import CaiiEmbeddingModel
+from app.services.caii.types import Endpoint, EndpointMetadata
+
+DIMENSIONS = 1024
+
+
+class StubEmbeddingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        response = json.dumps(
+            {"data": [{"embedding": [0.1] * DIMENSIONS} for _ in texts]}
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def stub_endpoint(port: int) -> Endpoint:
+    return Endpoint(
+        namespace="serving-default",
+        name="stub",
+        url=f"http://127.0.0.1:{port}/v1/embeddings",
+        observed_generation=1,
+        replica_count=1,
+        created_by="benchmark",
+        description="",
+        created_at="",
+        resources={},
+        autoscaling={},
+        endpointmetadata=EndpointMetadata(model_name="stub"),
+        traffic={},
+        api_standard="openai",
+        has_chat_template=False,
+        metricFormat="",
+        task="EMBED",
+        instance_type="",
+    )
+
+
+def connection_per_request(port: int, body: str) -> Any:
+    """What CaiiEmbeddingModel used to do: open a connection and re-read the JWT for every call."""
+    with open(utils.JWT_PATH) as f:
+        token = json.load(f)["access_token"]
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request(
+        "POST",
+        "/v1/embeddings",
+        body=body,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+    )
+    result = json.loads(connection.getresponse().read().decode("utf-8"))
+    connection.close()
+    return result
+
+
+def timed(name: str, requests: int, run: Callable[[], None]) -> None:
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.3f}s  {requests / elapsed:8.1f} req/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubEmbeddingHandler)
+    port = server.server_address[1]
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        utils.JWT_PATH = os.path.join(tmp, "jwt")
+        with open(utils.JWT_PATH, "w") as f:
+            json.dump({"access_token": "benchmark"}, f)
+
+        model = CaiiEmbeddingModel(stub_endpoint(port))
+        queries: List[str] = [f"query {i}" for i in range(args.requests)]
+        body = json.dumps({"input": "query", "input_type": "query", "model": "stub"})
+
+        def run_connection_per_request() -> None:
+            for _ in queries:
+                connection_per_request(port, body)
+
+        def run_pooled() -> None:
+            for query in queries:
+                model.get_query_embedding(query)
+
+        timed("connection per request", args.requests, run_connection_per_request)
+        timed("pooled, sync", args.requests, run_pooled)
+
+        async def run_async() -> None:
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def embed(query: str) -> None:
+                async with semaphore:
+                    await model.aget_query_embedding(query)
+
+            await asyncio.gather(*(embed(query) for query in queries))
+
+        timed(
+            f"pooled, async x{args.concurrency}",
+            args.requests,
+            lambda: asyncio.run(run_async()),
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
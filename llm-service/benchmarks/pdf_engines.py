@@ -0,0 +1,90 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Compare the PDF engines' throughput and how much text they find, over a directory of PDFs.
+
+Point it at a sample of the documents a knowledge base holds::
+
+    uv run python -m benchmarks.pdf_engines ~/sample-pdfs --engines pypdf,pypdfium2
+
+Engines that find far fewer characters than the others are missing text, or reading it
+in a different order; engines that find far more may be picking up hidden layers.
+Add docling to the engines to include it, which loads its models on first use.
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import List
+
+from app.ai.indexing.readers.pdf_engines import PDF_ENGINES, TEXT_LAYER_ENGINES
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("corpus", type=Path, help="directory searched for *.pdf")
+    parser.add_argument("--engines", default=",".join(TEXT_LAYER_ENGINES))
+    args = parser.parse_args()
+
+    files: List[Path] = sorted(args.corpus.rglob("*.pdf"))
+    if not files:
+        parser.error(f"no PDFs found under {args.corpus}")
+    print(f"{len(files)} files")
+    print(f"{'engine':<12} {'seconds':>9} {'pages/s':>9} {'chars':>12} {'failed':>7}")
+    for name in args.engines.split(","):
+        engine = PDF_ENGINES[name]()
+        pages = chars = failed = 0
+        start = time.perf_counter()
+        for file_path in files:
+            try:
+                extracted = engine.extract(file_path)
+            except Exception:
+                extracted = None
+            if extracted is None:
+                failed += 1
+                continue
+            pages += len(extracted)
+            chars += sum(len(page.text) for page in extracted)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{name:<12} {elapsed:9.2f} {pages / elapsed:9.1f} {chars:12d} {failed:7d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Benchmark extracting the text layer of a generated PDF, serially and split across processes.
+
+llama-index's PDFReader is the baseline; every run must produce the same pages::
+
+    uv run python -m benchmarks.pdf_extraction --pages 800 --processes 4
+
+Splitting only helps with several cores, and only once a document has enough pages to
+outweigh starting the processes.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from llama_index.readers.file import PDFReader as LlamaIndexPDFReader
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+from app.ai.indexing.readers.pdf_text import extract_pages
+
+LINES_PER_PAGE = 45
+
+
+def write_text_pdf(path: Path, page_count: int) -> None:
+    writer = PdfWriter()
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    for i in range(page_count):
+        page = writer.add_blank_page(612, 792)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+        lines = [
+            f"({i}.{line} The quick brown fox jumps over the lazy dog.) Tj T*"
+            for line in range(LINES_PER_PAGE)
+        ]
+        content = DecodedStreamObject()
+        content.set_data(
+            "\n".join(["BT /F1 10 Tf 12 TL 40 760 Td", *lines, "ET"]).encode()
+        )
+        page.replace_contents(content)
+    # roman numerals for the front matter, like most long reports
+    writer.set_page_label(0, 9, style="/r")
+    writer.set_page_label(10, page_count - 1, style="/D", start=1)
+    writer.write(path)
+
+
+def timed(
+    name: str, pages: int, run: Callable[[], List[Tuple[str, str]]]
+) -> List[Tuple[str, str]]:
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {elapsed:8.3f}s  {pages / elapsed:8.1f} pages/s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=800)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        file_path = Path(tmpdirname, "benchmark.pdf")
+        write_text_pdf(file_path, args.pages)
+
+        def run_llama_index() -> List[Tuple[str, str]]:
+            reader = LlamaIndexPDFReader(return_full_document=False)
+            documents = reader.load_data(file_path)
+            return [(doc.metadata["page_label"], doc.text) for doc in documents]
+
+        def run_extract_pages(processes: int) -> List[Tuple[str, str]]:
+            pages = extract_pages(file_path, processes)
+            return [(page.label, page.text) for page in pages]
+
+        expected = timed("llama-index PDFReader", args.pages, run_llama_index)
+        serial = timed("extract_pages serial", args.pages, lambda: run_extract_pages(1))
+        parallel = timed(
+            f"extract_pages {args.processes} procs",
+            args.pages,
+            lambda: run_extract_pages(args.processes),
+        )
+        assert serial == expected and parallel == expected, "extracted pages differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Benchmark extracting an image-heavy slide deck with and without image captioning.
+
+Generates a deck where every slide has a few distinct images and the same logo::
+
+    uv run python -m benchmarks.pptx_captioning --slides 40 --images-per-slide 3
+
+Compares llama-index's PptxReader, which captions one image at a time, with PptxReader
+with captioning off, with a cold caption cache and with a warm one. The cold run includes
+loading the model; both readers download it on first use, so run the benchmark once
+beforehand to leave the download out of the timings.
+"""
+
+import argparse
+import io
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.readers.file import PptxReader as LlamaIndexPptxReader
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+
+from app.ai.indexing.readers.pptx import PptxReader
+
+
+def random_png(rng: random.Random) -> io.BytesIO:
+    image = Image.new("RGB", (320, 240))
+    image.putdata(
+        [
+            (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            for _ in range(320 * 240)
+        ]
+    )
+    blob = io.BytesIO()
+    image.save(blob, format="PNG")
+    blob.seek(0)
+    return blob
+
+
+def write_deck(path: Path, slides: int, images_per_slide: int) -> None:
+    rng = random.Random(0)
+    logo = random_png(rng).getvalue()
+    presentation = Presentation()
+    for i in range(slides):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[5])
+        slide.shapes.title.text = f"Slide {i}"
+        slide.shapes.add_picture(io.BytesIO(logo), Inches(0), Inches(0))
+        for j in range(images_per_slide):
+            slide.shapes.add_picture(random_png(rng), Inches(1 + j), Inches(2))
+    presentation.save(str(path))
+
+
+def timed(name: str, slides: int, run: Callable[[], None]) -> None:
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.2f}s  {slides / elapsed:8.2f} slides/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slides", type=int, default=40)
+    parser.add_argument("--images-per-slide", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        # a fresh databases directory, so that the caption cache starts out empty
+        os.environ["RAG_DATABASES_DIR"] = tmpdirname
+
+        file_path = Path(tmpdirname, "benchmark.pptx")
+        write_deck(file_path, args.slides, args.images_per_slide)
+
+        def run_llama_index() -> None:
+            LlamaIndexPptxReader().load_data(file_path)
+
+        def run_reader(captioning: bool) -> None:
+            os.environ["PPTX_IMAGE_CAPTIONING"] = str(captioning).lower()
+            PptxReader(SentenceSplitter(), "benchmark", 1).extract(file_path)
+
+        timed("llama-index PptxReader", args.slides, run_llama_index)
+        timed("captioning off", args.slides, lambda: run_reader(False))
+        timed("captioning, cold cache", args.slides, lambda: run_reader(True))
+        timed("captioning, warm cache", args.slides, lambda: run_reader(True))
+
+
+if __name__ == "__main__":
+    main()
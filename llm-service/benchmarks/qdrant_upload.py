@@ -0,0 +1,149 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Benchmark writing chunks to Qdrant through llama-index's add() against QdrantVectorStore.upsert_chunks.
+
+Uses the same in-memory Qdrant client as the tests, so no Qdrant server is needed::
+
+    uv run python -m benchmarks.qdrant_upload --chunks 20000
+
+The in-memory client has no network or gRPC overhead, so this mostly measures the
+client-side cost of building points. Against a Qdrant server, upsert_chunks also
+avoids waiting for each batch to be applied.
+"""
+
+import argparse
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, List
+
+import numpy as np
+import numpy.typing as npt
+import qdrant_client
+from llama_index.core.schema import BaseNode, TextNode
+
+from app.ai.vector_stores.qdrant import QdrantVectorStore
+from app.services import data_sources_metadata_api
+from app.services.data_sources_metadata_api import RagDataSource
+
+DIMENSIONS = 1024
+BATCH_SIZE = 1000
+
+
+def benchmark_metadata(data_source_id: int) -> RagDataSource:
+    return RagDataSource(
+        id=data_source_id,
+        name="benchmark",
+        embedding_model="benchmark",
+        chunk_size=512,
+        chunk_overlap_percent=10,
+        time_created=datetime.now(),
+        time_updated=datetime.now(),
+        created_by_id="benchmark",
+        updated_by_id="benchmark",
+        connection_type="MANUAL",
+    )
+
+
+def synthetic_chunks(count: int) -> List[TextNode]:
+    document_id = str(uuid.uuid4())
+    return [
+        TextNode(
+            id_=str(uuid.uuid4()),
+            text=f"chunk {i} " + "lorem ipsum " * 80,
+            metadata={
+                "file_name": "benchmark.txt",
+                "document_id": document_id,
+                "data_source_id": 1,
+                "chunk_number": i,
+            },
+        )
+        for i in range(count)
+    ]
+
+
+def timed(name: str, chunks: int, run: Callable[[], None]) -> None:
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<20} {elapsed:8.3f}s  {chunks / elapsed:10.1f} chunks/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=20_000)
+    args = parser.parse_args()
+
+    data_sources_metadata_api.get_metadata = benchmark_metadata
+    chunks = synthetic_chunks(args.chunks)
+    embeddings: npt.NDArray[np.float32] = (
+        np.random.default_rng(0).random((args.chunks, DIMENSIONS), dtype=np.float32)
+    )
+    batches = [
+        (chunks[i : i + BATCH_SIZE], embeddings[i : i + BATCH_SIZE])
+        for i in range(0, args.chunks, BATCH_SIZE)
+    ]
+
+    def run_llama_index_add() -> None:
+        vector_store = QdrantVectorStore.for_chunks(
+            1, qdrant_client.QdrantClient(":memory:")
+        )
+        for batch_chunks, batch_embeddings in batches:
+            for chunk, embedding in zip(batch_chunks, batch_embeddings.tolist()):
+                chunk.embedding = embedding
+            nodes: List[BaseNode] = list(batch_chunks)
+            vector_store.llama_vector_store().add(nodes)
+            for chunk in batch_chunks:
+                chunk.embedding = None
+
+    def run_upsert_chunks() -> None:
+        vector_store = QdrantVectorStore.for_chunks(
+            1, qdrant_client.QdrantClient(":memory:")
+        )
+        for i, (batch_chunks, batch_embeddings) in enumerate(batches):
+            vector_store.upsert_chunks(
+                batch_chunks, batch_embeddings, wait=i == len(batches) - 1
+            )
+
+    timed("llama-index add()", args.chunks, run_llama_index_add)
+    timed("upsert_chunks", args.chunks, run_upsert_chunks)
+
+
+if __name__ == "__main__":
+    main()
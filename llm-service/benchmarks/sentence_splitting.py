@@ -0,0 +1,129 @@
+#
+#  CLOUDERA APPLIED MACHINE LEARNING PROTOTYPE (AMP)
+#  (C) Cloudera, Inc. 2024
+#  All rights reserved.
+#
+#  Applicable Open Source License: Apache 2.0
+#
+#  NOTE: Cloudera open source products are modular software products
+#  made up of hundreds of individual components, each of which was
+#  individually copyrighted.  Each Cloudera open source product is a
+#  collective work under U.S. Copyright Law. Your license to use the
+#  collective work is as provided in your written agreement with
+#  Cloudera.  Used apart from the collective work, this file is
+#  licensed for your use pursuant to the open source license
+#  identified above.
+#
+#  This code is provided to you pursuant a written agreement with
+#  (i) Cloudera, Inc. or (ii) a third-party authorized to distribute
+#  this code. If you do not have a written agreement with Cloudera nor
+#  with an authorized and properly licensed third party, you do not
+#  have any rights to access nor to use this code.
+#
+#  Absent a written agreement with Cloudera, Inc. ("Cloudera") to the
+#  contrary, A) CLOUDERA PROVIDES THIS CODE TO YOU WITHOUT WARRANTIES OF ANY
+#  KIND; (B) CLOUDERA DISCLAIMS ANY AND ALL EXPRESS AND IMPLIED
+#  WARRANTIES WITH RESPECT TO THIS CODE, INCLUDING BUT NOT LIMITED TO
+#  IMPLIED WARRANTIES OF TITLE, NON-INFRINGEMENT, MERCHANTABILITY AND
+#  FITNESS FOR A PARTICULAR PURPOSE; (C) CLOUDERA IS NOT LIABLE TO YOU,
+#  AND WILL NOT DEFEND, INDEMNIFY, NOR HOLD YOU HARMLESS FOR ANY CLAIMS
+#  ARISING FROM OR RELATED TO THE CODE; AND (D)WITH RESPECT TO YOUR EXERCISE
+#  OF ANY RIGHTS GRANTED TO YOU FOR THE CODE, CLOUDERA IS NOT LIABLE FOR ANY
+#  DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, PUNITIVE OR
+#  CONSEQUENTIAL DAMAGES INCLUDING, BUT NOT LIMITED TO, DAMAGES
+#  RELATED TO LOST REVENUE, LOST PROFITS, LOSS OF INCOME, LOSS OF
+#  BUSINESS ADVANTAGE OR UNAVAILABILITY, OR LOSS OR CORRUPTION OF
+#  DATA.
+#
+"""
+Benchmark the sentence splitting of indexing requests.
+
+Compares building a SentenceSplitter for every request with the shared splitter, and splitting
+one long document in the calling process with splitting its sections across processes; every
+parallel run must produce the same chunks as the serial one::
+
+    uv run python -m benchmarks.sentence_splitting --megabytes 8 --processes 4
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, List, TypeVar
+
+from llama_index.core.node_parser import SentenceSplitter
+
+from app.ai.indexing.splitting import get_sentence_splitter, split_text
+
+T = TypeVar("T")
+
+WORDS = "the quick brown fox jumps over lazy dog while indexing long reports".split()
+
+
+def make_text(characters: int) -> str:
+    rng = random.Random(0)
+    sentences: List[str] = []
+    length = 0
+    while length < characters:
+        sentence = " ".join(rng.choices(WORDS, k=rng.randrange(4, 30))).capitalize()
+        # a paragraph break every few sentences, where sections prefer to start
+        sentences.append(sentence + (".\n\n" if rng.random() < 0.2 else ". "))
+        length += len(sentences[-1])
+    return "".join(sentences)
+
+
+def timed(name: str, units: float, unit: str, run: Callable[[], T]) -> T:
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.3f}s  {units / elapsed:10.1f} {unit}/s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, default=8)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    request_text = make_text(2_000)
+    timed(
+        "splitter per request",
+        args.requests,
+        "requests",
+        lambda: [
+            SentenceSplitter(chunk_size=512, chunk_overlap=51).split_text(request_text)
+            for _ in range(args.requests)
+        ],
+    )
+    timed(
+        "shared splitter",
+        args.requests,
+        "requests",
+        lambda: [
+            get_sentence_splitter(512, 51).split_text(request_text)
+            for _ in range(args.requests)
+        ],
+    )
+
+    text = make_text(int(args.megabytes * 1024 * 1024))
+    splitter = get_sentence_splitter(512, 51)
+    serial = timed(
+        "split serial",
+        args.megabytes,
+        "MB",
+        lambda: split_text(splitter, text, "", 1),
+    )
+    parallel = timed(
+        f"split {args.processes} procs",
+        args.megabytes,
+        "MB",
+        lambda: split_text(splitter, text, "", args.processes),
+    )
+    identical = sum(a == b for a, b in zip(serial, parallel))
+    print(f"{identical} of {len(serial)} chunks identical to the serial split")
+    assert parallel == serial, "parallel chunks differ"
+
+
+if __name__ == "__main__":
+    main()